@@ -0,0 +1,218 @@
+"""
+Buffered audit capture.
+
+Model signals diff tracked instances against the snapshot taken when they
+were loaded and hand the resulting ``AuditLog`` rows to ``record``. Rows are
+only released once the surrounding transaction commits, and inside a request
+they are collected in a per-request buffer that ``AuditContextMiddleware``
+flushes with a single ``bulk_create`` (or a Celery task when
+``AUDIT_ASYNC_FLUSH`` is set).
+
+``QuerySet.update`` sends no signals, so code that updates tracked models
+in bulk, such as ``jobs.tasks.check_overdue_jobs``, records its changes
+with ``record_updates``.
+
+``AUDIT_RECORD_FORMAT`` selects how an update is stored: ``'compact'`` writes
+one row per save with a JSON diff of the changed fields, ``'rows'`` the
+original one row per changed field. ``AuditLog.get_changes`` reads both.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import metrics
+
+
+logger = logging.getLogger('jobops.audit')
+
+# Fields that change on every save and carry no audit value
+IGNORED_FIELDS = {'id', 'created_at', 'updated_at'}
+
+_request = ContextVar('audit_request', default=None)
+_buffer = ContextVar('audit_buffer', default=None)
+
+_MISSING = object()
+
+
+class AuditBuffer:
+    """
+    Audit rows collected during one request
+    """
+    def __init__(self):
+        self.entries = []
+        self.closed = False
+
+    def add(self, entries):
+        if self.closed:
+            # The scope ended before the transaction committed
+            flush(entries)
+        else:
+            self.entries.extend(entries)
+
+
+def tracked_fields(model):
+    """Return the concrete fields of ``model`` that are audited"""
+    return [
+        field for field in model._meta.concrete_fields
+        if field.name not in IGNORED_FIELDS
+    ]
+
+
+def snapshot(instance):
+    """Return the current values of the audited fields of ``instance``"""
+    values = instance.__dict__
+    return {
+        field.attname: values.get(field.attname, _MISSING)
+        for field in tracked_fields(type(instance))
+    }
+
+
+def diff(old, new):
+    """Return ``{attname: (old, new)}`` for fields that changed"""
+    return {
+        attname: (old.get(attname), value)
+        for attname, value in new.items()
+        if value is not _MISSING and old.get(attname, _MISSING) is not _MISSING
+        and old[attname] != value
+    }
+
+
+def _to_text(value):
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _request_context():
+    request = _request.get()
+    if request is None:
+        return None, None
+    user = getattr(request, 'user', None)
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    return user_id, request.META.get('REMOTE_ADDR')
+
+
+def build_entries(instance, action, changes=None):
+    """Build the audit rows for one change to ``instance``"""
+    return _build_entries(type(instance).__name__, instance.pk, action, changes)
+
+
+def _build_entries(model_name, object_id, action, changes):
+    user_id, ip_address = _request_context()
+    base = {
+        'user_id': user_id,
+        'model_name': model_name,
+        'object_id': object_id,
+        'timestamp': timezone.now(),
+        'ip_address': ip_address,
+    }
+    if not changes:
+        return [dict(base, action=action)]
+
+    if getattr(settings, 'AUDIT_RECORD_FORMAT', 'compact') == 'compact':
+        return [dict(
+            base,
+            action='status_change' if 'status' in changes and action == 'update' else action,
+            changes={attname: [_to_text(old), _to_text(new)] for attname, (old, new) in changes.items()},
+        )]
+
+    return [
+        dict(
+            base,
+            action='status_change' if attname == 'status' and action == 'update' else action,
+            field_name=attname,
+            old_value=_to_text(old),
+            new_value=_to_text(new),
+        )
+        for attname, (old, new) in changes.items()
+    ]
+
+
+def record(instance, action, changes=None):
+    """
+    Queue audit rows for a change; they are released on transaction commit
+    """
+    if not getattr(settings, 'AUDIT_ENABLED', True):
+        return
+    _queue(build_entries(instance, action, changes), type(instance).__name__)
+
+
+def record_updates(model, object_ids, changes):
+    """
+    Queue ``update`` audit rows for rows of ``model`` changed with
+    ``QuerySet.update``; ``changes`` is ``{attname: (old, new)}`` for all of them
+    """
+    if not getattr(settings, 'AUDIT_ENABLED', True):
+        return
+    entries = [
+        entry for object_id in object_ids
+        for entry in _build_entries(model.__name__, object_id, 'update', changes)
+    ]
+    if entries:
+        _queue(entries, model.__name__)
+
+
+def _queue(entries, model_name):
+    metrics.increment('audit.captured', len(entries), model=model_name)
+    buffer = _buffer.get()
+    if buffer is not None:
+        transaction.on_commit(lambda: buffer.add(entries))
+    else:
+        transaction.on_commit(lambda: flush(entries))
+
+
+def write_entries(entries):
+    """Insert audit rows with a single ``bulk_create``"""
+    from .models import AuditLog
+    start = time.perf_counter()
+    AuditLog.objects.bulk_create([AuditLog(**entry) for entry in entries], batch_size=500)
+    metrics.increment('audit.flushed', len(entries))
+    metrics.increment('audit.flush_ms', (time.perf_counter() - start) * 1000)
+
+
+def serialize_entries(entries):
+    """Make audit rows JSON-serializable for the Celery broker"""
+    return [dict(entry, timestamp=entry['timestamp'].isoformat()) for entry in entries]
+
+
+def deserialize_entries(entries):
+    return [dict(entry, timestamp=parse_datetime(entry['timestamp'])) for entry in entries]
+
+
+def flush(entries):
+    """Write audit rows now or hand them to a Celery worker"""
+    if not entries:
+        return
+    if getattr(settings, 'AUDIT_ASYNC_FLUSH', False):
+        from .tasks import write_audit_entries
+        write_audit_entries.delay(serialize_entries(entries))
+    else:
+        write_entries(entries)
+
+
+@contextmanager
+def audit_scope(request=None):
+    """
+    Collect audit rows for the duration of the block and flush them once
+    """
+    buffer = AuditBuffer()
+    request_token = _request.set(request)
+    buffer_token = _buffer.set(buffer)
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(buffer_token)
+        _request.reset(request_token)
+        buffer.closed = True
+        try:
+            flush(buffer.entries)
+        except Exception:
+            logger.exception('Could not flush %d audit entries', len(buffer.entries))
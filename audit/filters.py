@@ -0,0 +1,21 @@
+import django_filters
+from django.db.models import Q
+from .models import AuditLog
+
+
+class AuditLogFilter(django_filters.FilterSet):
+    """
+    Filters for the audit log API; ``since`` is inclusive and ``until`` exclusive,
+    ``field`` matches entries that changed the given field
+    """
+    since = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    until = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lt')
+    field = django_filters.CharFilter(method='filter_field')
+    
+    class Meta:
+        model = AuditLog
+        fields = ['model_name', 'object_id', 'user', 'action']
+    
+    def filter_field(self, queryset, name, value):
+        """Entries that changed ``value``, in either record format"""
+        return queryset.filter(Q(field_name=value) | Q(changes__has_key=value))
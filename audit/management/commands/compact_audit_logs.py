@@ -0,0 +1,100 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from audit import partitions
+from audit.models import AuditLog
+
+
+def _save_key(row):
+    # Rows written for one save share everything but the field columns
+    return (row.model_name, row.object_id, row.timestamp, row.user_id, row.ip_address)
+
+
+def _saves(rows):
+    """
+    Group adjacent rows into saves; a repeated field starts a new save, since
+    one save records each field once and merging would drop all but one edit
+    """
+    for _, group in groupby(rows, key=_save_key):
+        save, fields = [], set()
+        for row in group:
+            if row.field_name in fields:
+                yield save
+                save, fields = [], set()
+            save.append(row)
+            fields.add(row.field_name)
+        yield save
+
+
+class Command(BaseCommand):
+    help = (
+        'Rewrite one-row-per-field audit entries as compact one-row-per-save entries. '
+        'Safe to interrupt and re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Legacy rows read per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows that would be merged')
+
+    def handle(self, *args, **options):
+        tables = [AuditLog]
+        if partitions.routing_enabled('default'):
+            manager = partitions.SQLitePartitions(connections['default'])
+            tables += [manager.ensure(month) for _, month in manager.list()]
+
+        merged = written = 0
+        for model in tables:
+            table_merged, table_written = self.compact(model, options['batch_size'], options['dry_run'])
+            merged += table_merged
+            written += table_written
+
+        verb = 'Would merge' if options['dry_run'] else 'Merged'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {merged} legacy rows into {written} compact rows'))
+
+    def compact(self, model, batch_size, dry_run):
+        """
+        Merge the legacy rows of one table, walking it by id; the rows of one
+        save are inserted together and so have adjacent ids
+        """
+        legacy = model._base_manager.filter(changes__isnull=True, field_name__isnull=False).order_by('id')
+        merged = written = 0
+        last_id = 0
+        limit = batch_size
+        while True:
+            rows = list(legacy.filter(id__gt=last_id)[:limit])
+            if not rows:
+                break
+            groups = list(_saves(rows))
+            if len(rows) == limit:
+                # A full batch may end part way through a save; leave that
+                # save for the next batch, or read further if it is the only one
+                if len(groups) == 1:
+                    limit *= 2
+                    continue
+                groups.pop()
+            limit = batch_size
+            last_id = groups[-1][-1].id
+
+            merged += sum(len(group) for group in groups)
+            written += len(groups)
+            if dry_run:
+                continue
+
+            with transaction.atomic():
+                model._base_manager.bulk_create([self.merge(model, group) for group in groups])
+                model._base_manager.filter(id__in=[row.id for group in groups for row in group]).delete()
+        return merged, written
+
+    def merge(self, model, group):
+        first = group[0]
+        return model(
+            user_id=first.user_id,
+            action='status_change' if any(row.action == 'status_change' for row in group) else first.action,
+            model_name=first.model_name,
+            object_id=first.object_id,
+            changes={row.field_name: [row.old_value, row.new_value] for row in group},
+            timestamp=first.timestamp,
+            ip_address=first.ip_address,
+        )
@@ -0,0 +1,13 @@
+from .capture import audit_scope
+
+
+class AuditContextMiddleware:
+    """
+    Buffer audit rows captured during a request and write them in one batch
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_scope(request):
+            return self.get_response(request)
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_audit_logs(apps, schema_editor):
+    """
+    Rebuild ``audit_logs`` as a table partitioned by month on ``timestamp``.
+
+    PostgreSQL only. The primary key becomes ``(id, timestamp)`` because a
+    partitioned table's unique constraints must include the partition key;
+    ids still come from a single sequence and stay unique. Existing rows are
+    copied into monthly partitions and anything outside them lands in
+    ``audit_logs_default``.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    execute = schema_editor.execute
+    execute('ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned')
+    for index in ('audit_logs_object_ts_idx', 'audit_logs_user_ts_idx', 'audit_logs_ts_idx'):
+        execute(f'ALTER INDEX IF EXISTS {index} RENAME TO {index}_old')
+
+    execute(
+        'CREATE TABLE audit_logs (LIKE audit_logs_unpartitioned INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE ("timestamp")'
+    )
+    execute('CREATE SEQUENCE audit_logs_partitioned_id_seq OWNED BY audit_logs.id')
+    execute("ALTER TABLE audit_logs ALTER COLUMN id SET DEFAULT nextval('audit_logs_partitioned_id_seq')")
+    execute(
+        "SELECT setval('audit_logs_partitioned_id_seq', COALESCE(MAX(id), 0) + 1, false) "
+        "FROM audit_logs_unpartitioned"
+    )
+    execute('ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_pkey_partitioned PRIMARY KEY (id, "timestamp")')
+    execute(
+        'ALTER TABLE audit_logs ADD CONSTRAINT audit_logs_user_id_fk_users_id '
+        'FOREIGN KEY (user_id) REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED'
+    )
+    execute('CREATE INDEX audit_logs_object_ts_idx ON audit_logs (model_name, object_id, "timestamp")')
+    execute('CREATE INDEX audit_logs_user_ts_idx ON audit_logs (user_id, "timestamp")')
+    execute('CREATE INDEX audit_logs_ts_idx ON audit_logs ("timestamp")')
+
+    # One partition per month with data, plus the current and next two months
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT DISTINCT date_trunc('month', "timestamp" AT TIME ZONE 'UTC') FROM audit_logs_unpartitioned
+            UNION
+            SELECT date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => offs)
+            FROM generate_series(0, 2) AS offs
+            """
+        )
+        months = sorted(row[0].replace(tzinfo=timezone.utc) for row in cursor.fetchall())
+    for month in months:
+        execute(
+            f'CREATE TABLE audit_logs_p{month:%Y%m} PARTITION OF audit_logs FOR VALUES FROM (%s) TO (%s)',
+            [month, _next_month(month)],
+        )
+    execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    execute('INSERT INTO audit_logs SELECT * FROM audit_logs_unpartitioned')
+    execute('DROP TABLE audit_logs_unpartitioned')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0004_auditlog_indexes'),
+    ]
+
+    operations = [
+        # The partitioned table is schema-compatible with the model, so
+        # unapplying leaves it in place.
+        migrations.RunPython(partition_audit_logs, migrations.RunPython.noop),
+    ]
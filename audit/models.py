@@ -1,5 +1,54 @@
 from django.db import models
+from django.utils import timezone
 from users.models import User
+from . import partitions
+
+
+class AuditLogQuerySet(models.QuerySet):
+    """
+    QuerySet that routes reads and bulk writes through the SQLite partition
+    router when it is enabled; on PostgreSQL partitioning is native and this
+    behaves like a plain QuerySet.
+    """
+    def _routed(self):
+        if self.query.combinator or not partitions.routing_enabled(self.db):
+            return None
+        return partitions.route_read(self)
+    
+    def _fetch_all(self):
+        if self._result_cache is None:
+            routed = self._routed()
+            if routed is not None:
+                results = list(routed)
+                if self.query.select_related and isinstance(self.query.select_related, dict):
+                    models.prefetch_related_objects(
+                        results, *partitions.select_related_lookups(self.query.select_related)
+                    )
+                self._result_cache = results
+        super()._fetch_all()
+    
+    def count(self):
+        if self._result_cache is None:
+            routed = self._routed()
+            if routed is not None:
+                return routed.count()
+        return super().count()
+    
+    def exists(self):
+        if self._result_cache is None:
+            routed = self._routed()
+            if routed is not None:
+                return routed.exists()
+        return super().exists()
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        if partitions.routing_enabled(self.db):
+            return partitions.route_bulk_create(self, list(objs), batch_size=kwargs.get('batch_size'))
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def between(self, start, end):
+        """Filter to ``[start, end)``, which lets both backends prune partitions"""
+        return self.filter(timestamp__gte=start, timestamp__lt=end)
 
 
 class AuditLog(models.Model):
@@ -13,21 +62,44 @@ class AuditLog(models.Model):
         ('status_change', 'Status Change'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='audit_logs')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='audit_logs')
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     model_name = models.CharField(max_length=50)  # 'Job', 'JobTask', 'Equipment'
     object_id = models.PositiveIntegerField()
     field_name = models.CharField(max_length=100, blank=True, null=True)
     old_value = models.TextField(blank=True, null=True)
     new_value = models.TextField(blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Compact format: one row per save with {attname: [old, new]} for every
+    # changed field; field_name/old_value/new_value are left empty
+    changes = models.JSONField(blank=True, null=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     
+    objects = AuditLogQuerySet.as_manager()
+    
     class Meta:
         db_table = 'audit_logs'
         verbose_name = 'Audit Log'
         verbose_name_plural = 'Audit Logs'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['model_name', 'object_id', 'timestamp'], name='audit_logs_object_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='audit_logs_user_ts_idx'),
+            models.Index(fields=['timestamp'], name='audit_logs_ts_idx'),
+        ]
+    
+    @property
+    def is_compact(self):
+        return self.changes is not None
+    
+    def get_changes(self):
+        """Return ``{field: (old, new)}`` for either record format"""
+        if self.changes is not None:
+            return {name: tuple(values) for name, values in self.changes.items()}
+        if self.field_name:
+            return {self.field_name: (self.old_value, self.new_value)}
+        return {}
     
     def __str__(self):
-        return f"{self.action} on {self.model_name} {self.object_id} by {self.user.username}"
+        username = self.user.username if self.user_id else 'system'
+        return f"{self.action} on {self.model_name} {self.object_id} by {username}"
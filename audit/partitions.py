@@ -0,0 +1,357 @@
+"""
+Monthly partitions for the ``audit_logs`` table.
+
+On PostgreSQL ``audit_logs`` is natively partitioned by range on
+``timestamp`` (see migration 0005): the planner prunes partitions for any
+query with a timestamp predicate and old months are removed by detaching or
+dropping whole partitions.
+
+SQLite has no partitioning, so when ``AUDIT_SQLITE_PARTITIONING`` is enabled
+``AuditLogQuerySet`` acts as a table-per-period router instead: bulk inserts
+go to ``audit_logs_pYYYYMM`` tables, and reads are compiled once per
+partition overlapping the query's timestamp bounds and combined with
+``UNION ALL``. Rows saved one at a time stay in ``audit_logs``, which plays
+the role of PostgreSQL's default partition.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import connections, models
+from django.db.models.lookups import Lookup
+from django.db.models.sql.datastructures import BaseTable
+from django.db.models.sql.where import AND, OR, WhereNode
+
+
+BASE_TABLE = 'audit_logs'
+DEFAULT_PARTITION = 'audit_logs_default'
+PARTITION_PREFIX = 'audit_logs_p'
+
+# Partition models live in their own registry so they never show up in
+# migrations, admin or content types.
+partition_apps = Apps(installed_apps=[])
+_partition_models = {}
+
+
+def month_start(value):
+    """Return the first instant of the UTC month containing ``value``"""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def parse_partition_name(name):
+    """Return the month of a partition table name, or None for other tables"""
+    suffix = name[len(PARTITION_PREFIX):]
+    if not name.startswith(PARTITION_PREFIX) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return datetime(int(suffix[:4]), int(suffix[4:]), 1, tzinfo=dt_timezone.utc)
+
+
+class PostgresPartitions:
+    """
+    Manage native range partitions of ``audit_logs``
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def list(self):
+        """Return ``[(name, month)]`` for every monthly partition, oldest first"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = %s
+                """,
+                [BASE_TABLE],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        return sorted(
+            (name, parse_partition_name(name)) for name in names
+            if parse_partition_name(name) is not None
+        )
+
+    def ensure(self, month):
+        name = partition_name(month)
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(BASE_TABLE)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+        return name
+
+    def drop(self, name, detach_only=False):
+        """Detach a partition, and drop it unless ``detach_only``; both are O(1) in rows"""
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quote(BASE_TABLE)} DETACH PARTITION {quote(name)}')
+            if not detach_only:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+
+
+class SQLitePartitions:
+    """
+    Manage ``audit_logs_pYYYYMM`` tables for the SQLite router
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def list(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE %s",
+                [f'{PARTITION_PREFIX}%'],
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        return sorted(
+            (name, parse_partition_name(name)) for name in names
+            if parse_partition_name(name) is not None
+        )
+
+    def exists(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [name])
+            return cursor.fetchone() is not None
+
+    def columns(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA table_info({self.connection.ops.quote_name(name)})')
+            return {row[1] for row in cursor.fetchall()}
+
+    def ensure(self, month):
+        """
+        Create the partition table for ``month``, or add columns added to
+        ``AuditLog`` since it was created, and return its model
+        """
+        model = partition_model(month)
+        table = model._meta.db_table
+        # The schema editor context refuses to run inside a transaction on
+        # SQLite, but its SQL generation does not need it.
+        editor = self.connection.schema_editor()
+        columns = self.columns(table)
+        if columns:
+            quote = self.connection.ops.quote_name
+            with self.connection.cursor() as cursor:
+                for field in model._meta.local_concrete_fields:
+                    if field.column not in columns:
+                        definition, params = editor.column_sql(model, field)
+                        cursor.execute(
+                            f'ALTER TABLE {quote(table)} ADD COLUMN {quote(field.column)} {definition}', params
+                        )
+            return model
+
+        sql, params = editor.table_sql(model)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for index in model._meta.indexes:
+                cursor.execute(str(index.create_sql(model, editor)))
+            # Start every partition in its own id range so ids stay unique
+            # across partitions, as with PostgreSQL's shared sequence.
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, (month.year * 100 + month.month) * 10 ** 10],
+            )
+        return model
+
+    def drop(self, name, detach_only=False):
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            if detach_only:
+                cursor.execute(f'ALTER TABLE {quote(name)} RENAME TO {quote("detached_" + name)}')
+            else:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [name])
+
+
+def get_partitions(using='default'):
+    """Return the partition manager for a connection, or None if unpartitioned"""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return PostgresPartitions(connection)
+    if routing_enabled(using):
+        return SQLitePartitions(connection)
+    return None
+
+
+def routing_enabled(using):
+    """Whether reads and bulk writes on ``using`` go through the SQLite router"""
+    return (
+        getattr(settings, 'AUDIT_SQLITE_PARTITIONING', False)
+        and connections[using].vendor == 'sqlite'
+    )
+
+
+def partition_model(month):
+    """Return a model class mapped to the partition table for ``month``"""
+    from .models import AuditLog
+
+    table = partition_name(month)
+    if table in _partition_models:
+        return _partition_models[table]
+
+    attrs = {'__module__': AuditLog.__module__}
+    for field in AuditLog._meta.local_concrete_fields:
+        if field.is_relation:
+            # Partitions are plain tables; the join happens through AuditLog
+            attrs[field.attname] = models.BigIntegerField(null=True, blank=True, db_column=field.column)
+        else:
+            name, path, args, kwargs = field.deconstruct()
+            attrs[field.name] = field.__class__(*args, **kwargs)
+
+    attrs['Meta'] = type('Meta', (), {
+        'apps': partition_apps,
+        'app_label': AuditLog._meta.app_label,
+        'db_table': table,
+        'managed': False,
+        'indexes': [
+            models.Index(
+                fields=[f'{name}_id' if name == 'user' else name for name in index.fields],
+                name=f"{table}_{index.name.replace(BASE_TABLE + '_', '').replace('_idx', '')}",
+            )
+            for index in AuditLog._meta.indexes
+        ],
+    })
+    model = type(f'AuditLogPartition{month:%Y%m}', (models.Model,), attrs)
+    _partition_models[table] = model
+    return model
+
+
+def _lookup_bounds(lookup):
+    target = getattr(lookup.lhs, 'target', None)
+    if getattr(target, 'attname', None) != 'timestamp':
+        return None, None
+    if lookup.lookup_name == 'range':
+        return lookup.rhs[0], lookup.rhs[1]
+    if not isinstance(lookup.rhs, datetime):
+        return None, None
+    if lookup.lookup_name in ('gt', 'gte'):
+        return lookup.rhs, None
+    if lookup.lookup_name in ('lt', 'lte'):
+        return None, lookup.rhs
+    if lookup.lookup_name == 'exact':
+        return lookup.rhs, lookup.rhs
+    return None, None
+
+
+def timestamp_bounds(node):
+    """
+    Return inclusive ``(lower, upper)`` timestamp bounds implied by a where
+    clause; either side is None when unbounded.
+    """
+    if isinstance(node, Lookup):
+        return _lookup_bounds(node)
+    if not isinstance(node, WhereNode) or node.negated or not node.children:
+        return None, None
+
+    bounds = [timestamp_bounds(child) for child in node.children]
+    lowers = [lower for lower, _ in bounds]
+    uppers = [upper for _, upper in bounds]
+    if node.connector == AND:
+        known_lowers = [lower for lower in lowers if lower is not None]
+        known_uppers = [upper for upper in uppers if upper is not None]
+        return (
+            max(known_lowers) if known_lowers else None,
+            min(known_uppers) if known_uppers else None,
+        )
+    if node.connector == OR:
+        return (
+            min(lowers) if None not in lowers else None,
+            max(uppers) if None not in uppers else None,
+        )
+    return None, None
+
+
+def partitions_for(queryset):
+    """Return the partition tables a queryset has to read"""
+    lower, upper = timestamp_bounds(queryset.query.where)
+    tables = []
+    for name, month in SQLitePartitions(connections[queryset.db]).list():
+        if lower is not None and add_months(month, 1) <= lower:
+            continue
+        if upper is not None and month > upper:
+            continue
+        tables.append(name)
+    return tables
+
+
+def _on_table(queryset, table):
+    part = queryset._chain()
+    query = part.query
+    query.clear_ordering(force=True)
+    query.clear_limits()
+    alias = query.get_initial_alias()
+    query.alias_map[alias] = BaseTable(table, alias)
+    return part
+
+
+def select_related_lookups(select_related, prefix=''):
+    """Flatten a ``select_related`` dict into prefetch lookups"""
+    lookups = []
+    for name, nested in select_related.items():
+        lookups.append(prefix + name)
+        lookups.extend(select_related_lookups(nested, f'{prefix}{name}__'))
+    return lookups
+
+
+def route_read(queryset):
+    """
+    Return a queryset that reads ``queryset`` from ``audit_logs`` and the
+    partitions overlapping its timestamp bounds, keeping its ordering and
+    slice, or None when there are no partitions to read.
+
+    ``select_related`` cannot be combined with ``UNION``, so it is dropped
+    here and the caller prefetches those relations instead.
+    """
+    tables = partitions_for(queryset)
+    if not tables:
+        return None
+
+    parts = [_on_table(queryset, table) for table in [BASE_TABLE] + tables]
+    for part in parts:
+        part.query.select_related = False
+
+    combined = parts[0].union(*parts[1:], all=True)
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    if ordering:
+        combined = combined.order_by(*ordering)
+    low, high = queryset.query.low_mark, queryset.query.high_mark
+    if low or high is not None:
+        combined.query.set_limits(low, high)
+    return combined
+
+
+def route_bulk_create(queryset, objs, batch_size=None):
+    """Write each object into the partition for its month"""
+    from django.utils import timezone
+
+    partitions = SQLitePartitions(connections[queryset.db])
+    by_month = defaultdict(list)
+    for obj in objs:
+        if obj.timestamp is None:
+            obj.timestamp = timezone.now()
+        by_month[month_start(obj.timestamp)].append(obj)
+
+    attnames = [field.attname for field in queryset.model._meta.concrete_fields]
+    for month, group in by_month.items():
+        model = partitions.ensure(month)
+        rows = [model(**{attname: getattr(obj, attname) for attname in attnames}) for obj in group]
+        model._base_manager.using(queryset.db).bulk_create(rows, batch_size=batch_size)
+        for obj, row in zip(group, rows):
+            obj.pk = row.pk
+            obj._state.adding = False
+            obj._state.db = queryset.db
+    return objs
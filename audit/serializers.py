@@ -0,0 +1,25 @@
+from rest_framework import serializers
+from .models import AuditLog
+
+
+class AuditLogSerializer(serializers.ModelSerializer):
+    """
+    Serializer for AuditLog model
+    """
+    username = serializers.CharField(source='user.username', read_only=True, default=None)
+    changes = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = AuditLog
+        fields = [
+            'id', 'user', 'username', 'action', 'model_name', 'object_id',
+            'changes', 'field_name', 'old_value', 'new_value', 'timestamp', 'ip_address'
+        ]
+        read_only_fields = fields
+    
+    def get_changes(self, obj) -> dict:
+        """Changed fields as ``{field: {'old': ..., 'new': ...}}`` for both record formats"""
+        return {
+            name: {'old': old, 'new': new}
+            for name, (old, new) in obj.get_changes().items()
+        }
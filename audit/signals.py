@@ -0,0 +1,40 @@
+from django.apps import apps
+from django.db.models.signals import post_init, post_save, post_delete
+
+from .capture import snapshot, diff, record
+
+
+TRACKED_MODELS = ['jobs.Job', 'jobs.JobTask', 'equipment.Equipment']
+
+
+def remember_state(sender, instance, **kwargs):
+    """Snapshot audited fields of instances loaded from the database"""
+    if instance.pk is not None:
+        instance._audit_snapshot = snapshot(instance)
+
+
+def capture_save(sender, instance, created, raw=False, **kwargs):
+    """Record creation or the changed fields of an update"""
+    if raw:
+        return
+    current = snapshot(instance)
+    if created:
+        record(instance, 'create')
+    else:
+        changes = diff(getattr(instance, '_audit_snapshot', {}), current)
+        if changes:
+            record(instance, 'update', changes)
+    instance._audit_snapshot = current
+
+
+def capture_delete(sender, instance, **kwargs):
+    """Record deletion"""
+    record(instance, 'delete')
+
+
+def connect_signals():
+    for label in TRACKED_MODELS:
+        model = apps.get_model(label)
+        post_init.connect(remember_state, sender=model, dispatch_uid=f'audit_init_{label}')
+        post_save.connect(capture_save, sender=model, dispatch_uid=f'audit_save_{label}')
+        post_delete.connect(capture_delete, sender=model, dispatch_uid=f'audit_delete_{label}')
@@ -0,0 +1,40 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from core.instrumentation import instrumented_task, current_run
+from .capture import deserialize_entries, write_entries
+from .partitions import get_partitions, month_start, add_months
+
+
+@shared_task
+def write_audit_entries(entries):
+    """
+    Write a batch of audit rows captured in the request path
+    """
+    write_entries(deserialize_entries(entries))
+    return len(entries)
+
+
+@shared_task
+@instrumented_task
+def maintain_audit_partitions():
+    """
+    Create upcoming monthly audit partitions and drop expired ones
+    """
+    partitions = get_partitions()
+    if partitions is None:
+        return {'created': 0, 'dropped': 0}
+    
+    current = month_start(timezone.now())
+    for offset in range(settings.AUDIT_PARTITION_PREMAKE_MONTHS + 1):
+        partitions.ensure(add_months(current, offset))
+    
+    cutoff = add_months(current, -settings.AUDIT_RETENTION_MONTHS)
+    dropped = 0
+    for name, month in partitions.list():
+        if month < cutoff:
+            partitions.drop(name, detach_only=settings.AUDIT_RETENTION_DETACH_ONLY)
+            dropped += 1
+    current_run().add_rows(dropped)
+    
+    return {'created': settings.AUDIT_PARTITION_PREMAKE_MONTHS + 1, 'dropped': dropped}
@@ -1,3 +1,366 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from jobs.models import Job, JobTask
+from equipment.models import Equipment
+from .models import AuditLog
+from .partitions import add_months, get_partitions, month_start, partition_name
+from .tasks import maintain_audit_partitions
 
-# Create your tests here.
+
+class AuditCaptureTest(TestCase):
+    """Test cases for signal-based audit capture"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.equipment = Equipment.objects.create(
+            name='Drill',
+            serial_number='DRILL-1'
+        )
+    
+    def test_create_is_recorded(self):
+        """Test that creating a tracked model writes one create row"""
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment = Equipment.objects.create(name='Van', serial_number='VAN-1')
+        
+        log = AuditLog.objects.get(object_id=equipment.id)
+        self.assertEqual(log.action, 'create')
+        self.assertEqual(log.model_name, 'Equipment')
+        self.assertIsNone(log.user)
+    
+    @override_settings(AUDIT_RECORD_FORMAT='rows')
+    def test_only_changed_fields_are_recorded(self):
+        """Test that updates record one row per changed field"""
+        equipment = Equipment.objects.get(id=self.equipment.id)
+        equipment.name = 'Hammer Drill'
+        equipment.is_active = False
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.save()
+        
+        logs = AuditLog.objects.filter(action='update').order_by('field_name')
+        self.assertEqual(
+            [(log.field_name, log.old_value, log.new_value) for log in logs],
+            [('is_active', 'True', 'False'), ('name', 'Drill', 'Hammer Drill')]
+        )
+    
+    @override_settings(AUDIT_RECORD_FORMAT='compact')
+    def test_compact_format_records_one_row_per_save(self):
+        """Test that the compact format stores one JSON diff per save"""
+        equipment = Equipment.objects.get(id=self.equipment.id)
+        equipment.name = 'Hammer Drill'
+        equipment.is_active = False
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.save()
+        
+        log = AuditLog.objects.get(action='update')
+        self.assertIsNone(log.field_name)
+        self.assertEqual(
+            log.get_changes(),
+            {'is_active': ('True', 'False'), 'name': ('Drill', 'Hammer Drill')}
+        )
+    
+    def test_rollback_discards_entries(self):
+        """Test that rows for rolled back changes are never written"""
+        equipment = Equipment.objects.get(id=self.equipment.id)
+        equipment.name = 'Rolled Back'
+        
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    equipment.save()
+                    raise ValueError('abort')
+            except ValueError:
+                pass
+        
+        self.assertEqual(len(callbacks), 0)
+        self.assertFalse(AuditLog.objects.exists())
+
+
+@override_settings(AUDIT_RECORD_FORMAT='rows')
+class AuditRequestPathTest(TransactionTestCase):
+    """Test cases for request-scoped audit buffering"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        self.job = Job.objects.create(
+            title='Test Job',
+            description='Test description',
+            client_name='Test Client',
+            created_by=self.admin_user,
+            assigned_to=self.technician_user,
+            scheduled_date=timezone.now() + timedelta(days=1)
+        )
+        self.task = JobTask.objects.create(
+            job=self.job,
+            title='Test Task',
+            description='Test description',
+            order=1
+        )
+        AuditLog.objects.all().delete()
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.technician_user)
+    
+    def test_status_update_is_flushed_in_one_insert(self):
+        """Test that all changes of a request are written with one INSERT"""
+        url = reverse('jobs:update-task-status', args=[self.task.id])
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'status': 'completed'}, format='json')
+        
+        self.assertEqual(response.status_code, 200)
+        audit_inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "audit_logs"')]
+        self.assertEqual(len(audit_inserts), 1)
+        
+        status_changes = AuditLog.objects.filter(action='status_change', field_name='status')
+        self.assertEqual(
+            sorted(status_changes.values_list('model_name', 'new_value')),
+            [('Job', 'completed'), ('JobTask', 'completed')]
+        )
+        self.assertTrue(all(log.user_id == self.technician_user.id for log in AuditLog.objects.all()))
+
+
+class AuditLogAPITest(TestCase):
+    """Test cases for the audit log query API"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        AuditLog.objects.all().delete()
+        
+        self.now = timezone.now()
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                user=self.admin_user,
+                action='update',
+                model_name='Job',
+                object_id=1,
+                field_name='title',
+                new_value=f'Title {i}',
+                timestamp=self.now - timedelta(minutes=i // 2)
+            )
+            for i in range(7)
+        ] + [
+            AuditLog(user=self.technician_user, action='update', model_name='Job', object_id=2, timestamp=self.now),
+        ])
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin_user)
+        self.url = reverse('audit:audit-log-list')
+    
+    def test_cursor_pagination_walks_all_rows(self):
+        """Test that cursors page through ties on timestamp without gaps or repeats"""
+        seen = []
+        url = f'{self.url}?model_name=Job&object_id=1&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        
+        expected = list(
+            AuditLog.objects.filter(object_id=1).order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+    
+    def test_user_and_time_range_filters(self):
+        """Test filtering by user and time range"""
+        response = self.client.get(self.url, {'user': self.technician_user.id})
+        self.assertEqual([row['object_id'] for row in response.data['results']], [2])
+        
+        since = (self.now - timedelta(minutes=1)).isoformat()
+        response = self.client.get(self.url, {'object_id': 1, 'since': since})
+        self.assertEqual(len(response.data['results']), 4)
+    
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+    
+    def test_both_record_formats_are_presented_alike(self):
+        """Test that legacy and compact rows expose the same ``changes`` shape"""
+        AuditLog.objects.create(
+            action='update', model_name='Job', object_id=3,
+            changes={'title': ['Old', 'New'], 'client_name': [None, 'Acme']},
+        )
+        AuditLog.objects.create(
+            action='update', model_name='Job', object_id=3,
+            field_name='title', old_value='New', new_value='Newer',
+            timestamp=self.now + timedelta(minutes=1),
+        )
+        
+        response = self.client.get(self.url, {'object_id': 3, 'field': 'title'})
+        self.assertEqual(
+            [row['changes'] for row in response.data['results']],
+            [
+                {'title': {'old': 'New', 'new': 'Newer'}},
+                {'title': {'old': 'Old', 'new': 'New'}, 'client_name': {'old': None, 'new': 'Acme'}},
+            ]
+        )
+        
+        response = self.client.get(self.url, {'object_id': 3, 'field': 'client_name'})
+        self.assertEqual(len(response.data['results']), 1)
+    
+    def test_compact_command_merges_legacy_rows(self):
+        """Test that legacy rows of one save are merged into one compact row"""
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                action='status_change' if name == 'status' else 'update', model_name='Job', object_id=4,
+                field_name=name, old_value='a', new_value='b', timestamp=self.now,
+            )
+            for name in ('status', 'title', 'notes')
+        ])
+        
+        call_command('compact_audit_logs', batch_size=2, stdout=StringIO())
+        
+        log = AuditLog.objects.get(object_id=4)
+        self.assertEqual(log.action, 'status_change')
+        self.assertEqual(set(log.changes), {'status', 'title', 'notes'})
+        # Two edits of the same field are never merged, even at the same timestamp
+        titles = [log.changes['title'] for log in AuditLog.objects.filter(object_id=1)]
+        self.assertCountEqual(titles, [[None, f'Title {i}'] for i in range(7)])
+        self.assertFalse(AuditLog.objects.filter(changes__isnull=True, field_name__isnull=False).exists())
+    
+    def test_admin_only(self):
+        """Test that non-admin users cannot read the audit log"""
+        self.client.force_authenticate(self.technician_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite partition router')
+@override_settings(AUDIT_SQLITE_PARTITIONING=True, AUDIT_RETENTION_MONTHS=1, AUDIT_RETENTION_DETACH_ONLY=False)
+class AuditPartitionRouterTest(TestCase):
+    """Test cases for the SQLite table-per-month audit router"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        AuditLog.objects.all().delete()
+        
+        self.current = month_start(timezone.now())
+        self.old = add_months(self.current, -3)
+        AuditLog.objects.bulk_create([
+            AuditLog(user=self.user, action='update', model_name='Job', object_id=1, timestamp=self.old + timedelta(days=1)),
+            AuditLog(user=self.user, action='update', model_name='Job', object_id=1, timestamp=self.current + timedelta(hours=1)),
+            AuditLog(user=self.user, action='update', model_name='Job', object_id=2, timestamp=self.current + timedelta(hours=2)),
+        ])
+    
+    def test_rows_are_written_to_month_tables(self):
+        """Test that bulk writes land in one table per month"""
+        partitions = get_partitions()
+        self.assertEqual(
+            [name for name, _ in partitions.list()],
+            [partition_name(self.old), partition_name(self.current)]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM audit_logs')
+            self.assertEqual(cursor.fetchone()[0], 0)
+    
+    def test_reads_span_partitions(self):
+        """Test that manager queries read every partition in order"""
+        logs = list(AuditLog.objects.filter(object_id=1).select_related('user'))
+        
+        self.assertEqual([log.timestamp for log in logs], sorted((log.timestamp for log in logs), reverse=True))
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(logs[0].user, self.user)
+        self.assertEqual(len({log.id for log in logs}), 2)
+        self.assertEqual(AuditLog.objects.count(), 3)
+    
+    def test_time_bounded_reads_prune_partitions(self):
+        """Test that a timestamp predicate skips partitions outside the range"""
+        with CaptureQueriesContext(connection) as queries:
+            logs = list(AuditLog.objects.filter(timestamp__gte=self.current))
+        
+        self.assertEqual(len(logs), 2)
+        select = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT "audit_logs"')][0]
+        self.assertIn(partition_name(self.current), select)
+        self.assertNotIn(partition_name(self.old), select)
+    
+    def test_retention_drops_whole_partitions(self):
+        """Test that the retention task drops expired months"""
+        result = maintain_audit_partitions()
+        
+        self.assertEqual(result['dropped'], 1)
+        self.assertNotIn(partition_name(self.old), [name for name, _ in get_partitions().list()])
+        self.assertEqual(AuditLog.objects.count(), 2)
+    
+    def test_api_pages_across_partitions(self):
+        """Test that the audit API pages through partitioned rows"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        
+        first = client.get(reverse('audit:audit-log-list'), {'page_size': 2})
+        second = client.get(first.data['next'])
+        
+        self.assertEqual(len(first.data['results']), 2)
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertIsNone(second.data['next'])
+        self.assertEqual(second.data['results'][0]['username'], 'admin')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Native PostgreSQL partitioning')
+@override_settings(AUDIT_RETENTION_MONTHS=1, AUDIT_RETENTION_DETACH_ONLY=False)
+class PostgresAuditPartitionTest(TestCase):
+    """Test cases for native audit_logs partitioning"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.current = month_start(timezone.now())
+        self.old = add_months(self.current, -3)
+        get_partitions().ensure(self.old)
+        AuditLog.objects.bulk_create([
+            AuditLog(action='update', model_name='Job', object_id=1, timestamp=self.old + timedelta(days=1)),
+            AuditLog(action='update', model_name='Job', object_id=1, timestamp=self.current + timedelta(hours=1)),
+        ])
+        # Fire the deferred FK checks so the partition can be dropped in this transaction
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    
+    def test_queries_prune_partitions(self):
+        """Test that the planner only scans partitions inside the time range"""
+        plan = AuditLog.objects.filter(timestamp__gte=self.current).explain()
+        
+        self.assertIn(partition_name(self.current), plan)
+        self.assertNotIn(partition_name(self.old), plan)
+    
+    def test_retention_drops_whole_partitions(self):
+        """Test that the retention task drops expired months"""
+        result = maintain_audit_partitions()
+        
+        self.assertEqual(result['dropped'], 1)
+        self.assertNotIn(partition_name(self.old), [name for name, _ in get_partitions().list()])
+        self.assertEqual(AuditLog.objects.filter(object_id=1).count(), 1)
@@ -1,3 +1,22 @@
-from django.shortcuts import render
+from rest_framework import generics
+from django_filters.rest_framework import DjangoFilterBackend
+from .models import AuditLog
+from .filters import AuditLogFilter
+from .pagination import TimestampCursorPagination
+from .serializers import AuditLogSerializer
+from users.permissions import IsAdminUser
 
-# Create your views here.
+
+class AuditLogListView(generics.ListAPIView):
+    """
+    List audit log entries, newest first (Admin only)
+    
+    Filter by model_name/object_id for the history of one object, by user,
+    or by a since/until time range.
+    """
+    queryset = AuditLog.objects.select_related('user')
+    serializer_class = AuditLogSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AuditLogFilter
+    pagination_class = TimestampCursorPagination
+    permission_classes = [IsAdminUser]
@@ -135,4 +135,10 @@ def completed_job_task(sample_job, equipment):
         completed_at=timezone.now()
     )
     task.required_equipment.add(equipment)
-    return task 
\ No newline at end of file
+    return task 
+
+@pytest.fixture
+def assert_no_n_plus_one():
+    """Context manager failing the test when its block runs an N+1 query pattern"""
+    from core.nplusone import no_n_plus_one
+    return no_n_plus_one
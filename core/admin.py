@@ -0,0 +1,60 @@
+from django.contrib import admin
+from django.apps import apps
+from django.contrib.admin.sites import AlreadyRegistered
+from django.db.models import Avg, Count, Max
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import SlowQuery
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ('duration_ms', 'source', 'short_sql', 'call_site', 'captured_at')
+    list_filter = ('source', 'database')
+    search_fields = ('sql', 'source', 'call_site')
+    ordering = ('-duration_ms',)
+    
+    def short_sql(self, obj):
+        return obj.sql if len(obj.sql) <= 120 else f'{obj.sql[:117]}...'
+    short_sql.short_description = 'SQL'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        custom_urls = [
+            path(
+                'worst-shapes/',
+                self.admin_site.admin_view(self.worst_shapes_view),
+                name='core_slowquery_worst_shapes',
+            ),
+        ]
+        return custom_urls + super().get_urls()
+    
+    def worst_shapes_view(self, request):
+        """Slow query shapes ranked by their slowest capture"""
+        shapes = SlowQuery.objects.values('shape_hash', 'sql').annotate(
+            captures=Count('id'),
+            max_ms=Max('duration_ms'),
+            avg_ms=Avg('duration_ms'),
+            last_seen=Max('captured_at'),
+        ).order_by('-max_ms')[:50]
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Worst Slow Query Shapes',
+            'opts': self.model._meta,
+            'shapes': shapes,
+        }
+        return TemplateResponse(request, 'admin/core/slowquery/worst_shapes.html', context)
+
+
+app_config = apps.get_app_config('core')
+
+for model in app_config.get_models():
+    try:
+        admin.site.register(model)
+    except AlreadyRegistered:
+        pass
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+    
+    def ready(self):
+        from django.conf import settings
+        
+        from .signals import connect_signals
+        connect_signals()
+        
+        if getattr(settings, 'SLOW_QUERY_LOG_ENABLED', False):
+            from .slowqueries import connect_signals as connect_slow_query_log
+            connect_slow_query_log()
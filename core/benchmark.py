@@ -0,0 +1,197 @@
+"""
+Endpoint benchmarks.
+
+``run_benchmarks`` drives the hot API endpoints through the DRF test client,
+authenticated with real JWTs for the role each endpoint serves, and records
+per endpoint the latency percentiles, the query count of one request and the
+peak memory allocated while serving it (measured in a separate pass, since
+``tracemalloc`` slows everything down). Cached responses (``core.cache``) are
+bypassed unless ``response_cache`` is set, so the views themselves are
+measured. ``compare`` checks a result against a saved baseline. See the
+``benchmark_endpoints`` management command.
+"""
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from itertools import cycle
+
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from jobs.models import Job, JobTask
+from users.models import User
+
+from .instrumentation import capture_queries
+
+
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+@dataclass
+class Endpoint:
+    """
+    One benchmarked request; ``requests`` yields ``(path, data)`` pairs, and
+    ``writes`` marks requests that change data
+    """
+    name: str
+    method: str
+    role: str
+    requests: object
+    expected_status: int = 200
+    writes: bool = False
+    client: APIClient = field(default=None, repr=False)
+
+    def call(self):
+        path, data = next(self.requests)
+        response = getattr(self.client, self.method)(path, data, format='json' if data else None)
+        if response.status_code != self.expected_status:
+            raise RuntimeError(f'{self.name}: {self.method.upper()} {path} returned {response.status_code}')
+        return response
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def get_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+
+def busiest_technician():
+    """The technician with the most open assigned jobs: the dashboard's worst case"""
+    from django.db.models import Count, Q
+
+    return (
+        User.objects.filter(role='technician')
+        .annotate(open_jobs=Count('assigned_jobs', filter=Q(assigned_jobs__status__in=['pending', 'in_progress'])))
+        .order_by('-open_jobs', 'id')
+        .first()
+    )
+
+
+def sample_ids(queryset, count):
+    """Up to ``count`` primary keys spread over ``queryset``"""
+    ids = list(queryset.order_by('id').values_list('id', flat=True)[:count * 100])
+    step = max(1, len(ids) // count)
+    return ids[::step][:count]
+
+
+def default_endpoints():
+    """The endpoints to benchmark, keyed by name"""
+    admin = User.objects.filter(role='admin').order_by('id').first()
+    technician = busiest_technician()
+    if admin is None or technician is None:
+        raise ValueError('Benchmarks need at least one admin and one technician; seed the database first')
+
+    job_ids = sample_ids(Job.objects.all(), 50)
+    task_ids = sample_ids(JobTask.objects.filter(job__assigned_to=technician, status__in=['pending', 'in_progress']), 1)
+    if not job_ids or not task_ids:
+        raise ValueError('Benchmarks need jobs with open tasks; seed the database first')
+
+    def update_task_status(task_id):
+        # Toggle so every request changes the row
+        for status in cycle(['in_progress', 'pending']):
+            yield f'/api/tasks/{task_id}/update-status/', {'status': status}
+
+    endpoints = [
+        Endpoint('job-list', 'get', 'admin', cycle([('/api/jobs/', None)])),
+        Endpoint('job-list-filtered', 'get', 'admin', cycle([('/api/jobs/?status=pending&ordering=-priority', None)])),
+        Endpoint('job-detail', 'get', 'admin', cycle([(f'/api/jobs/{pk}/', None) for pk in job_ids])),
+        Endpoint('technician-dashboard', 'get', 'technician', cycle([('/api/technician-dashboard/', None)])),
+        Endpoint('admin-analytics', 'get', 'admin', cycle([('/api/admin-analytics/', None)])),
+        Endpoint('update-task-status', 'post', 'technician', update_task_status(task_ids[0]), writes=True),
+    ]
+    clients = {'admin': get_client(admin), 'technician': get_client(technician)}
+    for endpoint in endpoints:
+        endpoint.client = clients[endpoint.role]
+    return {endpoint.name: endpoint for endpoint in endpoints}
+
+
+def measure(endpoint, iterations=50, warmup=5):
+    """Benchmark one endpoint; return its metrics"""
+    for _ in range(warmup):
+        endpoint.call()
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        endpoint.call()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    with capture_queries() as queries:
+        endpoint.call()
+
+    tracemalloc.start()
+    try:
+        endpoint.call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': queries.count,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(names=None, iterations=50, warmup=5, log=None, response_cache=False, writes=True):
+    """
+    Benchmark the endpoints in ``names`` (default: all, or all read-only
+    ones unless ``writes`` is set); return the results
+    """
+    endpoints = default_endpoints()
+    unknown = set(names or ()) - set(endpoints)
+    if unknown:
+        raise ValueError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    if not names:
+        names = [name for name, endpoint in endpoints.items() if writes or not endpoint.writes]
+
+    results = {}
+    with override_settings(RESPONSE_CACHE_ENABLED=response_cache):
+        for name in names:
+            results[name] = measure(endpoints[name], iterations=iterations, warmup=warmup)
+            if log:
+                log(name, results[name])
+    return {
+        'database': connection.vendor,
+        'response_cache': response_cache,
+        'rows': {
+            'users': User.objects.count(),
+            'jobs': Job.objects.count(),
+            'tasks': JobTask.objects.count(),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(baseline, results, threshold=0.2):
+    """
+    Return the regressions of ``results`` against ``baseline``: latency
+    percentiles and peak memory more than ``threshold`` (a fraction) above
+    the baseline, and any increase in the query count
+    """
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        for metric in LATENCY_METRICS + ('peak_memory_kb',):
+            if metric in previous and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append(f'{name}: {metric} {previous[metric]} -> {current[metric]}')
+        if current['queries'] > previous.get('queries', current['queries']):
+            regressions.append(f"{name}: queries {previous['queries']} -> {current['queries']}")
+    return regressions
@@ -0,0 +1,205 @@
+"""
+Cached API responses with tag-based invalidation.
+
+``cache_response`` (for function views, under ``@api_view``) and
+``CachedResponseMixin`` (for generic views) serve successful JSON ``GET``
+responses from the cache selected by ``RESPONSE_CACHE``. A response is keyed
+by its host, path and query parameters, the caller's role scope and the
+current version of each tag it depends on, e.g. ``('jobs', 'tasks')``.
+
+Saving or deleting a ``Job``, ``JobTask``, ``Equipment`` or ``User`` replaces
+the version of its tag (see ``core.signals``), which makes every response
+cached under the old version unreachable at once; they simply expire. Code
+that writes those models without signals, such as ``QuerySet.update`` or
+``bulk_create``, must call ``bump_tags`` itself.
+
+Permissions are checked before the cache is consulted, and the role scope
+keeps responses apart whenever ``users.scopes`` would return different rows:
+admins and sales agents share responses per role, everyone else gets their
+own. Responses are rebuilt from the primary database, so a lagging replica
+can never store old rows under a freshly bumped version. If the cache is
+unavailable, responses are built as if nothing was cached.
+
+Every process must see the same tag versions, so enable the cache
+(``RESPONSE_CACHE_ENABLED``) only with a cache shared by all web and worker
+processes, such as Redis.
+"""
+import hashlib
+import json
+import logging
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from . import metrics
+from .routers import use_primary
+
+
+logger = logging.getLogger(__name__)
+
+TAG_KEY = 'response:tag:{}'
+CACHED_METHODS = ('GET', 'HEAD')
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE', 'default')]
+
+
+def _new_version():
+    # Random rather than a counter, so a flushed cache can never bring back
+    # a version whose responses are still stored
+    return uuid.uuid4().hex[:16]
+
+
+def tag_versions(tags):
+    """Return the current version of each tag, starting new ones for tags the cache lost"""
+    cache = get_cache()
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        versions.update(cache.get_many(missing))
+    return [versions[key] for key in keys]
+
+
+def _set_versions(tags):
+    try:
+        get_cache().set_many({TAG_KEY.format(tag): _new_version() for tag in tags}, None)
+    except Exception:
+        logger.warning('Could not invalidate cached responses tagged %s', ', '.join(tags), exc_info=True)
+
+
+def bump_tags(*tags):
+    """
+    Invalidate every response cached under ``tags``, now and again on
+    commit, so a concurrent request cannot re-cache rows read before it
+    """
+    if not tags:
+        return
+    _set_versions(tags)
+    transaction.on_commit(lambda: _set_versions(tags))
+
+
+def role_scope(user):
+    """Return the part of the key that keeps responses of users who see different rows apart"""
+    if not user.is_authenticated:
+        return 'anonymous'
+    if user.is_admin or user.is_sales_agent:
+        return f'role:{user.role}'
+    return f'user:{user.pk}'
+
+
+def response_key(request, tags, scope):
+    # Pagination links are absolute, so the host is part of the key; the
+    # accepted media type carries options such as the JSON indent
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    versions = ':'.join(tag_versions(tags))
+    digest = hashlib.sha1(repr((
+        request.get_host(), request.path, params, request.accepted_media_type, scope, versions,
+    )).encode()).hexdigest()
+    return f'response:{digest}'
+
+
+class CachedResponse(Response):
+    """
+    A response replayed from the cache: the cached body is sent as it is,
+    and ``data`` is only decoded from it if something reads it
+    """
+    def __init__(self, body):
+        self.body = body
+        super().__init__()
+
+    @property
+    def data(self):
+        return json.loads(self.body)
+
+    @data.setter
+    def data(self, value):
+        # Set by Response.__init__; the body is the data
+        pass
+
+    @property
+    def rendered_content(self):
+        self['Content-Type'] = self.accepted_renderer.media_type
+        return self.body
+
+
+def cached_response(request, tags, respond, timeout=None):
+    """
+    Return the cached response to ``request``, or build it with
+    ``respond()`` and cache its rendered body if it is a 200
+    """
+    if (
+        not getattr(settings, 'RESPONSE_CACHE_ENABLED', False)
+        or request.method not in CACHED_METHODS
+        or not isinstance(request.accepted_renderer, JSONRenderer)
+    ):
+        return respond()
+
+    view_name = request.resolver_match.view_name if request.resolver_match else request.path
+    cache = get_cache()
+    try:
+        # Versions are read before the response is built, so a bump while
+        # it is built leaves it under a version nobody asks for anymore
+        key = response_key(request, tags, role_scope(request.user))
+        body = cache.get(key)
+    except Exception:
+        logger.warning('Response cache unavailable', exc_info=True)
+        return respond()
+
+    if body is not None:
+        metrics.increment('cache.hits', view=view_name)
+        return CachedResponse(body)
+
+    metrics.increment('cache.misses', view=view_name)
+    with use_primary():
+        response = respond()
+    if response.status_code == 200 and isinstance(response, Response):
+        timeout = timeout if timeout is not None else getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+        def store(rendered):
+            try:
+                cache.set(key, rendered.content, timeout)
+            except Exception:
+                logger.warning('Response cache unavailable', exc_info=True)
+
+        response.add_post_render_callback(store)
+    return response
+
+
+def cache_response(tags, timeout=None):
+    """
+    Cache the responses of a function view; apply it below ``@api_view``::
+
+        @api_view(['GET'])
+        @permission_classes([IsAuthenticated])
+        @cache_response(tags=('jobs', 'tasks'))
+        def view(request): ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return cached_response(request, tags, lambda: view(request, *args, **kwargs), timeout)
+        return wrapper
+    return decorator
+
+
+class CachedResponseMixin:
+    """
+    Cache the ``GET`` responses of a generic view under ``cache_tags``
+    """
+    cache_tags = ()
+    cache_timeout = None
+
+    def get(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_tags, lambda: super(CachedResponseMixin, self).get(request, *args, **kwargs),
+            self.cache_timeout,
+        )
@@ -0,0 +1,73 @@
+"""
+PostgreSQL backend with an optional in-process connection pool.
+
+Without ``OPTIONS['pool']`` it behaves exactly like
+``django.db.backends.postgresql``. With it, opening a connection checks one
+out of the pool in ``core.db.pool`` and closing it returns it, so set
+``CONN_MAX_AGE`` to ``0`` and let the pool keep the connections::
+
+    'ENGINE': 'core.db.backends.postgresql',
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'pool': {'max_size': 10, 'timeout': 5}},
+"""
+from django.db.backends.postgresql import base, creation
+
+from core.db.pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the test database in use
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        return {} if options is True else dict(options)
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        options = self.pool_options
+        if options is None:
+            return super().get_new_connection(conn_params)
+
+        key = (
+            self.alias,
+            conn_params.get('dbname') or conn_params.get('database'),
+            conn_params.get('host'),
+            conn_params.get('port'),
+            conn_params.get('user'),
+        )
+        pool = get_pool(key, **options)
+        # Set as on a new connection; reused ones already carry this level
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+        connection = pool.get(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        self.pool = pool
+        return connection
+
+    def _close(self):
+        pool, self.pool = self.pool, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django keeps using a connection closed inside a transaction; never share it
+                return pool.discard(self.connection)
+            return pool.put(self.connection)
@@ -0,0 +1,213 @@
+"""
+In-process database connection pool.
+
+Each process keeps one ``ConnectionPool`` per database and connection
+parameters. A pool opens at most ``max_size`` connections; a checkout waits
+up to ``timeout`` seconds for one to be returned and then raises
+``PoolTimeout``. Idle connections are pinged before reuse once they have been
+idle for ``check_interval`` seconds, and closed instead of reused once they
+are older than ``max_lifetime`` seconds. Returned connections are rolled
+back, so no transaction leaks into the next checkout.
+
+Checkouts, waits, wait time, timeouts and opened/discarded connections are
+counted in ``core.metrics`` under ``db.pool.*``; ``pool_stats()`` reports the
+current size, idle, in-use and waiting counts of every pool. Idle connections
+are closed before the process forks (gunicorn ``--preload``, Celery prefork),
+and children start with their own pools.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+from core import metrics
+
+
+logger = logging.getLogger('jobops.db.pool')
+
+
+class PoolTimeout(OperationalError):
+    """
+    Raised when no connection became free within the pool's timeout
+    """
+
+
+class ConnectionPool:
+    """
+    A bounded LIFO pool of DB-API connections
+    """
+    def __init__(self, name, max_size=10, timeout=5.0, check_interval=30.0, max_lifetime=3600.0):
+        self.name = name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        # (connection, returned at); the most recently returned is reused first
+        self.idle = deque()
+        self.created = {}
+        self.size = 0
+        self.waiting = 0
+
+    def stats(self):
+        with self.condition:
+            return {
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'waiting': self.waiting,
+            }
+
+    def get(self, connect):
+        """Check out a connection, opening one with ``connect()`` if the pool has room"""
+        start = time.monotonic()
+        while True:
+            connection, returned_at = self.acquire(start)
+            if connection is None:
+                return self.open(connect)
+            if self.is_reusable(connection, returned_at):
+                metrics.increment('db.pool.checkouts', pool=self.name)
+                return connection
+            self.discard(connection)
+
+    def acquire(self, start):
+        """Take an idle connection, or reserve room for a new one (``None``), waiting if the pool is full"""
+        deadline = start + self.timeout
+        with self.condition:
+            waited = False
+            try:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        metrics.increment('db.pool.timeouts', pool=self.name)
+                        logger.warning('No connection free in pool %s after %ss', self.name, self.timeout)
+                        raise PoolTimeout(f'No connection free in pool {self.name} after {self.timeout}s')
+                    if not waited:
+                        waited = True
+                        self.waiting += 1
+                        metrics.increment('db.pool.waits', pool=self.name)
+                    self.condition.wait(remaining)
+            finally:
+                if waited:
+                    self.waiting -= 1
+                    metrics.increment('db.pool.wait_ms', (time.monotonic() - start) * 1000, pool=self.name)
+            if self.idle:
+                return self.idle.pop()
+            self.size += 1
+            return None, None
+
+    def open(self, connect):
+        try:
+            connection = connect()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created[id(connection)] = time.monotonic()
+        metrics.increment('db.pool.connections_opened', pool=self.name)
+        metrics.increment('db.pool.checkouts', pool=self.name)
+        return connection
+
+    def is_expired(self, connection):
+        created_at = self.created.get(id(connection))
+        return created_at is None or (
+            self.max_lifetime is not None and time.monotonic() - created_at > self.max_lifetime
+        )
+
+    def is_reusable(self, connection, returned_at):
+        if getattr(connection, 'closed', False) or self.is_expired(connection):
+            return False
+        if time.monotonic() - returned_at < self.check_interval:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception:
+            logger.info('Discarding a broken connection from pool %s', self.name)
+            return False
+        return True
+
+    def put(self, connection):
+        """Return a checked-out connection"""
+        reusable = not getattr(connection, 'closed', False) and not self.is_expired(connection) and self.pid == os.getpid()
+        if reusable:
+            try:
+                connection.rollback()
+            except Exception:
+                reusable = False
+        if not reusable:
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        """Close a checked-out connection and free its room in the pool"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.created.pop(id(connection), None)
+            self.size -= 1
+            self.condition.notify()
+        metrics.increment('db.pool.connections_discarded', pool=self.name)
+
+    def close_idle(self):
+        """Close every idle connection"""
+        with self.condition:
+            idle = list(self.idle)
+            self.idle.clear()
+        for connection, _ in idle:
+            self.discard(connection)
+
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(key, **options):
+    """Return this process's pool for ``key`` (``(alias, ...)``), creating it with ``options``"""
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[key] = ConnectionPool(key[0], **options)
+        return pool
+
+
+def close_pools(alias=None):
+    """Close the idle connections of every pool, or of the pools of ``alias``"""
+    with _lock:
+        pools = [pool for key, pool in _pools.items() if alias is None or key[0] == alias]
+    for pool in pools:
+        pool.close_idle()
+
+
+def pool_stats():
+    """Return the stats of every pool of this process by database alias"""
+    with _lock:
+        pools = list(_pools.items())
+    stats = {}
+    for key, pool in pools:
+        stats.setdefault(key[0], []).append(pool.stats())
+    return stats
+
+
+def _forget_pools():
+    # The child must not share the parent's sockets
+    _pools.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=close_pools, after_in_child=_forget_pools)
@@ -0,0 +1,178 @@
+"""
+Instrumentation for Celery tasks.
+
+``instrumented_task`` wraps a task function and records wall time, database
+query count and time, rows touched and chunk progress. Each run is emitted as
+a structured log line, counted in ``core.metrics`` and stored as a ``TaskRun``
+row that expires after ``TASK_RUN_TTL``. The task returns a compact dict
+instead of a free-form string.
+"""
+import functools
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from . import metrics
+
+
+logger = logging.getLogger('jobops.tasks')
+
+_current_run = ContextVar('current_task_run', default=None)
+
+
+class QueryStats:
+    """
+    Database execute wrapper that counts queries and accumulates their duration
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+@contextmanager
+def capture_queries(stats=None):
+    """Install ``stats`` as an execute wrapper on every configured connection"""
+    stats = stats or QueryStats()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+class TaskRunRecorder:
+    """
+    Collects the measurements for one task run
+    """
+    def __init__(self, task_name, task_id=None):
+        self.task_name = task_name
+        self.task_id = task_id
+        self.started_at = timezone.now()
+        self.rows = 0
+        self.chunks = 0
+        self.queries = QueryStats()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def add_rows(self, count):
+        """Record rows touched outside of chunked processing"""
+        self.rows += count
+
+    def chunk_done(self, rows=0, total=None):
+        """Record a processed chunk and log progress"""
+        self.chunks += 1
+        self.rows += rows
+        metrics.log_event(
+            logger, 'task.chunk', level=logging.DEBUG,
+            task=self.task_name, chunk=self.chunks, rows=self.rows, total=total,
+        )
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def as_result(self, status, extra=None):
+        """Return the compact result stored in the result backend"""
+        result = {
+            'task': self.task_name,
+            'status': status,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'duration_ms': round(self.duration * 1000, 2),
+            'queries': self.queries.count,
+            'query_ms': round(self.queries.duration * 1000, 2),
+        }
+        if extra:
+            result.update(extra)
+        return result
+
+
+def current_run():
+    """Return the recorder of the task running in this context, if any"""
+    return _current_run.get()
+
+
+def _celery_task_id():
+    try:
+        from celery import current_task
+    except ImportError:
+        return None
+    request = getattr(current_task, 'request', None)
+    return getattr(request, 'id', None)
+
+
+def _store_run(recorder, result, error=None):
+    ttl = getattr(settings, 'TASK_RUN_TTL', timedelta(days=7))
+    from .models import TaskRun
+    try:
+        TaskRun.objects.filter(task_name=recorder.task_name, expires_at__lt=timezone.now()).delete()
+        TaskRun.objects.create(
+            task_name=recorder.task_name,
+            task_id=recorder.task_id,
+            status=result['status'],
+            started_at=recorder.started_at,
+            duration_ms=result['duration_ms'],
+            query_count=result['queries'],
+            query_time_ms=result['query_ms'],
+            rows=recorder.rows,
+            chunks=recorder.chunks,
+            result=result,
+            error=error,
+            expires_at=recorder.started_at + ttl,
+        )
+    except DatabaseError:
+        logger.exception('Could not store task run for %s', recorder.task_name)
+
+
+def _record(recorder, status, extra=None, error=None):
+    result = recorder.as_result(status, extra)
+    metrics.increment('celery.task.runs', task=recorder.task_name, status=status)
+    metrics.increment('celery.task.rows', recorder.rows, task=recorder.task_name)
+    metrics.increment('celery.task.duration_ms', result['duration_ms'], task=recorder.task_name)
+    metrics.increment('celery.task.queries', recorder.queries.count, task=recorder.task_name)
+    metrics.log_event(
+        logger, 'task.finished', level=logging.INFO if status == 'success' else logging.ERROR,
+        error=error, **result,
+    )
+    _store_run(recorder, result, error)
+    return result
+
+
+def instrumented_task(func):
+    """
+    Instrument a task function; apply it below ``@shared_task``.
+
+    The wrapped function may return a dict of extra counters, which is merged
+    into the compact result.
+    """
+    task_name = f'{func.__module__}.{func.__name__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = TaskRunRecorder(task_name, _celery_task_id())
+        token = _current_run.set(recorder)
+        try:
+            with capture_queries(recorder.queries):
+                extra = func(*args, **kwargs)
+        except Exception as exc:
+            recorder.finish()
+            _record(recorder, 'failure', error=repr(exc))
+            raise
+        finally:
+            _current_run.reset(token)
+        recorder.finish()
+        return _record(recorder, 'success', extra)
+
+    return wrapper
@@ -0,0 +1,82 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.utils import load_backend
+
+from core.benchmark import percentile
+from core.db.pool import close_pools, pool_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the per-request cost of opening a new database connection against '
+        'persistent and pooled connections'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Simulated requests per mode and thread')
+        parser.add_argument('--threads', type=int, default=1, help='Threads sending requests concurrently')
+        parser.add_argument('--pool-size', type=int, default=4, help='Maximum connections of the pooled mode')
+
+    def handle(self, *args, **options):
+        modes = {
+            'new': {'CONN_MAX_AGE': 0},
+            'persistent': {'CONN_MAX_AGE': None},
+        }
+        if connection.vendor == 'postgresql':
+            modes['pooled'] = {
+                'ENGINE': 'core.db.backends.postgresql',
+                'CONN_MAX_AGE': 0,
+                'OPTIONS': {
+                    **connection.settings_dict['OPTIONS'],
+                    'pool': {'max_size': options['pool_size'], 'timeout': 30},
+                },
+            }
+        else:
+            self.stdout.write('Skipping the pooled mode: it needs PostgreSQL')
+
+        self.stdout.write(f"{'mode':<12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        results = {}
+        for mode, overrides in modes.items():
+            timings = self.run(mode, overrides, options['iterations'], options['threads'])
+            results[mode] = statistics.fmean(timings)
+            self.stdout.write(
+                f'{mode:<12} {results[mode]:>9.2f} {percentile(timings, 50):>9.2f} {percentile(timings, 95):>9.2f}'
+            )
+        for mode in [mode for mode in results if mode != 'new']:
+            self.stdout.write(f"{mode}: {results['new'] - results[mode]:.2f} ms saved per request")
+
+    def run(self, mode, overrides, iterations, threads):
+        settings_dict = {**connection.settings_dict, **overrides}
+        backend = load_backend(settings_dict['ENGINE'])
+        alias = f'benchmark_{mode}'
+
+        def work():
+            # One wrapper per thread, like django.db.connections
+            wrapper = backend.DatabaseWrapper(settings_dict, alias=alias)
+            timings = []
+            try:
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    # What a request does: connect (or reuse), query, then close_old_connections()
+                    wrapper.close_if_unusable_or_obsolete()
+                    with wrapper.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                    wrapper.close_if_unusable_or_obsolete()
+                    timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                wrapper.close()
+            return timings
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [executor.submit(work) for _ in range(threads)]
+            timings = [timing for future in futures for timing in future.result()]
+
+        if alias in pool_stats():
+            self.stdout.write(f'  pool: {pool_stats()[alias][0]}')
+            close_pools(alias)
+        return timings
@@ -0,0 +1,126 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from core.benchmark import compare, run_benchmarks
+from core.seed import USERNAME_PREFIX, SeedVolumes, seed
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the main API endpoints over a seeded dataset in a separate test database, '
+        'write the results as JSON and fail on regressions against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=10000, help='Jobs to seed')
+        parser.add_argument('--tasks-per-job', type=int, default=10, help='Tasks to seed per job')
+        parser.add_argument('--equipment', type=int, default=1000, help='Equipment items to seed')
+        parser.add_argument('--technicians', type=int, default=100, help='Technicians to seed')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the generated data')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help=(
+                'Endpoint to benchmark (repeatable). Defaults to all, except endpoints that write data '
+                'with --use-current-db.'
+            ),
+        )
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint')
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help='Serve responses from the response cache where the views use it, instead of bypassing it',
+        )
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='Compare against the results in this JSON file')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed slowdown against the baseline as a fraction (default 0.2, i.e. 20%%)',
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Keep the benchmark database, and reuse an already seeded one instead of seeding again',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false', dest='interactive',
+            help='Destroy an existing benchmark database without asking',
+        )
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help=(
+                'Benchmark the configured database as it is, without creating or seeding a test database. '
+                'Endpoints that write data only run if named with --endpoint.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        if options['use_current_db']:
+            results = self.benchmark(options)
+        else:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(
+                verbosity=options['verbosity'], autoclobber=not options['interactive'], keepdb=options['keepdb'],
+            )
+            try:
+                self.seed(options)
+                results = self.benchmark(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=options['verbosity'], keepdb=options['keepdb'])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare(baseline, results, threshold=options['threshold'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def seed(self, options):
+        if options['keepdb'] and User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            self.stdout.write('Reusing the seeded benchmark database')
+            return
+        volumes = SeedVolumes(
+            jobs=options['jobs'],
+            tasks_per_job=options['tasks_per_job'],
+            equipment=options['equipment'],
+            technicians=options['technicians'],
+        )
+        self.stdout.write(f'Seeding {volumes}')
+        seed(volumes, random_seed=options['seed'], chunk_size=options['chunk_size'], log=self.log)
+
+    def benchmark(self, options):
+        self.stdout.write(
+            f"{'endpoint':<24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'queries':>8} {'peak KiB':>10}"
+        )
+        # DEBUG would keep every query in memory; the test client's host must be allowed
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                return run_benchmarks(
+                    options['endpoints'], iterations=options['iterations'], warmup=options['warmup'], log=self.report,
+                    response_cache=options['response_cache'],
+                    # Never change real data unless asked to by name
+                    writes=not options['use_current_db'],
+                )
+            except (ValueError, RuntimeError) as e:
+                raise CommandError(str(e))
+
+    def log(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(f'  {message}')
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:<24} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+            f"{result['max_ms']:>9.2f} {result['queries']:>8} {result['peak_memory_kb']:>10.1f}"
+        )
@@ -0,0 +1,86 @@
+import json
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.replay import load_requests, mint_tokens, replay
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a JSONL log of API requests against a running server and report throughput '
+        'and p50/p95/p99 latency per URL name'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='JSONL file with one {"method", "path", "body", "role"} request per line')
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Server to send the requests to')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent workers')
+        parser.add_argument(
+            '--mode', choices=['thread', 'asyncio'], default='thread',
+            help='Run the workers as threads or as asyncio tasks',
+        )
+        parser.add_argument('--repeat', type=int, default=1, help='Replay the log this many times')
+        parser.add_argument('--limit', type=int, help='Replay only the first N requests of the log')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for each response')
+        parser.add_argument(
+            '--user', action='append', default=[], metavar='ROLE=USERNAME',
+            help='Authenticate requests of ROLE as USERNAME (repeatable). '
+                 'Defaults to the first active user with the role.',
+        )
+        parser.add_argument('--output', help='Also write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['repeat'] < 1:
+            raise CommandError('--concurrency and --repeat must be at least 1')
+        try:
+            usernames = dict(value.split('=', 1) for value in options['user'])
+        except ValueError:
+            raise CommandError('--user must look like ROLE=USERNAME')
+
+        try:
+            with open(options['log']) as f:
+                requests, skipped = load_requests(islice(f, options['limit']))
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['log']}: {e}")
+        if not requests:
+            raise CommandError(f"No requests to replay in {options['log']}")
+
+        try:
+            # Tokens are signed with this project's SECRET_KEY; the server must share it
+            tokens = mint_tokens({request.role for request in requests}, usernames)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Replaying {len(requests) * options['repeat']} requests against {options['base_url']} "
+            f"with {options['concurrency']} {options['mode']} workers"
+        )
+        report = replay(
+            requests, options['base_url'], tokens,
+            concurrency=options['concurrency'], mode=options['mode'],
+            repeat=options['repeat'], timeout=options['timeout'],
+        )
+        report.skipped = skipped
+        results = report.as_dict()
+        self.write_report(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def write_report(self, results):
+        self.stdout.write(
+            f"{results['requests']} requests in {results['elapsed_s']:.2f}s: "
+            f"{results['throughput_rps']:.1f} req/s, {results['errors']} errors, {results['skipped']} unusable lines"
+        )
+        self.stdout.write(
+            f"  {'url name':<36} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+        )
+        for name, endpoint in results['endpoints'].items():
+            line = (
+                f"  {name:<36} {endpoint['requests']:>8} {endpoint['errors']:>7} "
+                f"{endpoint['p50_ms']:>9.2f} {endpoint['p95_ms']:>9.2f} {endpoint['p99_ms']:>9.2f}"
+            )
+            self.stdout.write(self.style.ERROR(line) if endpoint['errors'] else line)
@@ -0,0 +1,81 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seed import PASSWORD, SeedVolumes, Skew, has_seed_data, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a large synthetic dataset (users, equipment, jobs, tasks, task equipment and bookings) '
+        'with chunked bulk inserts, or COPY on PostgreSQL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=100000, help='Jobs to generate')
+        parser.add_argument('--tasks-per-job', type=int, default=5, help='Average tasks per job')
+        parser.add_argument('--equipment', type=int, default=1000, help='Equipment items to generate')
+        parser.add_argument('--technicians', type=int, default=200, help='Technicians to generate')
+        parser.add_argument('--sales-agents', type=int, default=20, help='Sales agents to generate')
+        parser.add_argument('--admins', type=int, default=2, help='Admins to generate')
+        parser.add_argument(
+            '--hot-technicians', type=float, default=1.0,
+            help='Zipf exponent of jobs per technician; 0 spreads jobs evenly (default 1.0)',
+        )
+        parser.add_argument(
+            '--popular-equipment', type=float, default=1.0,
+            help='Zipf exponent of task equipment per item; 0 spreads it evenly (default 1.0)',
+        )
+        parser.add_argument('--overdue-ratio', type=float, default=0.1, help='Share of open jobs scheduled in the past')
+        parser.add_argument('--unassigned-ratio', type=float, default=0.05, help='Share of jobs without a technician')
+        parser.add_argument('--max-equipment-per-task', type=int, default=2, help='Most equipment items a task requires')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed generates the same data')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per insert')
+        parser.add_argument(
+            '--method', choices=['auto', 'bulk_create', 'copy'], default='auto',
+            help='How rows are written; auto uses COPY on PostgreSQL and bulk_create elsewhere',
+        )
+        parser.add_argument('--flush', action='store_true', help='Remove ALL existing data first (manage.py flush)')
+
+    def handle(self, *args, **options):
+        for name in ('overdue_ratio', 'unassigned_ratio'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be between 0 and 1")
+
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+        elif has_seed_data():
+            raise CommandError('The database already contains seeded data; use --flush to start over')
+
+        volumes = SeedVolumes(
+            jobs=options['jobs'],
+            tasks_per_job=options['tasks_per_job'],
+            equipment=options['equipment'],
+            technicians=options['technicians'],
+            sales_agents=options['sales_agents'],
+            admins=options['admins'],
+        )
+        skew = Skew(
+            hot_technicians=options['hot_technicians'],
+            popular_equipment=options['popular_equipment'],
+            overdue_ratio=options['overdue_ratio'],
+            unassigned_ratio=options['unassigned_ratio'],
+            max_equipment_per_task=options['max_equipment_per_task'],
+        )
+        start = time.perf_counter()
+        try:
+            counts = seed(
+                volumes, skew=skew, random_seed=options['seed'], chunk_size=options['chunk_size'],
+                method=options['method'], log=self.log if options['verbosity'] > 1 else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        elapsed = time.perf_counter() - start
+        summary = ', '.join(f'{count} {name}' for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Seeded {summary} in {elapsed:.1f}s'))
+        self.stdout.write(f"Users log in with the password '{PASSWORD}'")
+
+    def log(self, message):
+        self.stdout.write(f'  {message}')
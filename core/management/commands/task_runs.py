@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import TaskRun
+
+
+class Command(BaseCommand):
+    help = 'Print recent run histories for the scheduled Celery tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--task', action='append', dest='tasks',
+            help='Task name to show (repeatable). Defaults to every task in CELERY_BEAT_SCHEDULE.',
+        )
+        parser.add_argument('--limit', type=int, default=10, help='Runs to show per task')
+
+    def handle(self, *args, **options):
+        task_names = options['tasks'] or sorted(
+            {entry['task'] for entry in getattr(settings, 'CELERY_BEAT_SCHEDULE', {}).values()}
+        )
+
+        for task_name in task_names:
+            runs = TaskRun.objects.filter(task_name=task_name)[:options['limit']]
+            self.stdout.write(self.style.MIGRATE_HEADING(task_name))
+            if not runs:
+                self.stdout.write('  no recorded runs')
+                continue
+
+            self.stdout.write(
+                f"  {'started':<20} {'status':<8} {'ms':>10} {'queries':>8} {'query ms':>10} {'rows':>8} {'chunks':>7}"
+            )
+            for run in runs:
+                line = (
+                    f"  {run.started_at:%Y-%m-%d %H:%M:%S} {run.status:<8} {run.duration_ms:>10.1f} "
+                    f"{run.query_count:>8} {run.query_time_ms:>10.1f} {run.rows:>8} {run.chunks:>7}"
+                )
+                self.stdout.write(line if run.status == 'success' else self.style.ERROR(line))
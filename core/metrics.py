@@ -0,0 +1,53 @@
+"""
+In-process metrics counters and structured log helpers.
+
+Counters are kept per process and keyed by name plus labels. They are cheap
+enough to update on hot paths and can be scraped with ``snapshot()``.
+"""
+import json
+import logging
+import threading
+from collections import defaultdict
+
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Add ``value`` to the counter ``name`` with the given labels"""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def get_counter(name, **labels):
+    """Return the current value of a counter"""
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def snapshot():
+    """Return all counters as ``{'name{label=value}': value}``"""
+    with _lock:
+        items = list(_counters.items())
+    data = {}
+    for (name, labels), value in items:
+        label_str = ','.join(f'{key}={val}' for key, val in labels)
+        data[f'{name}{{{label_str}}}' if label_str else name] = value
+    return data
+
+
+def reset():
+    """Clear all counters (used by tests)"""
+    with _lock:
+        _counters.clear()
+
+
+def log_event(logger, event, level=logging.INFO, **fields):
+    """Emit a single JSON log line for ``event``"""
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({'event': event, **fields}, default=str, sort_keys=True))
@@ -0,0 +1,241 @@
+"""
+Per-request query and timing instrumentation.
+
+``RequestMetricsMiddleware`` records, for a sample of requests, the number
+and total duration of database queries, the time spent in DRF serializers
+(``.data`` and ``is_valid()``), the view time and the total time. Each sampled
+request is emitted as a structured log line keyed by the resolved URL name,
+counted in ``core.metrics`` and, unless disabled, returned to the client as a
+``Server-Timing`` header.
+
+The middleware is toggled by ``REQUEST_METRICS_ENABLED``; when it is off it
+removes itself at startup and costs nothing. ``REQUEST_METRICS_SAMPLE_RATE``
+is the share of requests that are measured. List it first in ``MIDDLEWARE``
+so the total and query counts include the other middleware.
+
+``NPlusOneMiddleware`` is the development and staging counterpart: with
+``NPLUSONE_DETECTION`` set to ``'log'`` or ``'raise'`` it checks every request
+for N+1 query patterns (see ``core.nplusone``).
+
+``SlowQuerySourceMiddleware`` tags queries with the view running them for
+the slow-query log (see ``core.slowqueries``).
+
+``ReplicaRoutingMiddleware`` lets safe requests read from a replica when
+``DATABASE_REPLICAS`` are configured (see ``core.routers``).
+"""
+import functools
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+from .instrumentation import QueryStats, capture_queries
+from .nplusone import NPlusOneError, record_query_shapes
+from .routers import get_replicas, routing
+from .slowqueries import reset_source, set_source
+
+
+logger = logging.getLogger('jobops.requests')
+nplusone_logger = logging.getLogger('jobops.nplusone')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Measurements of one request
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = QueryStats()
+        self.serializer = 0.0
+        self.serializer_depth = 0
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+
+    @property
+    def total(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def view(self):
+        if self.view_started is None:
+            return 0.0
+        return (self.view_finished or self.finished or time.perf_counter()) - self.view_started
+
+    def as_dict(self):
+        return {
+            'queries': self.queries.count,
+            'db_ms': round(self.queries.duration * 1000, 2),
+            'serializer_ms': round(self.serializer * 1000, 2),
+            'view_ms': round(self.view * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+    def server_timing(self):
+        values = self.as_dict()
+        return ', '.join([
+            f'db;dur={values["db_ms"]};desc="{values["queries"]} queries"',
+            f'serializer;dur={values["serializer_ms"]}',
+            f'view;dur={values["view_ms"]}',
+            f'total;dur={values["total_ms"]}',
+        ])
+
+
+def current_metrics():
+    """Return the metrics of the request being measured in this context, if any"""
+    return _current.get()
+
+
+def _timed(method):
+    """Add the time spent in a serializer method to the current request; nested calls count once"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        request_metrics = _current.get()
+        if request_metrics is None:
+            return method(*args, **kwargs)
+        request_metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            request_metrics.serializer_depth -= 1
+            if not request_metrics.serializer_depth:
+                request_metrics.serializer += time.perf_counter() - start
+    wrapper._request_metrics = True
+    return wrapper
+
+
+def install_serializer_timing():
+    """Time ``BaseSerializer.data`` and ``is_valid``; idempotent"""
+    from rest_framework.serializers import BaseSerializer
+
+    if not getattr(BaseSerializer.is_valid, '_request_metrics', False):
+        BaseSerializer.is_valid = _timed(BaseSerializer.is_valid)
+        BaseSerializer.data = property(_timed(BaseSerializer.data.fget))
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, database, serializer and view time of sampled requests
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', True)
+        install_serializer_timing()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        try:
+            with capture_queries(request_metrics.queries):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        request_metrics.finished = time.perf_counter()
+
+        if self.server_timing:
+            response['Server-Timing'] = request_metrics.server_timing()
+        self.record(request, response, request_metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses come through here before they are rendered
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.view_finished = time.perf_counter()
+        return response
+
+    def record(self, request, response, request_metrics):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else '<unresolved>'
+        values = request_metrics.as_dict()
+        metrics.increment('http.requests', url_name=url_name, status=response.status_code)
+        metrics.increment('http.request.queries', values['queries'], url_name=url_name)
+        metrics.increment('http.request.db_ms', values['db_ms'], url_name=url_name)
+        metrics.increment('http.request.duration_ms', values['total_ms'], url_name=url_name)
+        metrics.log_event(
+            logger, 'request.finished',
+            url_name=url_name, method=request.method, status=response.status_code, **values,
+        )
+
+
+class NPlusOneMiddleware:
+    """
+    Log or raise on N+1 query patterns; for development and staging only
+    """
+    def __init__(self, get_response):
+        self.mode = getattr(settings, 'NPLUSONE_DETECTION', 'off')
+        if self.mode not in ('log', 'raise'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_query_shapes() as recorder:
+            response = self.get_response(request)
+        patterns = recorder.report()
+        if not patterns:
+            return response
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.view_name if match else '<unresolved>'
+        if self.mode == 'raise':
+            raise NPlusOneError(patterns)
+        for pattern in patterns:
+            metrics.log_event(
+                nplusone_logger, 'request.n_plus_one', level=logging.WARNING,
+                url_name=url_name, method=request.method, **pattern.as_dict(),
+            )
+        return response
+
+
+class SlowQuerySourceMiddleware:
+    """
+    Record the resolved view name as the source of slow queries
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_LOG_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = set_source(f'{request.method} {request.path}')
+        try:
+            return self.get_response(request)
+        finally:
+            reset_source(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        set_source(request.resolver_match.view_name)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Allow safe requests to read from a replica until they write
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not get_replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routing(replica_reads=request.method in self.SAFE_METHODS):
+            return self.get_response(request)
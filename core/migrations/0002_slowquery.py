@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveIntegerField(unique=True)),
+                ('shape_hash', models.CharField(max_length=40)),
+                ('sql', models.TextField(help_text='Normalized SQL')),
+                ('params', models.JSONField(blank=True, default=list, help_text='Redacted parameters')),
+                ('plan', models.TextField(blank=True)),
+                ('duration_ms', models.FloatField()),
+                ('source', models.CharField(blank=True, help_text='View or Celery task that ran the query', max_length=200)),
+                ('call_site', models.CharField(blank=True, max_length=255)),
+                ('database', models.CharField(default='default', max_length=100)),
+                ('captured_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Slow Query',
+                'verbose_name_plural': 'Slow Queries',
+                'db_table': 'slow_queries',
+                'ordering': ['-duration_ms'],
+                'indexes': [models.Index(fields=['shape_hash', 'duration_ms'], name='slow_queries_shape_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import models
+
+
+class TaskRun(models.Model):
+    """
+    Structured record of a single instrumented Celery task run
+    """
+    STATUS_CHOICES = [
+        ('success', 'Success'),
+        ('failure', 'Failure'),
+    ]
+    
+    task_name = models.CharField(max_length=200)
+    task_id = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    started_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField(default=0)
+    query_time_ms = models.FloatField(default=0)
+    rows = models.PositiveIntegerField(default=0)
+    chunks = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, null=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'task_runs'
+        verbose_name = 'Task Run'
+        verbose_name_plural = 'Task Runs'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['task_name', 'started_at'], name='task_runs_name_started_idx'),
+            models.Index(fields=['expires_at'], name='task_runs_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.task_name} at {self.started_at:%Y-%m-%d %H:%M:%S} ({self.status})"
+
+
+class SlowQuery(models.Model):
+    """
+    Sampled slow SQL statement with its plan; one slot of a fixed-size ring buffer
+    """
+    slot = models.PositiveIntegerField(unique=True)
+    shape_hash = models.CharField(max_length=40)
+    sql = models.TextField(help_text='Normalized SQL')
+    params = models.JSONField(default=list, blank=True, help_text='Redacted parameters')
+    plan = models.TextField(blank=True)
+    duration_ms = models.FloatField()
+    source = models.CharField(max_length=200, blank=True, help_text='View or Celery task that ran the query')
+    call_site = models.CharField(max_length=255, blank=True)
+    database = models.CharField(max_length=100, default='default')
+    captured_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'slow_queries'
+        verbose_name = 'Slow Query'
+        verbose_name_plural = 'Slow Queries'
+        ordering = ['-duration_ms']
+        indexes = [
+            models.Index(fields=['shape_hash', 'duration_ms'], name='slow_queries_shape_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms from {self.source or self.call_site} at {self.captured_at:%Y-%m-%d %H:%M:%S}"
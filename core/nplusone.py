@@ -0,0 +1,138 @@
+"""
+N+1 query pattern detection.
+
+``QueryShapeRecorder`` normalizes every SQL statement run while it is active
+into a query shape (placeholder lists collapsed, literals replaced) and
+records the Python call site that issued it: the innermost frame of project
+code, e.g. ``JobListSerializer.get_task_count``. Any shape that runs more
+than ``NPLUSONE_THRESHOLD`` times is reported as an N+1 pattern.
+
+Use ``no_n_plus_one()`` in tests (also available as the
+``assert_no_n_plus_one`` pytest fixture) to fail when a block runs one. In
+development and staging, ``core.middleware.NPlusOneMiddleware`` checks every
+request and logs or raises according to ``NPLUSONE_DETECTION``.
+"""
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def normalize_sql(sql):
+    """Return the shape of ``sql``: the statement with its values abstracted away"""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+def get_threshold():
+    return getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+
+
+def _is_project_file(filename, root, skip):
+    return (
+        filename.startswith(root)
+        and os.path.abspath(filename) not in skip
+        and f'{os.sep}site-packages{os.sep}' not in filename
+    )
+
+
+def call_site(root=None, skip=()):
+    """
+    Describe the innermost frame of project code on the current stack,
+    ignoring this module and the files in ``skip``
+    """
+    root = root or str(settings.BASE_DIR)
+    skip = {_THIS_FILE, *skip}
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if _is_project_file(code.co_filename, root, skip):
+            name = getattr(code, 'co_qualname', code.co_name)
+            return f'{name} ({os.path.relpath(code.co_filename, root)}:{frame.f_lineno})'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class NPlusOne:
+    """
+    A query shape that ran more often than the threshold
+    """
+    def __init__(self, shape, count, call_sites):
+        self.shape = shape
+        self.count = count
+        self.call_sites = call_sites
+
+    def __str__(self):
+        sites = ', '.join(f'{site} x{count}' for site, count in self.call_sites.most_common())
+        return f'{self.count} x {self.shape}\n    from {sites}'
+
+    def as_dict(self):
+        return {'shape': self.shape, 'count': self.count, 'call_sites': dict(self.call_sites)}
+
+
+class QueryShapeRecorder:
+    """
+    Database execute wrapper that counts query shapes and their call sites
+    """
+    def __init__(self):
+        self.root = str(settings.BASE_DIR)
+        self.shapes = Counter()
+        self.call_sites = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = normalize_sql(sql)
+        self.shapes[shape] += 1
+        self.call_sites[shape][call_site(self.root)] += 1
+        return execute(sql, params, many, context)
+
+    def report(self, threshold=None):
+        """Return the shapes that ran more than ``threshold`` times, most frequent first"""
+        threshold = get_threshold() if threshold is None else threshold
+        return [
+            NPlusOne(shape, count, self.call_sites[shape])
+            for shape, count in self.shapes.most_common()
+            if count > threshold
+        ]
+
+
+@contextmanager
+def record_query_shapes(recorder=None):
+    """Install ``recorder`` as an execute wrapper on every configured connection"""
+    recorder = recorder or QueryShapeRecorder()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+
+
+class NPlusOneError(AssertionError):
+    """
+    Raised when a checked block runs an N+1 query pattern
+    """
+    def __init__(self, patterns):
+        self.patterns = patterns
+        super().__init__('N+1 query patterns detected:\n' + '\n'.join(str(pattern) for pattern in patterns))
+
+
+@contextmanager
+def no_n_plus_one(threshold=None):
+    """Fail with ``NPlusOneError`` if the block runs any query shape more than ``threshold`` times"""
+    with record_query_shapes() as recorder:
+        yield recorder
+    patterns = recorder.report(threshold)
+    if patterns:
+        raise NPlusOneError(patterns)
@@ -0,0 +1,312 @@
+"""
+Request-log replay.
+
+``replay`` sends the requests of a JSONL log to a running server and
+measures them. Each line is one request::
+
+    {"method": "GET", "path": "/api/jobs/?status=pending", "role": "technician"}
+    {"method": "POST", "path": "/api/tasks/12/update-status/", "body": {"status": "in_progress"}, "role": "technician"}
+
+``role`` selects the user the request is authenticated as (a JWT is minted
+per role, for the first active user with that role unless another is
+chosen); leave it out for anonymous requests. Requests are sent by
+``concurrency`` workers, either threads with one ``http.client`` connection
+each or asyncio tasks with one keep-alive stream each, and latencies are
+reported per URL name as resolved by this project's URLconf. Only the
+standard library is used, so the tool runs wherever the project does.
+"""
+import asyncio
+import http.client
+import json
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.urls import Resolver404, resolve
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import User
+
+from .benchmark import percentile
+
+
+ANONYMOUS = 'anonymous'
+
+
+@dataclass
+class LoggedRequest:
+    """
+    One request of the log
+    """
+    method: str
+    path: str
+    body: object = None
+    role: str = ANONYMOUS
+    url_name: str = ''
+
+    def encode(self):
+        return json.dumps(self.body).encode() if self.body is not None else b''
+
+
+@dataclass
+class Sample:
+    """
+    The outcome of one replayed request; ``status`` is ``None`` on connection errors
+    """
+    url_name: str
+    status: int
+    duration: float
+
+
+@dataclass
+class ReplayReport:
+    """
+    Throughput and per URL name latency of a replay
+    """
+    samples: list = field(default_factory=list)
+    elapsed: float = 0.0
+    skipped: int = 0
+
+    def as_dict(self):
+        by_name = defaultdict(list)
+        for sample in self.samples:
+            by_name[sample.url_name].append(sample)
+        return {
+            'requests': len(self.samples),
+            'errors': sum(1 for sample in self.samples if is_error(sample)),
+            'skipped': self.skipped,
+            'elapsed_s': round(self.elapsed, 3),
+            'throughput_rps': round(len(self.samples) / self.elapsed, 2) if self.elapsed else 0.0,
+            'endpoints': {name: summarize(samples) for name, samples in sorted(by_name.items())},
+        }
+
+
+def is_error(sample):
+    return sample.status is None or sample.status >= 400
+
+
+def summarize(samples):
+    durations = [sample.duration * 1000 for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if is_error(sample)),
+        'p50_ms': round(percentile(durations, 50), 2),
+        'p95_ms': round(percentile(durations, 95), 2),
+        'p99_ms': round(percentile(durations, 99), 2),
+        'mean_ms': round(sum(durations) / len(durations), 2),
+    }
+
+
+def url_name(path):
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return '<unresolved>'
+
+
+def load_requests(lines):
+    """Parse JSONL ``lines``; return the requests and the number of unusable lines"""
+    requests, skipped = [], 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            request = LoggedRequest(
+                method=data['method'].upper(),
+                path=data['path'],
+                body=data.get('body'),
+                role=data.get('role') or ANONYMOUS,
+            )
+        except (ValueError, KeyError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        request.url_name = url_name(request.path)
+        requests.append(request)
+    return requests, skipped
+
+
+def mint_tokens(roles, usernames=None):
+    """
+    Return an access token per role, for the user named in ``usernames``
+    (role to username) or the first active user with that role
+    """
+    usernames = usernames or {}
+    tokens = {}
+    for role in roles:
+        if role == ANONYMOUS:
+            continue
+        users = User.objects.filter(is_active=True)
+        user = (
+            users.filter(username=usernames[role]).first() if role in usernames
+            else users.filter(role=role).order_by('id').first()
+        )
+        if user is None:
+            raise ValueError(f'No active user to authenticate as {role!r}')
+        tokens[role] = str(RefreshToken.for_user(user).access_token)
+    return tokens
+
+
+def request_headers(request, tokens, host):
+    headers = {'Host': host, 'Accept': 'application/json', 'Connection': 'keep-alive'}
+    if request.body is not None:
+        headers['Content-Type'] = 'application/json'
+    if request.role in tokens:
+        headers['Authorization'] = f'Bearer {tokens[request.role]}'
+    return headers
+
+
+class ThreadWorkers:
+    """
+    Replays with ``concurrency`` threads, each holding one HTTP connection
+    """
+    def __init__(self, base_url, tokens, concurrency, timeout):
+        self.url = urlsplit(base_url)
+        self.tokens = tokens
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    def connect(self):
+        connection_class = http.client.HTTPSConnection if self.url.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.url.hostname, self.url.port, timeout=self.timeout)
+
+    def send(self, conn, request):
+        start = time.perf_counter()
+        try:
+            conn.request(
+                request.method, request.path, body=request.encode(),
+                headers=request_headers(request, self.tokens, self.url.netloc),
+            )
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            status = None
+        return Sample(request.url_name, status, time.perf_counter() - start)
+
+    def run(self, requests):
+        lock = threading.Lock()
+        pending = iter(requests)
+        samples = []
+
+        def work():
+            conn = self.connect()
+            try:
+                while True:
+                    with lock:
+                        request = next(pending, None)
+                    if request is None:
+                        return
+                    sample = self.send(conn, request)
+                    with lock:
+                        samples.append(sample)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples
+
+
+class AsyncioWorkers:
+    """
+    Replays with ``concurrency`` asyncio tasks, each holding one keep-alive
+    HTTP/1.1 stream
+    """
+    def __init__(self, base_url, tokens, concurrency, timeout):
+        self.url = urlsplit(base_url)
+        self.tokens = tokens
+        self.concurrency = concurrency
+        self.timeout = timeout
+
+    async def connect(self):
+        https = self.url.scheme == 'https'
+        return await asyncio.open_connection(self.url.hostname, self.url.port or (443 if https else 80), ssl=https or None)
+
+    async def read_response(self, reader):
+        """Read one response; return its status and whether the stream can be reused"""
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError('Connection closed by the server')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if not size:
+                    break
+        elif 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        else:
+            await reader.read()
+            keep_alive = False
+        return status, keep_alive
+
+    async def send(self, stream, request):
+        reader, writer = stream
+        body = request.encode()
+        headers = request_headers(request, self.tokens, self.url.netloc)
+        headers['Content-Length'] = str(len(body))
+        head = f'{request.method} {request.path} HTTP/1.1\r\n' + ''.join(
+            f'{name}: {value}\r\n' for name, value in headers.items()
+        )
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+        return await self.read_response(reader)
+
+    async def work(self, pending, samples):
+        stream = None
+        try:
+            for request in pending:
+                start = time.perf_counter()
+                try:
+                    if stream is None:
+                        stream = await asyncio.wait_for(self.connect(), self.timeout)
+                    status, keep_alive = await asyncio.wait_for(self.send(stream, request), self.timeout)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status, keep_alive = None, False
+                samples.append(Sample(request.url_name, status, time.perf_counter() - start))
+                if not keep_alive and stream is not None:
+                    stream[1].close()
+                    stream = None
+        finally:
+            if stream is not None:
+                stream[1].close()
+
+    async def replay(self, requests):
+        # One shared iterator: each request is taken by whichever task is free
+        pending = iter(requests)
+        samples = []
+        await asyncio.gather(*(self.work(pending, samples) for _ in range(self.concurrency)))
+        return samples
+
+    def run(self, requests):
+        return asyncio.run(self.replay(requests))
+
+
+WORKERS = {'thread': ThreadWorkers, 'asyncio': AsyncioWorkers}
+
+
+def replay(requests, base_url, tokens, concurrency=8, mode='thread', repeat=1, timeout=30):
+    """Send ``requests`` (``repeat`` times over) to ``base_url``; return a ``ReplayReport``"""
+    workers = WORKERS[mode](base_url, tokens, concurrency, timeout)
+    requests = [request for _ in range(repeat) for request in requests]
+    start = time.perf_counter()
+    samples = workers.run(requests)
+    return ReplayReport(samples=samples, elapsed=time.perf_counter() - start)
@@ -0,0 +1,172 @@
+"""
+Primary/replica database routing.
+
+With ``DATABASE_REPLICAS`` configured, ``PrimaryReplicaRouter`` sends reads
+to a replica only while replica reads are allowed in the current context:
+``ReplicaRoutingMiddleware`` allows them for safe (GET, HEAD, OPTIONS)
+requests, and ``use_replica()`` does so for other code such as reports.
+Everything else reads from the primary, ``default``.
+
+Once a context writes through the ORM (including ``select_for_update()``)
+it is pinned: its remaining reads go to the primary too, so a request sees
+its own writes. Use ``use_primary()`` around reads that must be fresh, e.g.
+before raw SQL writes.
+
+Replicas lagging more than ``REPLICA_MAX_LAG`` seconds behind the primary
+(checked at most every ``REPLICA_LAG_CHECK_INTERVAL`` seconds per process) or
+failing the check are skipped; without a healthy replica reads fall back to
+the primary.
+"""
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL standby lag; 0 when the standby has replayed everything it received
+PG_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class RoutingState:
+    """
+    Replica routing of one request or block
+    """
+    def __init__(self, replica_reads):
+        self.replica_reads = replica_reads
+        self.pinned = False
+        # Chosen on the first read, so every read of the context sees the same snapshot
+        self.replica = None
+
+    @property
+    def use_replica(self):
+        return self.replica_reads and not self.pinned
+
+
+_state = ContextVar('db_routing', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def routing(replica_reads):
+    token = _state.set(RoutingState(replica_reads))
+    try:
+        yield _state.get()
+    finally:
+        _state.reset(token)
+
+
+def use_replica():
+    """Allow reads in the block to go to a replica until something writes"""
+    return routing(replica_reads=True)
+
+
+def use_primary():
+    """Read from the primary in the block"""
+    return routing(replica_reads=False)
+
+
+def pin_to_primary():
+    """Send the remaining reads of the current context to the primary"""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+def is_pinned():
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+class ReplicaLagMonitor:
+    """
+    Per-process cache of replica lag measurements
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def measure(self, alias):
+        """Return the lag of ``alias`` in seconds; ``None`` if it cannot be measured"""
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(PG_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.warning('Could not check the lag of replica %s', alias, exc_info=True)
+            return None
+
+    def lag(self, alias):
+        interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+        now = time.monotonic()
+        with self.lock:
+            checked_at, lag = self.checked.get(alias, (None, None))
+            if checked_at is not None and now - checked_at < interval:
+                return lag
+        lag = self.measure(alias)
+        with self.lock:
+            self.checked[alias] = (now, lag)
+        return lag
+
+    def is_healthy(self, alias):
+        lag = self.lag(alias)
+        return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG', 5)
+
+    def reset(self):
+        with self.lock:
+            self.checked.clear()
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+def healthy_replicas():
+    return [alias for alias in get_replicas() if lag_monitor.is_healthy(alias)]
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads to a healthy replica where allowed, everything else to the primary
+    """
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            replicas = healthy_replicas()
+            state.replica = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in get_replicas():
+            return False
+        return None
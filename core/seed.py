@@ -0,0 +1,359 @@
+"""
+Synthetic data for development and benchmarks.
+
+``seed`` generates users, equipment, jobs, tasks, task equipment links and the
+equipment bookings of open jobs. Rows are written in chunks, with
+``bulk_create`` or, on PostgreSQL, ``COPY``, so model ``save()`` and signals
+are skipped: the values they would derive (``overdue``, ``completed_at``,
+bookings) are computed here instead, and the equipment catalog version and
+the cached response tags are bumped at the end. The same ``random_seed``
+always produces the same data.
+
+``Skew`` shapes the data like production: a few hot technicians get most of
+the jobs and a few popular items most of the bookings (Zipf weights; ``0``
+is uniform), and ``overdue_ratio`` of the open jobs are scheduled in the past.
+Jobs are scheduled on booking-window boundaries so an item is never booked
+twice for overlapping windows.
+"""
+import io
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from equipment.availability import RELEASED_STATUSES, booking_window
+from equipment.cache import bump_catalog_version
+from equipment.models import Equipment, EquipmentBooking
+from jobs.models import Job, JobTask
+from users.models import User
+
+from .cache import bump_tags
+
+
+PASSWORD = 'seedpass123'
+USERNAME_PREFIX = 'seed-'
+SERIAL_PREFIX = 'SEED-'
+
+JOB_STATUSES = ['pending', 'in_progress', 'completed', 'cancelled']
+JOB_STATUS_WEIGHTS = [40, 25, 30, 5]
+OPEN_TASK_STATUSES = ['pending', 'pending', 'in_progress', 'completed']
+CLIENTS = ['Acme Corp', 'Globex', 'Initech', 'Umbrella', 'Stark Industries', 'Wayne Enterprises', 'Hooli']
+TASK_TITLES = ['Inspect site', 'Prepare equipment', 'Install', 'Test', 'Clean up', 'Customer sign-off']
+EQUIPMENT_NAMES = ['Drill', 'Ladder', 'Generator', 'Van', 'Saw', 'Pump', 'Scaffold', 'Compressor']
+
+PAST_DAYS = 90
+FUTURE_DAYS = 60
+
+
+@dataclass
+class SeedVolumes:
+    """
+    Row counts to generate; the tasks of a job vary around ``tasks_per_job``
+    """
+    jobs: int = 1000
+    tasks_per_job: int = 5
+    equipment: int = 100
+    technicians: int = 50
+    sales_agents: int = 5
+    admins: int = 1
+
+
+@dataclass
+class Skew:
+    """
+    How unevenly work is spread
+    """
+    hot_technicians: float = 1.0
+    popular_equipment: float = 1.0
+    overdue_ratio: float = 0.1
+    unassigned_ratio: float = 0.05
+    max_equipment_per_task: int = 2
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights of ``count`` items ranked by Zipf's law"""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class BulkCreateWriter:
+    """
+    Writes rows with ``bulk_create``; the primary keys are set on the objects
+    """
+    name = 'bulk_create'
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, model, objs, pks=True):
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class CopyWriter:
+    """
+    Writes rows with PostgreSQL ``COPY ... FROM STDIN``. Primary keys, when
+    needed, are drawn from the table's sequence first and set on the objects.
+    """
+    name = 'copy'
+
+    def write(self, model, objs, pks=True):
+        if not objs:
+            return
+        # The real wrapper: every lookup through the ``connection`` proxy hits a thread local
+        db = connections[DEFAULT_DB_ALIAS]
+        meta = model._meta
+        quote = db.ops.quote_name
+        fields = [field for field in meta.concrete_fields if not field.primary_key]
+        with db.cursor() as cursor:
+            if pks:
+                cursor.execute(
+                    'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                    [meta.db_table, meta.pk.column, len(objs)],
+                )
+                for obj, (pk,) in zip(objs, cursor.fetchall()):
+                    obj.pk = pk
+                fields.insert(0, meta.pk)
+
+            # Only auto_now(_add) fields compute their value in pre_save()
+            getters = [
+                (field, field.pre_save if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+                 else None)
+                for field in fields
+            ]
+            buffer = io.StringIO()
+            for obj in objs:
+                buffer.write('\t'.join(
+                    copy_value(field.get_db_prep_save(
+                        pre_save(obj, True) if pre_save else getattr(obj, field.attname), db,
+                    ))
+                    for field, pre_save in getters
+                ))
+                buffer.write('\n')
+            buffer.seek(0)
+            columns = ', '.join(quote(field.column) for field in fields)
+            cursor.copy_expert(f'COPY {quote(meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+def get_writer(method='auto', chunk_size=5000):
+    """Return the writer for ``method``: ``'bulk_create'``, ``'copy'`` or ``'auto'`` (COPY on PostgreSQL)"""
+    if method == 'auto':
+        method = 'copy' if connection.vendor == 'postgresql' else 'bulk_create'
+    if method == 'copy':
+        if connection.vendor != 'postgresql':
+            raise ValueError('COPY is only available on PostgreSQL')
+        return CopyWriter()
+    if method == 'bulk_create':
+        return BulkCreateWriter(chunk_size)
+    raise ValueError(f'Unknown write method: {method}')
+
+
+class Seeder:
+    """
+    Generates and writes one synthetic dataset
+    """
+    def __init__(self, volumes, skew=None, random_seed=42, chunk_size=5000, method='auto', now=None, log=None):
+        self.volumes = volumes
+        self.skew = skew or Skew()
+        self.random = random.Random(random_seed)
+        self.chunk_size = chunk_size
+        self.writer = get_writer(method, chunk_size)
+        self.now = now or timezone.now()
+        self.log = log or (lambda message: None)
+        self.counts = {}
+        # (equipment id, window slot) pairs booked by open jobs
+        self.booked = set()
+        start, end = booking_window(self.now)
+        self.window = end - start
+        self.first_slot = -int(timedelta(days=PAST_DAYS) / self.window)
+        self.last_slot = int(timedelta(days=FUTURE_DAYS) / self.window)
+
+    def run(self):
+        """Write the dataset; return the number of rows written per model"""
+        users = self.create_users()
+        equipment_ids = self.create_equipment()
+        self.create_jobs(users, equipment_ids)
+        transaction.on_commit(bump_catalog_version)
+        bump_tags('users', 'equipment', 'jobs', 'tasks')
+        return self.counts
+
+    def count(self, name, rows):
+        self.counts[name] = self.counts.get(name, 0) + rows
+
+    def create_users(self):
+        password = make_password(PASSWORD)
+        users = {}
+        for role, total in (
+            ('admin', self.volumes.admins),
+            ('sales_agent', self.volumes.sales_agents),
+            ('technician', self.volumes.technicians),
+        ):
+            objs = (
+                User(
+                    username=f'{USERNAME_PREFIX}{role}-{i:06d}',
+                    email=f'{role}{i}@seed.jobops.test',
+                    first_name=role.replace('_', ' ').title(),
+                    last_name=str(i),
+                    role=role,
+                    password=password,
+                    is_staff=role == 'admin',
+                )
+                for i in range(total)
+            )
+            users[role] = []
+            for chunk in chunked(objs, self.chunk_size):
+                with transaction.atomic():
+                    self.writer.write(User, chunk)
+                users[role].extend(user.pk for user in chunk)
+                self.count('users', len(chunk))
+        self.log(f"users: {self.counts.get('users', 0)}")
+        return users
+
+    def create_equipment(self):
+        types = [choice for choice, _ in Equipment.EQUIPMENT_TYPE_CHOICES]
+        objs = (
+            Equipment(
+                name=f'{self.random.choice(EQUIPMENT_NAMES)} {i}',
+                type=self.random.choice(types),
+                serial_number=f'{SERIAL_PREFIX}{i:08d}',
+                is_active=self.random.random() > 0.05,
+            )
+            for i in range(self.volumes.equipment)
+        )
+        equipment_ids = []
+        for chunk in chunked(objs, self.chunk_size):
+            with transaction.atomic():
+                self.writer.write(Equipment, chunk)
+            equipment_ids.extend(item.pk for item in chunk)
+            self.count('equipment', len(chunk))
+        self.log(f"equipment: {self.counts.get('equipment', 0)}")
+        return equipment_ids
+
+    def create_jobs(self, users, equipment_ids):
+        technicians = users['technician']
+        technician_weights = zipf_weights(len(technicians), self.skew.hot_technicians)
+        equipment_weights = zipf_weights(len(equipment_ids), self.skew.popular_equipment)
+        creators = users['sales_agent'] + users['admin']
+
+        def pick_technician():
+            if not technicians or self.random.random() < self.skew.unassigned_ratio:
+                return None
+            return self.random.choices(technicians, cum_weights=technician_weights)[0]
+
+        def pick_equipment():
+            count = self.random.randint(0, self.skew.max_equipment_per_task) if equipment_ids else 0
+            return set(self.random.choices(equipment_ids, cum_weights=equipment_weights, k=count)) if count else set()
+
+        through = JobTask.required_equipment.through
+        jobs = (self.build_job(creators, pick_technician) for _ in range(self.volumes.jobs))
+        for chunk in chunked(jobs, max(1, self.chunk_size // max(1, self.volumes.tasks_per_job))):
+            with transaction.atomic():
+                self.writer.write(Job, chunk)
+                tasks, links, bookings = [], [], []
+                for job in chunk:
+                    job_tasks, job_links = self.build_tasks(job, pick_equipment)
+                    tasks.extend(job_tasks)
+                    links.extend(job_links)
+                    bookings.extend(self.build_bookings(job))
+                self.writer.write(JobTask, tasks)
+                links = [through(jobtask_id=task.pk, equipment_id=equipment_id) for task, equipment_id in links]
+                self.writer.write(through, links, pks=False)
+                self.writer.write(EquipmentBooking, bookings, pks=False)
+            self.count('jobs', len(chunk))
+            self.count('tasks', len(tasks))
+            self.count('task_equipment', len(links))
+            self.count('bookings', len(bookings))
+            self.log(f"jobs: {self.counts['jobs']}, tasks: {self.counts['tasks']}")
+
+    def build_job(self, creators, pick_technician):
+        status = self.random.choices(JOB_STATUSES, JOB_STATUS_WEIGHTS)[0]
+        if status in RELEASED_STATUSES or self.random.random() < self.skew.overdue_ratio:
+            slot = self.random.randint(self.first_slot, -1)
+        else:
+            slot = self.random.randint(1, self.last_slot)
+        scheduled_date = self.now + slot * self.window
+        job = Job(
+            title=f'{self.random.choice(TASK_TITLES)} at {self.random.choice(CLIENTS)}',
+            description='Synthetic job',
+            client_name=self.random.choice(CLIENTS),
+            created_by_id=self.random.choice(creators),
+            assigned_to_id=pick_technician(),
+            status=status,
+            priority=self.random.randint(1, 4),
+            scheduled_date=scheduled_date,
+            overdue=slot < 0 and status not in RELEASED_STATUSES,
+        )
+        job.slot = slot
+        return job
+
+    def build_tasks(self, job, pick_equipment):
+        """Return the tasks of ``job`` and their ``(task, equipment id)`` links"""
+        mean = self.volumes.tasks_per_job
+        count = self.random.randint(max(1, mean - mean // 2), mean + mean // 2) if mean else 0
+        job_booked = set()
+        tasks, links = [], []
+        for order in range(1, count + 1):
+            if job.status in RELEASED_STATUSES:
+                status = job.status
+            else:
+                status = self.random.choice(OPEN_TASK_STATUSES)
+            task = JobTask(
+                job_id=job.pk,
+                title=self.random.choice(TASK_TITLES),
+                description='Synthetic task',
+                status=status,
+                order=order,
+                completed_at=job.scheduled_date if status == 'completed' else None,
+            )
+            tasks.append(task)
+            equipment = pick_equipment()
+            if job.status not in RELEASED_STATUSES and status not in RELEASED_STATUSES:
+                # Open tasks book their equipment; skip items another job holds in this window
+                equipment = {
+                    equipment_id for equipment_id in equipment
+                    if equipment_id in job_booked or (equipment_id, job.slot) not in self.booked
+                }
+                job_booked |= equipment
+            links.extend((task, equipment_id) for equipment_id in equipment)
+        self.booked.update((equipment_id, job.slot) for equipment_id in job_booked)
+        job.booked_equipment = job_booked
+        return tasks, links
+
+    def build_bookings(self, job):
+        start, end = booking_window(job.scheduled_date)
+        return [
+            EquipmentBooking(equipment_id=equipment_id, job_id=job.pk, starts_at=start, ends_at=end)
+            for equipment_id in sorted(job.booked_equipment)
+        ]
+
+
+def seed(volumes=None, skew=None, random_seed=42, chunk_size=5000, method='auto', log=None):
+    """Generate a synthetic dataset; return the number of rows written per model"""
+    return Seeder(
+        volumes or SeedVolumes(), skew=skew, random_seed=random_seed, chunk_size=chunk_size, method=method, log=log,
+    ).run()
+
+
+def has_seed_data():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX).exists()
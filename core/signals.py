@@ -0,0 +1,35 @@
+from django.apps import apps
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .cache import bump_tags
+
+
+# Cached responses of the views tagged with each model's tag are invalidated on every change
+TAGGED_MODELS = {
+    'jobs.Job': 'jobs',
+    'jobs.JobTask': 'tasks',
+    'equipment.Equipment': 'equipment',
+    'users.User': 'users',
+}
+
+
+def invalidate_responses(sender, **kwargs):
+    """Replace the tag version of the changed model, including fixture loads"""
+    bump_tags(TAGGED_MODELS[sender._meta.label])
+
+
+def invalidate_required_equipment(sender, action, **kwargs):
+    """A task's required equipment is part of every cached task"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_tags('tasks')
+
+
+def connect_signals():
+    for label in TAGGED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(invalidate_responses, sender=model, dispatch_uid=f'core_cache_save_{label}')
+        post_delete.connect(invalidate_responses, sender=model, dispatch_uid=f'core_cache_delete_{label}')
+    m2m_changed.connect(
+        invalidate_required_equipment, sender=apps.get_model('jobs', 'JobTask').required_equipment.through,
+        dispatch_uid='core_cache_required_equipment',
+    )
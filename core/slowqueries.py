@@ -0,0 +1,205 @@
+"""
+Sampled slow-query log.
+
+``SlowQueryLogger`` is installed as an execute wrapper on every new database
+connection when ``SLOW_QUERY_LOG_ENABLED`` is set. Statements slower than
+``SLOW_QUERY_THRESHOLD_MS`` are sampled at ``SLOW_QUERY_SAMPLE_RATE``, and at
+most once per ``SLOW_QUERY_SHAPE_INTERVAL`` seconds per query shape and
+process. For each one it captures the ``EXPLAIN`` plan, the normalized SQL,
+the originating view or Celery task and the redacted parameters, and writes
+them to the ``slow_queries`` table. The table is a ring buffer of
+``SLOW_QUERY_LOG_SIZE`` slots: new entries take a free slot, then overwrite
+the oldest entry. The slot is derived from the table itself, on the primary,
+so every process shares one buffer; two processes capturing at the same
+moment may pick the same slot, and one of the two entries is lost.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .instrumentation import current_run
+from .nplusone import call_site, normalize_sql
+from .routers import use_primary
+
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('SELECT', 'WITH')
+
+_THIS_FILE = os.path.abspath(__file__)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+
+_source = ContextVar('slow_query_source', default=None)
+_capturing = threading.local()
+
+
+def set_source(name):
+    """Record ``name`` (e.g. a view name) as the origin of queries in this context; return a reset token"""
+    return _source.set(name)
+
+
+def reset_source(token):
+    _source.reset(token)
+
+
+def current_source():
+    run = current_run()
+    if run is not None:
+        return run.task_name
+    return _source.get() or ''
+
+
+def redact(value):
+    """Keep the type and size of a parameter but not its value"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return f'<{type(value).__name__}>'
+
+
+def explain(connection, sql, params):
+    """Return the plan of a read statement without running it, or ``''``"""
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return ''
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        # A failed EXPLAIN must not abort the caller's transaction
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + sql, params)
+                rows = cursor.fetchall()
+    except DatabaseError:
+        logger.warning('Could not explain slow query', exc_info=True)
+        return ''
+    plan = '\n'.join(' '.join(str(column) for column in row) for row in rows)
+    # Plans quote the bound values, e.g. Index Cond: (username = 'alice')
+    return _STRING.sub("'?'", plan)
+
+
+def next_slot():
+    """Return the first free slot, or the slot of the oldest entry once the buffer is full"""
+    from .models import SlowQuery
+
+    size = getattr(settings, 'SLOW_QUERY_LOG_SIZE', 1000)
+    with use_primary():
+        used = set(SlowQuery.objects.values_list('slot', flat=True))
+        free = next((slot for slot in range(size) if slot not in used), None)
+        if free is not None:
+            return free
+        return SlowQuery.objects.order_by('captured_at', 'slot').values_list('slot', flat=True).first()
+
+
+def store(entry):
+    from .models import SlowQuery
+
+    try:
+        SlowQuery.objects.bulk_create(
+            [SlowQuery(slot=next_slot(), **entry)],
+            update_conflicts=True,
+            unique_fields=['slot'],
+            update_fields=[
+                'shape_hash', 'sql', 'params', 'plan', 'duration_ms', 'source', 'call_site', 'database', 'captured_at',
+            ],
+        )
+    except DatabaseError:
+        logger.warning('Could not store slow query', exc_info=True)
+
+
+class SlowQueryLogger:
+    """
+    Database execute wrapper that samples statements over the threshold
+    """
+    def __init__(self):
+        self.threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 500) / 1000
+        self.sample_rate = getattr(settings, 'SLOW_QUERY_SAMPLE_RATE', 1.0)
+        self.shape_interval = getattr(settings, 'SLOW_QUERY_SHAPE_INTERVAL', 60)
+        self.last_seen = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        if duration >= self.threshold and not many and not getattr(_capturing, 'active', False):
+            self.capture(context['connection'], sql, params, duration)
+        return result
+
+    def should_capture(self, shape_hash):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        if now - self.last_seen.get(shape_hash, float('-inf')) < self.shape_interval:
+            return False
+        self.last_seen[shape_hash] = now
+        return True
+
+    def capture(self, connection, sql, params, duration):
+        shape = normalize_sql(sql)
+        shape_hash = hashlib.sha1(shape.encode()).hexdigest()
+        if not self.should_capture(shape_hash):
+            return
+        _capturing.active = True
+        try:
+            entry = {
+                'shape_hash': shape_hash,
+                'sql': shape,
+                'params': redact(list(params or ())),
+                'plan': '' if connection.needs_rollback else explain(connection, sql, params),
+                'duration_ms': round(duration * 1000, 2),
+                'source': current_source()[:200],
+                'call_site': call_site(skip=[_THIS_FILE])[:255],
+                'database': connection.alias,
+                'captured_at': timezone.now(),
+            }
+            if connection.in_atomic_block:
+                # Written with the caller's transaction, so a rollback drops it
+                transaction.on_commit(lambda: self.store(entry), using=connection.alias)
+            else:
+                self.store(entry)
+        finally:
+            _capturing.active = False
+
+    def store(self, entry):
+        _capturing.active = True
+        try:
+            store(entry)
+        finally:
+            _capturing.active = False
+
+
+_logger = None
+
+
+def install(connection, **kwargs):
+    """``connection_created`` receiver adding the logger to a new connection"""
+    global _logger
+    if _logger is None:
+        _logger = SlowQueryLogger()
+    if _logger not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_logger)
+
+
+def connect_signals():
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(install, dispatch_uid='core_slow_query_log')
+    # Connections opened before the app registry was ready
+    for connection in connections.all(initialized_only=True):
+        install(connection)
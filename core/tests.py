@@ -0,0 +1,682 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.utils import load_backend
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from equipment.availability import required_equipment_ids
+from equipment.models import EquipmentBooking
+from jobs.models import Job, JobTask
+from .benchmark import compare, run_benchmarks
+from .cache import bump_tags
+from .db.pool import ConnectionPool, PoolTimeout, close_pools
+from .replay import load_requests, mint_tokens, replay
+from .instrumentation import instrumented_task, current_run
+from .middleware import ReplicaRoutingMiddleware
+from .models import SlowQuery, TaskRun
+from .routers import PrimaryReplicaRouter, lag_monitor, use_primary, use_replica
+from .seed import SeedVolumes, Skew, seed
+from .slowqueries import SlowQueryLogger, next_slot, reset_source, set_source
+from . import metrics
+
+
+@instrumented_task
+def sample_task(rows):
+    run = current_run()
+    User.objects.count()
+    run.chunk_done(rows=rows)
+    return {'extra': True}
+
+
+@instrumented_task
+def failing_task():
+    raise ValueError('boom')
+
+
+class InstrumentedTaskTest(TestCase):
+    """Test cases for Celery task instrumentation"""
+    
+    def setUp(self):
+        metrics.reset()
+    
+    def test_structured_result(self):
+        """Test that the task returns and stores a compact result"""
+        result = sample_task(5)
+        
+        self.assertEqual(result['task'], 'core.tests.sample_task')
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['rows'], 5)
+        self.assertEqual(result['chunks'], 1)
+        self.assertEqual(result['queries'], 1)
+        self.assertTrue(result['extra'])
+        
+        run = TaskRun.objects.get()
+        self.assertEqual(run.rows, 5)
+        self.assertEqual(run.query_count, 1)
+        self.assertGreater(run.expires_at, run.started_at)
+        self.assertEqual(metrics.get_counter('celery.task.runs', task='core.tests.sample_task', status='success'), 1)
+    
+    def test_failure_is_recorded(self):
+        """Test that failing runs are stored and re-raised"""
+        with self.assertRaises(ValueError):
+            failing_task()
+        
+        run = TaskRun.objects.get()
+        self.assertEqual(run.status, 'failure')
+        self.assertIn('boom', run.error)
+    
+    def test_task_runs_command(self):
+        """Test the run history command"""
+        sample_task(3)
+        out = StringIO()
+        call_command('task_runs', task=['core.tests.sample_task'], stdout=out)
+        
+        self.assertIn('core.tests.sample_task', out.getvalue())
+        self.assertIn('success', out.getvalue())
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True, REQUEST_METRICS_SAMPLE_RATE=1.0)
+class RequestMetricsMiddlewareTest(TestCase):
+    """Test cases for per-request query and timing instrumentation"""
+    
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create_user(username='admin', password='testpass123', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_server_timing_and_log_line(self):
+        """Test that a sampled request reports queries and timings by URL name"""
+        with self.assertLogs('jobops.requests', level='INFO') as logs:
+            response = self.client.get(reverse('users:user-list-create'))
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'serializer;dur=', 'view;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+    
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['event'], 'request.finished')
+        self.assertEqual(line['url_name'], 'users:user-list-create')
+        self.assertEqual(line['status'], 200)
+        self.assertGreaterEqual(line['queries'], 2)
+        self.assertIn(f'desc="{line["queries"]} queries"', timing)
+        self.assertGreater(line['serializer_ms'], 0)
+        self.assertEqual(metrics.get_counter('http.requests', url_name='users:user-list-create', status=200), 1)
+    
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_are_not_measured(self):
+        """Test that requests outside the sample pass through untouched"""
+        response = self.client.get(reverse('users:user-list-create'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics.snapshot(), {})
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=1.0, SLOW_QUERY_LOG_SIZE=2)
+class SlowQueryLogTest(TestCase):
+    """Test cases for the sampled slow-query log"""
+    
+    def setUp(self):
+        self.logger = SlowQueryLogger()
+    
+    def run_logged(self, func):
+        token = set_source('jobs:job-list-create')
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                with connection.execute_wrapper(self.logger):
+                    func()
+        finally:
+            reset_source(token)
+    
+    def test_captures_plan_source_and_redacted_params(self):
+        """Test that a slow statement is stored with its plan and without parameter values"""
+        self.run_logged(lambda: list(User.objects.filter(username='secret-name', id__gt=3)))
+    
+        entry = SlowQuery.objects.get()
+        self.assertIn('WHERE ("users"."id" > %s AND "users"."username" = %s)', entry.sql)
+        self.assertEqual(entry.params, [3, '<str:11>'])
+        self.assertNotIn('secret', str(entry.params) + entry.plan)
+        self.assertTrue(entry.plan)
+        self.assertEqual(entry.source, 'jobs:job-list-create')
+        self.assertIn('<lambda> (core/tests.py:', entry.call_site)
+    
+    def test_ring_buffer_and_shape_interval(self):
+        """Test that the table never grows past its size and each shape is sampled once per interval"""
+        self.run_logged(lambda: [list(User.objects.filter(id=1)) for _ in range(3)])
+        self.assertEqual(SlowQuery.objects.count(), 1)
+    
+        self.run_logged(lambda: (User.objects.filter(is_staff=True).count(), list(TaskRun.objects.all())))
+        self.assertEqual(SlowQuery.objects.count(), 2)
+        self.assertEqual(set(SlowQuery.objects.values_list('slot', flat=True)), {0, 1})
+    
+    def test_full_buffer_overwrites_the_oldest_entry(self):
+        """Test that the slot comes from the table, so every process overwrites the same oldest entry"""
+        now = timezone.now()
+        for slot, age in [(0, 1), (1, 2)]:
+            SlowQuery.objects.create(
+                slot=slot, shape_hash='x', sql='SELECT 1', duration_ms=1, captured_at=now - timedelta(minutes=age)
+            )
+        self.assertEqual(next_slot(), 1)
+        
+        SlowQuery.objects.filter(slot=0).delete()
+        self.assertEqual(next_slot(), 0)
+    
+    def test_worst_shapes_admin_page(self):
+        """Test that the admin lists captured shapes"""
+        self.run_logged(lambda: list(User.objects.filter(id=1)))
+        admin_user = User.objects.create_superuser(username='admin', password='testpass123', role='admin')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:core_slowquery_worst_shapes'))
+        self.assertContains(response, f'?shape_hash={SlowQuery.objects.get().shape_hash}')
+        self.assertEqual(self.client.get(reverse('admin:core_slowquery_changelist')).status_code, 200)
+
+
+class EndpointBenchmarkTest(TestCase):
+    """Test cases for the seeded endpoint benchmarks"""
+    
+    def setUp(self):
+        self.counts = seed(SeedVolumes(jobs=30, tasks_per_job=3, equipment=10, technicians=3, sales_agents=1), chunk_size=20)
+    
+    def test_run_benchmarks(self):
+        """Test that every endpoint is measured"""
+        results = run_benchmarks(iterations=3, warmup=1)
+        
+        self.assertEqual(results['rows']['jobs'], 30)
+        self.assertEqual(set(results['endpoints']), {
+            'job-list', 'job-list-filtered', 'job-detail', 'technician-dashboard', 'admin-analytics', 'update-task-status',
+        })
+        for result in results['endpoints'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['peak_memory_kb'], 0)
+    
+    def test_compare(self):
+        """Test that slower percentiles past the threshold and extra queries are regressions"""
+        baseline = {'endpoints': {'job-list': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'peak_memory_kb': 100, 'queries': 2}}}
+        current = {'endpoints': {'job-list': {'p50_ms': 11, 'p95_ms': 30, 'p99_ms': 30, 'peak_memory_kb': 100, 'queries': 3}}}
+        
+        self.assertEqual(compare(baseline, current, threshold=0.2), ['job-list: p95_ms 20 -> 30', 'job-list: queries 2 -> 3'])
+        self.assertEqual(compare(baseline, baseline), [])
+    
+    def test_command_fails_on_regression(self):
+        """Test that the command writes JSON results and fails against a faster baseline"""
+        output = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            results_path = os.path.join(directory, 'results.json')
+            baseline_path = os.path.join(directory, 'baseline.json')
+            call_command(
+                'benchmark_endpoints', '--use-current-db', '--endpoint', 'job-detail', '--iterations', '2',
+                '--output', results_path, stdout=output,
+            )
+            with open(results_path) as f:
+                results = json.load(f)
+            results['endpoints']['job-detail']['queries'] -= 1
+            with open(baseline_path, 'w') as f:
+                json.dump(results, f)
+            
+            with self.assertRaisesMessage(CommandError, 'job-detail: queries'):
+                call_command(
+                    'benchmark_endpoints', '--use-current-db', '--endpoint', 'job-detail', '--iterations', '2',
+                    '--baseline', baseline_path, stdout=output,
+                )
+        self.assertIn('job-detail', output.getvalue())
+    
+    def test_current_db_skips_write_endpoints_unless_named(self):
+        """Test that --use-current-db leaves data alone unless a write endpoint is named"""
+        statuses = dict(JobTask.objects.values_list('id', 'status'))
+        output = StringIO()
+        
+        call_command('benchmark_endpoints', '--use-current-db', '--iterations', '2', '--warmup', '0', stdout=output)
+        
+        self.assertNotIn('update-task-status', output.getvalue())
+        self.assertIn('job-list', output.getvalue())
+        self.assertEqual(dict(JobTask.objects.values_list('id', 'status')), statuses)
+        
+        call_command(
+            'benchmark_endpoints', '--use-current-db', '--endpoint', 'update-task-status', '--iterations', '2',
+            stdout=output,
+        )
+        self.assertIn('update-task-status', output.getvalue())
+
+
+class SeedDataTest(TestCase):
+    """Test cases for the synthetic data generator"""
+    
+    def test_volumes_and_derived_fields(self):
+        """Test that seeding writes the requested volumes with consistent derived fields and bookings"""
+        counts = seed(SeedVolumes(jobs=60, tasks_per_job=4, equipment=5, technicians=4, sales_agents=1), chunk_size=50)
+        
+        self.assertEqual(counts['jobs'], 60)
+        self.assertEqual(User.objects.count(), 6)
+        self.assertEqual(JobTask.objects.count(), counts['tasks'])
+        self.assertTrue(120 <= counts['tasks'] <= 360)
+        self.assertFalse(JobTask.objects.filter(job__status='completed').exclude(status='completed').exists())
+        self.assertFalse(JobTask.objects.filter(status='completed', completed_at__isnull=True).exists())
+        self.assertFalse(Job.objects.filter(overdue=True, status__in=['completed', 'cancelled']).exists())
+        for job in Job.objects.all():
+            booked = set(EquipmentBooking.objects.filter(job=job).values_list('equipment_id', flat=True))
+            self.assertEqual(booked, required_equipment_ids(job) if job.status in ('pending', 'in_progress') else set())
+    
+    def test_skew(self):
+        """Test that hot technicians get most jobs and the overdue ratio is honoured"""
+        volumes = SeedVolumes(jobs=200, tasks_per_job=1, equipment=0, technicians=10, sales_agents=1)
+        seed(volumes, skew=Skew(hot_technicians=2.0, overdue_ratio=1.0, unassigned_ratio=0))
+        
+        hottest = User.objects.get(username='seed-technician-000000')
+        self.assertGreater(Job.objects.filter(assigned_to=hottest).count(), 100)
+        self.assertFalse(Job.objects.filter(status__in=['pending', 'in_progress'], overdue=False).exists())
+
+
+class SeedJobopsCommandTest(TransactionTestCase):
+    """Test cases for the seed_jobops command; --flush needs real transactions"""
+    
+    def test_command_is_reproducible(self):
+        """Test that the same seed generates the same data and that seeding twice needs --flush"""
+        options = ['--jobs', '20', '--equipment', '5', '--technicians', '3', '--sales-agents', '1', '--admins', '1']
+        call_command('seed_jobops', *options, stdout=StringIO())
+        first = list(Job.objects.order_by('id').values_list('title', 'status', 'priority', 'assigned_to__username'))
+        
+        with self.assertRaisesMessage(CommandError, '--flush'):
+            call_command('seed_jobops', *options, stdout=StringIO())
+        
+        call_command('seed_jobops', *options, '--flush', stdout=StringIO())
+        self.assertEqual(
+            list(Job.objects.order_by('id').values_list('title', 'status', 'priority', 'assigned_to__username')), first,
+        )
+
+
+class ReplayRequestsTest(LiveServerTestCase):
+    """Test cases for the request-log replay load tester"""
+    
+    log = [
+        '{"method": "get", "path": "/api/profile/", "role": "technician"}',
+        '{"method": "GET", "path": "/api/technician-dashboard/", "role": "technician"}',
+        '{"method": "GET", "path": "/api/jobs/", "role": "technician"}',
+        '{"method": "GET", "path": "/api/schema/?format=json"}',
+        'not json',
+        '{"path": "/api/jobs/"}',
+    ]
+    
+    def setUp(self):
+        self.technician = User.objects.create_user(username='tech', password='testpass123', role='technician')
+    
+    def test_load_requests(self):
+        """Test that log lines are parsed and resolved to URL names"""
+        requests, skipped = load_requests(self.log)
+        
+        self.assertEqual(skipped, 2)
+        self.assertEqual(
+            [(request.method, request.url_name, request.role) for request in requests],
+            [
+                ('GET', 'users:user-info', 'technician'),
+                ('GET', 'jobs:technician-dashboard', 'technician'),
+                ('GET', 'jobs:job-list-create', 'technician'),
+                ('GET', 'schema', 'anonymous'),
+            ],
+        )
+        with self.assertRaisesMessage(ValueError, "'admin'"):
+            mint_tokens({'admin'})
+    
+    def test_replay_modes(self):
+        """Test that thread and asyncio workers replay the log with the role's JWT"""
+        requests, _ = load_requests(self.log[:3])
+        tokens = mint_tokens({'technician'})
+        
+        for mode in ('thread', 'asyncio'):
+            with self.subTest(mode=mode):
+                results = replay(requests, self.live_server_url, tokens, concurrency=2, mode=mode, repeat=2).as_dict()
+                
+                self.assertEqual(results['requests'], 6)
+                self.assertGreater(results['throughput_rps'], 0)
+                self.assertEqual(results['endpoints']['users:user-info']['errors'], 0)
+                self.assertEqual(results['endpoints']['jobs:technician-dashboard']['errors'], 0)
+                # Technicians may not list jobs
+                self.assertEqual(results['endpoints']['jobs:job-list-create']['errors'], 2)
+                self.assertEqual(results['errors'], 2)
+    
+    def test_command(self):
+        """Test that the command reports per URL name"""
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as log:
+            log.write('\n'.join(self.log[:2]))
+            log.flush()
+            output = StringIO()
+            call_command(
+                'replay_requests', log.name, '--base-url', self.live_server_url, '--mode', 'asyncio', stdout=output,
+            )
+        
+        self.assertIn('2 requests in', output.getvalue())
+        self.assertIn('jobs:technician-dashboard', output.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], REPLICA_MAX_LAG=5, REPLICA_LAG_CHECK_INTERVAL=60)
+class ReplicaRoutingTest(TestCase):
+    """Test cases for primary/replica routing decisions"""
+    
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.lags = {'replica_1': 0.0, 'replica_2': 0.0}
+        lag_monitor.reset()
+        patcher = mock.patch.object(lag_monitor, 'measure', side_effect=lambda alias: self.lags[alias])
+        self.measure = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lag_monitor.reset)
+    
+    def test_reads_use_the_primary_by_default(self):
+        """Test that reads outside a replica context go to the primary"""
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+    
+    def test_writes_pin_the_context_to_the_primary(self):
+        """Test that a context reads from one replica until it writes"""
+        with use_replica():
+            replica = self.router.db_for_read(User)
+            self.assertIn(replica, ['replica_1', 'replica_2'])
+            self.assertEqual(self.router.db_for_read(Job), replica)
+            self.assertEqual(self.router.db_for_write(Job), 'default')
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        with use_replica():
+            self.assertNotEqual(self.router.db_for_read(User), 'default')
+    
+    def test_lagging_replicas_are_skipped(self):
+        """Test that replicas behind the primary or failing the check are not used"""
+        self.lags['replica_1'] = 30.0
+        for _ in range(10):
+            with use_replica():
+                self.assertEqual(self.router.db_for_read(User), 'replica_2')
+        self.assertEqual(self.measure.call_count, 2)
+        
+        lag_monitor.reset()
+        self.lags['replica_2'] = None
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+    
+    def test_middleware_allows_replicas_for_safe_methods(self):
+        """Test that only safe requests read from a replica"""
+        middleware = ReplicaRoutingMiddleware(lambda request: self.router.db_for_read(User))
+        
+        self.assertNotEqual(middleware(mock.Mock(method='GET')), 'default')
+        self.assertEqual(middleware(mock.Mock(method='POST')), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+    
+    def test_replicas_are_not_migrated(self):
+        """Test that the schema is only migrated on the primary"""
+        self.assertFalse(self.router.allow_migrate('replica_1', 'jobs'))
+        self.assertIsNone(self.router.allow_migrate('default', 'jobs'))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'set DATABASE_REPLICA_NAMES or DATABASE_REPLICA_HOSTS to test against a replica')
+class ReplicaDatabaseTest(TransactionTestCase):
+    """Test cases for requests against a configured replica (a test mirror of the primary)"""
+    
+    databases = {'default', *settings.DATABASE_REPLICAS}
+    
+    def setUp(self):
+        lag_monitor.reset()
+        self.admin = User.objects.create_user(username='admin', password='testpass123', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.job = Job.objects.create(
+            title='Job', client_name='Client', created_by=self.admin, assigned_to=self.admin,
+            scheduled_date=timezone.now() + timedelta(days=1),
+        )
+        self.task = JobTask.objects.create(job=self.job, title='Task', order=1)
+    
+    def count_replica_queries(self, request):
+        counts = {alias: 0 for alias in settings.DATABASE_REPLICAS}
+        
+        def counter(alias):
+            def wrapper(execute, sql, params, many, context):
+                counts[alias] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+        
+        wrappers = [connections[alias].execute_wrapper(counter(alias)) for alias in counts]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            response = request()
+        finally:
+            for wrapper in wrappers:
+                wrapper.__exit__(None, None, None)
+        return response, sum(counts.values())
+    
+    def test_safe_requests_read_from_a_replica(self):
+        """Test that analytics and list GETs are served by a replica and writes by the primary"""
+        for url in (reverse('jobs:admin-analytics'), reverse('jobs:job-list-create')):
+            response, replica_queries = self.count_replica_queries(lambda: self.client.get(url))
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(replica_queries, 0)
+        
+        url = reverse('jobs:update-task-status', args=[self.task.id])
+        response, replica_queries = self.count_replica_queries(lambda: self.client.post(url, {'status': 'in_progress'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries, 0)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'in_progress')
+
+
+class FakeConnection:
+    """A DB-API connection stand-in for pool tests"""
+    
+    def __init__(self):
+        self.closed = False
+        self.rollbacks = 0
+    
+    def rollback(self):
+        self.rollbacks += 1
+    
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+    """Test cases for the in-process connection pool"""
+    
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.pool = ConnectionPool('test', max_size=2, timeout=0.05)
+    
+    def test_connections_are_reused(self):
+        """Test that a returned connection is rolled back and checked out again"""
+        first = self.pool.get(FakeConnection)
+        self.pool.put(first)
+        
+        self.assertIs(self.pool.get(FakeConnection), first)
+        self.assertEqual(first.rollbacks, 1)
+        self.assertEqual(metrics.get_counter('db.pool.connections_opened', pool='test'), 1)
+        self.assertEqual(metrics.get_counter('db.pool.checkouts', pool='test'), 2)
+    
+    def test_saturated_pool_times_out(self):
+        """Test that a checkout waits for a free connection and fails after the timeout"""
+        connections_ = [self.pool.get(FakeConnection), self.pool.get(FakeConnection)]
+        self.assertEqual(self.pool.stats()['in_use'], 2)
+        
+        with self.assertRaises(PoolTimeout):
+            self.pool.get(FakeConnection)
+        self.assertEqual(metrics.get_counter('db.pool.waits', pool='test'), 1)
+        self.assertEqual(metrics.get_counter('db.pool.timeouts', pool='test'), 1)
+        
+        self.pool.put(connections_[0])
+        self.assertIs(self.pool.get(FakeConnection), connections_[0])
+    
+    def test_unusable_connections_are_discarded(self):
+        """Test that closed and expired connections free their place in the pool"""
+        closed = self.pool.get(FakeConnection)
+        closed.close()
+        self.pool.put(closed)
+        self.assertEqual(self.pool.stats()['size'], 0)
+        
+        self.pool.max_lifetime = 0
+        expired = self.pool.get(FakeConnection)
+        self.pool.put(expired)
+        self.assertTrue(expired.closed)
+        self.assertEqual(self.pool.stats(), {'max_size': 2, 'size': 0, 'idle': 0, 'in_use': 0, 'waiting': 0})
+        self.assertEqual(metrics.get_counter('db.pool.connections_discarded', pool='test'), 2)
+    
+    def test_benchmark_command(self):
+        """Test that the benchmark compares new and persistent connections"""
+        output = StringIO()
+        call_command('benchmark_connections', iterations=3, stdout=output)
+        
+        self.assertIn('persistent', output.getvalue())
+        self.assertIn('ms saved per request', output.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'the pooled backend needs PostgreSQL')
+class PooledBackendTest(TransactionTestCase):
+    """Test cases for the pooled PostgreSQL backend"""
+    
+    def test_closing_returns_the_connection_to_the_pool(self):
+        """Test that a closed wrapper's connection is reused by the next one"""
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'core.db.backends.postgresql',
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {'pool': {'max_size': 1, 'timeout': 1}},
+        }
+        backend = load_backend(settings_dict['ENGINE'])
+        first = backend.DatabaseWrapper(settings_dict, alias='pool_test')
+        second = backend.DatabaseWrapper(settings_dict, alias='pool_test')
+        try:
+            with first.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                pid = cursor.fetchone()[0]
+            first.close()
+            with second.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                self.assertEqual(cursor.fetchone()[0], pid)
+            
+            with self.assertRaises(PoolTimeout):
+                first.ensure_connection()
+        finally:
+            first.close()
+            second.close()
+            close_pools('pool_test')
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTest(TestCase):
+    """Test cases for cached API responses and their invalidation"""
+    
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.admin = User.objects.create_user(username='admin', password='testpass123', role='admin')
+        self.technicians = [
+            User.objects.create_user(username=f'tech{i}', password='testpass123', role='technician') for i in range(2)
+        ]
+        self.job = Job.objects.create(
+            title='Job', client_name='Client', created_by=self.admin, assigned_to=self.technicians[0],
+            scheduled_date=timezone.now() + timedelta(days=1),
+        )
+        self.task = JobTask.objects.create(job=self.job, title='Task', order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+    
+    def test_responses_are_cached(self):
+        """Test that a repeated GET is served without queries and with the same body"""
+        url = reverse('jobs:job-detail', args=[self.job.id])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['Content-Type'], 'application/json')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.data['title'], 'Job')
+        self.assertEqual(metrics.get_counter('cache.hits', view='jobs:job-detail'), 1)
+        self.assertEqual(metrics.get_counter('cache.misses', view='jobs:job-detail'), 1)
+        
+        self.client.get(url, {'fields': 'x'})
+        self.assertEqual(metrics.get_counter('cache.misses', view='jobs:job-detail'), 2)
+    
+    def test_responses_are_kept_apart_by_scope(self):
+        """Test that technicians never get each other's cached responses"""
+        url = reverse('jobs:technician-dashboard')
+        for technician, task_count in zip(self.technicians, [1, 0]):
+            self.client.force_authenticate(technician)
+            response = self.client.get(url)
+            self.assertEqual(response.data['technician'], technician.username)
+            self.assertEqual(sum(len(tasks) for tasks in response.data['tasks_by_date'].values()), task_count)
+        
+        self.client.force_authenticate(self.technicians[1])
+        self.assertEqual(self.client.get(reverse('jobs:job-detail', args=[self.job.id])).status_code, 404)
+    
+    def test_model_changes_invalidate_responses(self):
+        """Test that saves, deletes and bulk writes are visible on the next GET"""
+        analytics = reverse('jobs:admin-analytics')
+        self.assertEqual(self.client.get(analytics).data['total_jobs'], 1)
+        
+        Job.objects.create(
+            title='Another', client_name='Client', created_by=self.admin,
+            scheduled_date=timezone.now() - timedelta(days=1),
+        )
+        self.assertEqual(self.client.get(analytics).data['total_jobs'], 2)
+        
+        detail = reverse('jobs:job-task-detail', args=[self.task.id])
+        self.client.get(detail)
+        self.task.delete()
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        
+        self.assertEqual(self.client.get(analytics).data['overdue_jobs'], 1)
+        # update() sends no signals; the writer bumps the tags itself
+        Job.objects.update(overdue=True)
+        self.assertEqual(self.client.get(analytics).data['overdue_jobs'], 1)
+        bump_tags('jobs')
+        self.assertEqual(self.client.get(analytics).data['overdue_jobs'], 2)
+    
+    def test_invalidation_crosses_processes(self):
+        """Test that tags bumped by another process, e.g. a Celery worker, invalidate this one's responses"""
+        analytics = reverse('jobs:admin-analytics')
+        with tempfile.TemporaryDirectory() as directory:
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=caches):
+                self.assertEqual(self.client.get(analytics).data['overdue_jobs'], 0)
+                Job.objects.update(overdue=True)
+                self.assertEqual(self.client.get(analytics).data['overdue_jobs'], 0)
+                
+                script = (
+                    'import django; django.setup()\n'
+                    'from django.test.utils import override_settings\n'
+                    f'with override_settings(CACHES={caches!r}):\n'
+                    '    from core.cache import bump_tags\n'
+                    "    bump_tags('jobs')\n"
+                )
+                subprocess.run(
+                    [sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                    env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'jobops.settings'},
+                )
+                self.assertEqual(self.client.get(analytics).data['overdue_jobs'], 1)
+    
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_misses_are_rebuilt_from_the_primary(self):
+        """Test that a cached view reads the primary even where replica reads are allowed"""
+        lag_monitor.reset()
+        self.addCleanup(lag_monitor.reset)
+        with mock.patch.object(lag_monitor, 'measure', return_value=0.0):
+            # replica_1 is not a configured database, so any read routed there fails
+            response = self.client.get(reverse('jobs:job-detail', args=[self.job.id]))
+        self.assertEqual(response.status_code, 200)
+    
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_cache_can_be_disabled(self):
+        """Test that responses are built every time when the cache is disabled"""
+        url = reverse('jobs:job-list-create')
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
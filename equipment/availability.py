@@ -0,0 +1,126 @@
+"""
+Equipment availability.
+
+A job books every piece of equipment required by its open tasks for its
+window, ``[scheduled_date, scheduled_date + EQUIPMENT_BOOKING_DURATION)``.
+Conflicts for any number of items are found with one interval-overlap query,
+``starts_at < end AND ends_at > start``, over the ``(equipment, starts_at,
+ends_at)`` index. On PostgreSQL the ``equipment_bookings_no_overlap`` GiST
+exclusion constraint on ``tstzrange(starts_at, ends_at)`` additionally
+rejects overlapping bookings written concurrently.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import EquipmentBooking
+
+
+# Tasks and jobs in these states no longer hold their equipment
+RELEASED_STATUSES = ('completed', 'cancelled')
+
+
+class BookingConflict(ValidationError):
+    """
+    Equipment a job needs is booked by another job; raised from the booking
+    signal handlers, so callers writing jobs or tasks must roll back
+    """
+
+
+def booking_window(scheduled_date, duration=None):
+    """Return the ``(start, end)`` interval booked for a job scheduled at ``scheduled_date``"""
+    if duration is None:
+        duration = getattr(settings, 'EQUIPMENT_BOOKING_DURATION', timedelta(hours=8))
+    return scheduled_date, scheduled_date + duration
+
+
+def overlapping(queryset, start, end):
+    """Filter bookings to those overlapping the half-open interval ``[start, end)``"""
+    return queryset.filter(starts_at__lt=end, ends_at__gt=start)
+
+
+def find_conflicts(equipment_ids, start, end, exclude_job=None):
+    """
+    Return the bookings of any of ``equipment_ids`` that overlap
+    ``[start, end)``, ignoring bookings held by ``exclude_job``
+    """
+    equipment_ids = list(equipment_ids)
+    if not equipment_ids:
+        return []
+    bookings = EquipmentBooking.objects.filter(equipment_id__in=equipment_ids)
+    if exclude_job is not None:
+        bookings = bookings.exclude(job_id=getattr(exclude_job, 'pk', exclude_job))
+    return list(
+        overlapping(bookings, start, end).select_related('equipment').order_by('equipment_id', 'starts_at')
+    )
+
+
+def conflict_message(conflicts):
+    return ' '.join(
+        f'{booking.equipment.name} ({booking.equipment.serial_number}) is booked '
+        f'from {booking.starts_at:%Y-%m-%d %H:%M} to {booking.ends_at:%Y-%m-%d %H:%M}.'
+        for booking in conflicts
+    )
+
+
+def required_equipment_ids(job):
+    """Return the ids of the equipment required by the open tasks of ``job``"""
+    JobTask = apps.get_model('jobs', 'JobTask')
+    return set(
+        JobTask.required_equipment.through.objects.filter(
+            jobtask__job=job
+        ).exclude(
+            jobtask__status__in=RELEASED_STATUSES
+        ).values_list('equipment_id', flat=True)
+    )
+
+
+def book_job(job):
+    """
+    Make the bookings of ``job`` match the equipment its open tasks require;
+    raise ``BookingConflict`` if any item is booked by another job
+    """
+    bookings = EquipmentBooking.objects.filter(job=job)
+    if job.status in RELEASED_STATUSES:
+        bookings.delete()
+        return
+    start, end = booking_window(job.scheduled_date)
+    equipment_ids = required_equipment_ids(job)
+
+    try:
+        with transaction.atomic():
+            bookings.exclude(equipment_id__in=equipment_ids).delete()
+            conflicts = find_conflicts(equipment_ids, start, end, exclude_job=job)
+            if conflicts:
+                raise BookingConflict(conflict_message(conflicts))
+
+            bookings.exclude(starts_at=start, ends_at=end).update(starts_at=start, ends_at=end)
+            booked = set(bookings.values_list('equipment_id', flat=True))
+            EquipmentBooking.objects.bulk_create([
+                EquipmentBooking(equipment_id=equipment_id, job=job, starts_at=start, ends_at=end)
+                for equipment_id in equipment_ids - booked
+            ])
+    except IntegrityError:
+        # A concurrent booking won the race for the exclusion constraint
+        raise BookingConflict('Equipment was booked by another job in the meantime.')
+
+
+def reschedule_job(job):
+    """Move the bookings of ``job`` to its current window, or release them once it is finished"""
+    bookings = EquipmentBooking.objects.filter(job=job)
+    if job.status in RELEASED_STATUSES:
+        return bookings.delete()[0]
+    start, end = booking_window(job.scheduled_date)
+    try:
+        with transaction.atomic():
+            return bookings.exclude(starts_at=start, ends_at=end).update(starts_at=start, ends_at=end)
+    except IntegrityError:
+        raise BookingConflict('Equipment is already booked for the new schedule.')
+
+
+def equipment_schedule(equipment, start, end):
+    """Return the bookings of ``equipment`` overlapping ``[start, end)``"""
+    return list(overlapping(EquipmentBooking.objects.filter(equipment=equipment), start, end).order_by('starts_at'))
@@ -0,0 +1,74 @@
+"""
+Versioned cache of the active equipment catalog.
+
+Every change to ``Equipment`` replaces the catalog version once its
+transaction commits (see ``equipment.signals``); code that writes equipment
+without model signals, such as ``QuerySet.update`` or ``bulk_create``, must
+call ``bump_catalog_version`` itself. Rendered catalog responses are cached
+under the version they were built for, so a bump makes every cached variant
+unreachable at once and they simply expire.
+
+The version doubles as the ``ETag`` of the catalog: clients that send it
+back in ``If-None-Match`` get a ``304`` without the catalog being read.
+
+Every process must see the same version, so enable the cache
+(``EQUIPMENT_CATALOG_CACHE_ENABLED``) only with a cache shared by all web
+and worker processes, such as Redis. When it is disabled the catalog is
+served uncached, without an ``ETag``.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+VERSION_KEY = 'equipment:catalog:version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'EQUIPMENT_CATALOG_CACHE', 'default')]
+
+
+def enabled():
+    return getattr(settings, 'EQUIPMENT_CATALOG_CACHE_ENABLED', False)
+
+
+def _new_version():
+    # Random rather than a counter, so a flushed cache can never hand out a
+    # version a client has already seen
+    return uuid.uuid4().hex[:16]
+
+
+def catalog_version():
+    """Return the current catalog version, starting a new one if the cache lost it"""
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response"""
+    get_cache().set(VERSION_KEY, _new_version(), None)
+
+
+def catalog_etag(version):
+    return f'"{version}"'
+
+
+def catalog_key(version, host, query_params):
+    """Return the cache key of one catalog variant, e.g. a page or a filter"""
+    params = sorted((key, value) for key in query_params for value in query_params.getlist(key))
+    digest = hashlib.sha1(repr((host, params)).encode()).hexdigest()
+    return f'equipment:catalog:{version}:{digest}'
+
+
+def get_rendered(key):
+    return get_cache().get(key)
+
+
+def set_rendered(key, body):
+    get_cache().set(key, body, getattr(settings, 'EQUIPMENT_CATALOG_CACHE_TIMEOUT', 3600))
@@ -0,0 +1,164 @@
+"""
+Bulk equipment import.
+
+Rows are parsed from CSV or NDJSON one at a time, validated, and upserted on
+``serial_number`` in chunks with an ``INSERT ... ON CONFLICT DO UPDATE`` per
+chunk and set of supplied columns, so memory stays constant whatever the file
+size. Existing equipment only has the columns a row supplies updated: a
+missing column or empty CSV cell keeps the stored value. Rows that fail
+validation or cannot be decoded are reported by line number; at most
+``max_errors`` are kept.
+"""
+import codecs
+import csv
+import json
+
+from django.db import transaction
+
+from core.cache import bump_tags
+
+from .cache import bump_catalog_version
+from .models import Equipment
+from .serializers import EquipmentSerializer
+
+
+FORMATS = ('csv', 'ndjson')
+
+UPDATE_FIELDS = ['name', 'type', 'is_active', 'description']
+
+
+class EquipmentImportSerializer(EquipmentSerializer):
+    """
+    Validates one imported row; existing serial numbers are updated, not rejected
+    """
+    class Meta(EquipmentSerializer.Meta):
+        extra_kwargs = {'serial_number': {'validators': []}}
+
+
+def detect_format(name='', content_type=''):
+    """Guess the import format from a file name or content type"""
+    name = (name or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return None
+
+
+def iter_csv(stream):
+    """Yield ``(line, row)`` from a binary CSV stream with a header row"""
+    reader = csv.DictReader(codecs.iterdecode(stream, 'utf-8-sig'))
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except UnicodeDecodeError as exc:
+            # The rest of the stream cannot be decoded reliably
+            yield reader.line_num + 1, exc
+            return
+        except csv.Error as exc:
+            yield reader.line_num, exc
+            continue
+        # Empty cells mean "not given": defaults for new rows, unchanged for existing ones
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def iter_ndjson(stream):
+    """Yield ``(line, row)`` from a binary stream of JSON objects, one per line"""
+    for line, raw in enumerate(stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError as exc:
+            yield line, exc
+            continue
+        yield line, row if isinstance(row, dict) else ValueError('Expected a JSON object')
+
+
+def iter_rows(stream, fmt):
+    if fmt == 'csv':
+        return iter_csv(stream)
+    if fmt == 'ndjson':
+        return iter_ndjson(stream)
+    raise ValueError(f'Unsupported import format: {fmt}')
+
+
+class ImportReport:
+    """
+    Counts and capped per-row errors of one import
+    """
+    def __init__(self, max_errors=100):
+        self.max_errors = max_errors
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'processed': self.processed,
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+def _upsert(chunk):
+    # One statement per set of supplied columns, so existing rows keep the others
+    groups = {}
+    for data in chunk.values():
+        fields = tuple(field for field in UPDATE_FIELDS if field in data)
+        groups.setdefault(fields, []).append(Equipment(**data))
+    with transaction.atomic():
+        for fields, objs in groups.items():
+            Equipment.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=['serial_number'],
+                update_fields=[*fields, 'updated_at'],
+            )
+    return len(chunk)
+
+
+def import_equipment(rows, chunk_size=500, max_errors=100):
+    """
+    Validate and upsert ``(line, row)`` pairs; return an ``ImportReport``
+
+    Within a chunk, rows for the same serial number are merged, later
+    values winning, as one ``ON CONFLICT`` statement cannot update the same
+    row twice.
+    """
+    report = ImportReport(max_errors=max_errors)
+    chunk = {}
+    for line, row in rows:
+        report.processed += 1
+        if isinstance(row, Exception):
+            report.add_error(line, {'non_field_errors': [str(row)]})
+            continue
+        serializer = EquipmentImportSerializer(data=row)
+        if not serializer.is_valid():
+            report.add_error(line, serializer.errors)
+            continue
+        serial_number = serializer.validated_data['serial_number']
+        chunk[serial_number] = {**chunk.get(serial_number, {}), **serializer.validated_data}
+        if len(chunk) >= chunk_size:
+            report.imported += _upsert(chunk)
+            chunk = {}
+    if chunk:
+        report.imported += _upsert(chunk)
+
+    if report.imported:
+        # bulk_create sends no model signals
+        transaction.on_commit(bump_catalog_version)
+        bump_tags('equipment')
+    return report
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.importer import FORMATS, detect_format, import_equipment, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Import equipment from a CSV or NDJSON file, updating existing serial numbers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows upserted per statement')
+        parser.add_argument('--max-errors', type=int, default=100, help='Row errors to report')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or detect_format(options['path'])
+        if fmt is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = import_equipment(
+                    iter_rows(stream, fmt),
+                    chunk_size=options['chunk_size'],
+                    max_errors=options['max_errors'],
+                ).as_dict()
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        if report['errors_truncated']:
+            self.stderr.write(f"... {report['failed'] - len(report['errors'])} more rows failed")
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {report['processed']} rows: {report['imported']} imported, {report['failed']} failed"
+        ))
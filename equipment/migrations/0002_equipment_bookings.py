@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_job_reminders'),
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('equipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='equipment.equipment')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='equipment_bookings', to='jobs.job')),
+            ],
+            options={
+                'verbose_name': 'Equipment Booking',
+                'verbose_name_plural': 'Equipment Bookings',
+                'db_table': 'equipment_bookings',
+                'ordering': ['starts_at'],
+                'indexes': [models.Index(fields=['equipment', 'starts_at', 'ends_at'], name='equipment_bookings_eq_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentbooking',
+            constraint=models.CheckConstraint(check=models.Q(('ends_at__gt', models.F('starts_at'))), name='equipment_booking_positive'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='equipmentbooking',
+            unique_together={('equipment', 'job')},
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    Reject overlapping bookings of the same equipment at the database level.
+
+    PostgreSQL only. Equipment equality is expressed as overlap of the
+    single-point range ``[equipment_id, equipment_id]`` so both columns use
+    the built-in GiST range operator class and no extension is needed.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE equipment_bookings ADD CONSTRAINT equipment_bookings_no_overlap EXCLUDE USING gist ("
+        "int8range(equipment_id, equipment_id, '[]') WITH &&, "
+        "tstzrange(starts_at, ends_at, '[)') WITH &&)"
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE equipment_bookings DROP CONSTRAINT IF EXISTS equipment_bookings_no_overlap')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_equipment_bookings'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,47 @@
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def add_trigram_indexes(apps, schema_editor):
+    """
+    Index name and serial number for trigram search.
+
+    PostgreSQL only. If ``pg_trgm`` cannot be installed (it ships with the
+    contrib package and needs the CREATE privilege on the database) search
+    falls back to the in-process index and the migration still succeeds.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError as exc:
+        logger.warning('pg_trgm is not available, equipment search will use the in-process index: %s', exc)
+        return
+    schema_editor.execute('CREATE INDEX IF NOT EXISTS equipment_name_trgm_idx ON equipment USING gin (name gin_trgm_ops)')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS equipment_serial_trgm_idx ON equipment USING gin (serial_number gin_trgm_ops)'
+    )
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS equipment_name_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS equipment_serial_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0003_booking_exclusion_constraint'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
@@ -27,3 +27,34 @@ class Equipment(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.serial_number})"
+
+
+class EquipmentBooking(models.Model):
+    """
+    Time interval ``[starts_at, ends_at)`` during which equipment is reserved
+    for a job, held while any open task of the job requires it
+    
+    On PostgreSQL overlapping bookings of the same equipment are rejected by
+    the ``equipment_bookings_no_overlap`` exclusion constraint (migration 0003).
+    """
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='bookings')
+    job = models.ForeignKey('jobs.Job', on_delete=models.CASCADE, related_name='equipment_bookings')
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'equipment_bookings'
+        verbose_name = 'Equipment Booking'
+        verbose_name_plural = 'Equipment Bookings'
+        ordering = ['starts_at']
+        unique_together = ['equipment', 'job']
+        indexes = [
+            models.Index(fields=['equipment', 'starts_at', 'ends_at'], name='equipment_bookings_eq_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(check=models.Q(ends_at__gt=models.F('starts_at')), name='equipment_booking_positive'),
+        ]
+    
+    def __str__(self):
+        return f"{self.equipment_id} booked for job {self.job_id} ({self.starts_at} - {self.ends_at})"
@@ -0,0 +1,186 @@
+"""
+Fuzzy equipment search.
+
+``?q=`` ranks equipment by trigram word similarity of the query to ``name``
+and ``serial_number``, so partial and misspelled serial numbers still match.
+On PostgreSQL with ``pg_trgm`` (migration 0004) matching uses the ``<%``
+operator over GIN trigram indexes. Elsewhere an in-process inverted trigram
+index is built from the primary database once per equipment catalog version
+and shared by the requests of a worker process. The version only follows
+changes made by other processes through a shared cache, so without one
+(``EQUIPMENT_CATALOG_CACHE_ENABLED`` off) the index is also rebuilt every
+``EQUIPMENT_SEARCH_INDEX_TTL`` seconds.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, models
+from django.db.models.functions import Greatest
+from rest_framework.filters import BaseFilterBackend
+
+from core.routers import use_primary
+
+from .cache import catalog_version, enabled as catalog_cache_enabled
+from .models import Equipment
+
+
+SEARCH_FIELDS = ('name', 'serial_number')
+MAX_LIMIT = 50
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def trigrams(text):
+    """Return the trigrams of ``text`` the way ``pg_trgm`` extracts them"""
+    grams = set()
+    for word in _WORD.findall((text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Inverted trigram index over equipment names and serial numbers
+    """
+    def __init__(self, rows):
+        self.postings = {}
+        self.fields = {}
+        for pk, *values in rows:
+            self.fields[pk] = [trigrams(value) for value in values]
+            for gram in set().union(*self.fields[pk]):
+                self.postings.setdefault(gram, []).append(pk)
+
+    def search(self, query, threshold, limit):
+        """
+        Return ``[(pk, score)]`` best first; the score is the share of the
+        query's trigrams found in the best matching field
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        candidates = Counter()
+        for gram in query_grams:
+            candidates.update(self.postings.get(gram, ()))
+
+        minimum = threshold * len(query_grams)
+        scored = []
+        for pk, shared in candidates.items():
+            if shared < minimum:
+                continue
+            score = max(
+                (len(query_grams & grams) / len(query_grams), len(query_grams & grams) / len(query_grams | grams))
+                for grams in self.fields[pk]
+            )
+            scored.append((score, pk))
+        scored.sort(key=lambda item: (-item[0][0], -item[0][1], item[1]))
+        return [(pk, score[0]) for score, pk in scored[:limit]]
+
+
+_index_lock = threading.Lock()
+_index = (None, None, None)
+
+
+def _is_current(indexed_version, built_at, version):
+    if indexed_version != version:
+        return False
+    if catalog_cache_enabled():
+        return True
+    return time.monotonic() - built_at < getattr(settings, 'EQUIPMENT_SEARCH_INDEX_TTL', 60)
+
+
+def get_index():
+    """Return the trigram index of the current catalog version, building it if needed"""
+    global _index
+    version = catalog_version()
+    indexed_version, built_at, index = _index
+    if not _is_current(indexed_version, built_at, version):
+        with _index_lock:
+            indexed_version, built_at, index = _index
+            if not _is_current(indexed_version, built_at, version):
+                with use_primary():
+                    index = TrigramIndex(Equipment.objects.values_list('id', *SEARCH_FIELDS).iterator())
+                _index = (version, time.monotonic(), index)
+    return index
+
+
+_extension_cache = {}
+
+
+def trigram_extension_installed(using='default'):
+    """Whether ``pg_trgm`` is available on the database behind ``using``"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    key = (using, connection.settings_dict['NAME'])
+    if key not in _extension_cache:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _extension_cache[key] = cursor.fetchone() is not None
+    return _extension_cache[key]
+
+
+def fuzzy_search(queryset, query, limit):
+    """Return ``queryset`` narrowed to the ``limit`` best matches of ``query``, best first"""
+    if trigram_extension_installed(queryset.db):
+        from django.contrib.postgres.lookups import TrigramWordSimilar
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        condition = models.Q()
+        for field in SEARCH_FIELDS:
+            # "field %> query", which the GIN trigram indexes can answer
+            condition |= models.Q(TrigramWordSimilar(models.F(field), query))
+        return queryset.filter(condition).annotate(
+            similarity=Greatest(*[TrigramWordSimilarity(query, field) for field in SEARCH_FIELDS])
+        ).order_by('-similarity', 'name')[:limit]
+
+    threshold = getattr(settings, 'EQUIPMENT_SEARCH_THRESHOLD', 0.5)
+    # Other filters may drop some of the matches, so over-fetch candidates
+    ranked = get_index().search(query, threshold, limit * 10)
+    if not ranked:
+        return queryset.none()
+    rank = models.Case(
+        *[models.When(pk=pk, then=position) for position, (pk, _) in enumerate(ranked)],
+        output_field=models.IntegerField(),
+    )
+    return queryset.filter(pk__in=[pk for pk, _ in ranked]).order_by(rank)[:limit]
+
+
+class TrigramSearchFilter(BaseFilterBackend):
+    """
+    ``?q=`` fuzzy search returning the top ``?limit=`` matches by similarity;
+    list it last so its ranking replaces any other ordering
+    """
+    search_param = 'q'
+    limit_param = 'limit'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        try:
+            limit = int(request.query_params.get(self.limit_param, getattr(settings, 'EQUIPMENT_SEARCH_LIMIT', 10)))
+        except ValueError:
+            limit = getattr(settings, 'EQUIPMENT_SEARCH_LIMIT', 10)
+        return fuzzy_search(queryset, query, max(1, min(limit, MAX_LIMIT)))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Fuzzy search on name and serial number, ranked by similarity',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.limit_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of fuzzy search results (max {MAX_LIMIT})',
+                'schema': {'type': 'integer'},
+            },
+        ]
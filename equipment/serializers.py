@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Equipment
+from .models import Equipment, EquipmentBooking
 
 
 class EquipmentSerializer(serializers.ModelSerializer):
@@ -21,4 +21,14 @@ class EquipmentListSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Equipment
-        fields = ['id', 'name', 'type', 'serial_number', 'is_active'] 
\ No newline at end of file
+        fields = ['id', 'name', 'type', 'serial_number', 'is_active'] 
+
+
+class EquipmentBookingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for EquipmentBooking model
+    """
+    class Meta:
+        model = EquipmentBooking
+        fields = ['id', 'equipment', 'job', 'starts_at', 'ends_at']
+        read_only_fields = fields
@@ -0,0 +1,64 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .availability import book_job, reschedule_job
+from .cache import bump_catalog_version
+from .models import Equipment
+
+
+def invalidate_catalog(sender, instance, raw=False, **kwargs):
+    """Replace the catalog version once the change is visible to other requests"""
+    if raw:
+        return
+    transaction.on_commit(bump_catalog_version)
+
+
+def sync_required_equipment(sender, instance, action, reverse, pk_set, **kwargs):
+    """Book or release equipment when a task's required equipment changes"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        book_job(instance.job)
+        return
+    # Changed from the equipment side; pk_set is not sent for clear
+    Job = apps.get_model('jobs', 'Job')
+    jobs = Job.objects.filter(equipment_bookings__equipment=instance) if action == 'post_clear' else \
+        Job.objects.filter(tasks__in=pk_set)
+    for job in jobs.distinct():
+        book_job(job)
+
+
+def sync_task(sender, instance, created, raw=False, **kwargs):
+    """Rebook the job when a task that requires equipment changes, e.g. is completed"""
+    if raw or created:
+        return
+    if instance.required_equipment.exists():
+        book_job(instance.job)
+
+
+def release_deleted_task(sender, instance, **kwargs):
+    """Rebook the job of a deleted task, unless the job is being deleted too"""
+    job = apps.get_model('jobs', 'Job').objects.filter(pk=instance.job_id).first()
+    if job is not None:
+        book_job(job)
+
+
+def sync_job(sender, instance, created, raw=False, **kwargs):
+    """Follow reschedules and release the equipment of finished jobs"""
+    if raw or created:
+        return
+    reschedule_job(instance)
+
+
+def connect_signals():
+    post_save.connect(invalidate_catalog, sender=Equipment, dispatch_uid='equipment_catalog_save')
+    post_delete.connect(invalidate_catalog, sender=Equipment, dispatch_uid='equipment_catalog_delete')
+    JobTask = apps.get_model('jobs', 'JobTask')
+    m2m_changed.connect(
+        sync_required_equipment, sender=JobTask.required_equipment.through,
+        dispatch_uid='equipment_sync_required_equipment',
+    )
+    post_save.connect(sync_task, sender=JobTask, dispatch_uid='equipment_sync_task')
+    post_delete.connect(release_deleted_task, sender=JobTask, dispatch_uid='equipment_release_deleted_task')
+    post_save.connect(sync_job, sender=apps.get_model('jobs', 'Job'), dispatch_uid='equipment_sync_job')
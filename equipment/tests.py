@@ -1,3 +1,435 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from users.models import User
+from jobs.admin import JobTaskAdminForm
+from jobs.models import Job, JobTask
+from jobs.serializers import JobTaskCreateSerializer
+from jobs.validators import validate_equipment_availability
+from core.routers import lag_monitor, use_replica
+from . import cache, search
+from .models import Equipment, EquipmentBooking
 
-# Create your tests here.
+
+class EquipmentAvailabilityTest(TestCase):
+    """Test cases for equipment bookings and availability checks"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+        self.drill = Equipment.objects.create(name='Drill', serial_number='DRILL-1')
+        self.ladder = Equipment.objects.create(name='Ladder', serial_number='LADDER-1')
+        self.job = self.create_job(self.start)
+        self.task = JobTask.objects.create(job=self.job, title='Mount', description='Mount shelves', order=1)
+        self.task.required_equipment.add(self.drill)
+    
+    def create_job(self, scheduled_date):
+        return Job.objects.create(
+            title='Job',
+            description='Test description',
+            client_name='Test Client',
+            created_by=self.admin_user,
+            scheduled_date=scheduled_date
+        )
+    
+    def test_adding_equipment_books_the_job_window(self):
+        """Test that required equipment is booked for the job's window"""
+        booking = EquipmentBooking.objects.get(job=self.job)
+        self.assertEqual(booking.equipment, self.drill)
+        self.assertEqual(booking.starts_at, self.start)
+        self.assertEqual(booking.ends_at, self.start + timedelta(hours=8))
+    
+    def test_overlapping_job_is_rejected_in_one_query(self):
+        """Test that a conflicting job is rejected with a single overlap query"""
+        with self.assertNumQueries(1):
+            with self.assertRaises(ValidationError):
+                validate_equipment_availability([self.drill, self.ladder], self.start + timedelta(hours=4))
+    
+        # Half-open intervals: a job starting when the booking ends is fine
+        validate_equipment_availability([self.drill], self.start + timedelta(hours=8))
+        validate_equipment_availability([self.ladder], self.start)
+    
+    def test_task_serializer_rejects_booked_equipment(self):
+        """Test that creating a task with booked equipment fails validation"""
+        other_job = self.create_job(self.start + timedelta(hours=1))
+        serializer = JobTaskCreateSerializer(data={
+            'job': other_job.id, 'title': 'Drill', 'description': 'Drill holes',
+            'required_equipment': [self.drill.id], 'order': 1,
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('Drill (DRILL-1) is booked', str(serializer.errors))
+    
+    def test_tasks_of_one_job_share_equipment(self):
+        """Test that equipment can be required by several tasks of one job"""
+        serializer = JobTaskCreateSerializer(data={
+            'job': self.job.id, 'title': 'Drill', 'description': 'Drill holes',
+            'required_equipment': [self.drill.id], 'order': 2,
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(EquipmentBooking.objects.filter(equipment=self.drill).count(), 1)
+    
+    def test_finishing_task_releases_equipment(self):
+        """Test that equipment is freed once no open task requires it"""
+        other_task = JobTask.objects.create(job=self.job, title='Drill', description='Drill holes', order=2)
+        other_task.required_equipment.add(self.drill, self.ladder)
+    
+        self.task.status = 'completed'
+        self.task.save()
+        self.assertEqual(EquipmentBooking.objects.count(), 2)
+    
+        other_task.status = 'completed'
+        other_task.save()
+        self.assertFalse(EquipmentBooking.objects.exists())
+        validate_equipment_availability([self.drill], self.start)
+    
+    def test_rescheduling_job_moves_bookings(self):
+        """Test that bookings follow the job's scheduled date"""
+        new_start = self.start + timedelta(days=1)
+        self.job.scheduled_date = new_start
+        self.job.save()
+        self.assertEqual(EquipmentBooking.objects.get(job=self.job).starts_at, new_start)
+    
+    def test_reopening_task_onto_booked_equipment_is_a_conflict(self):
+        """Test that a booking conflict raised while saving rolls back and returns 409"""
+        self.task.status = 'completed'
+        self.task.save()
+        other_task = JobTask.objects.create(
+            job=self.create_job(self.start + timedelta(hours=1)), title='Drill', description='Drill holes', order=1
+        )
+        other_task.required_equipment.add(self.drill)
+        client = APIClient()
+        client.force_authenticate(self.admin_user)
+        
+        response = client.post(reverse('jobs:update-task-status', args=[self.task.id]), {'status': 'pending'})
+        
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Drill (DRILL-1) is booked', response.data['detail'])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'completed')
+        self.assertEqual(list(EquipmentBooking.objects.values_list('job', flat=True)), [other_task.job_id])
+    
+    def test_admin_form_rejects_booked_equipment(self):
+        """Test that the admin task form reports booked equipment instead of failing on save"""
+        other_job = self.create_job(self.start + timedelta(hours=1))
+        form = JobTaskAdminForm(data={
+            'job': other_job.id, 'title': 'Drill', 'description': 'Drill holes', 'status': 'pending',
+            'required_equipment': [self.drill.id], 'order': 1,
+        })
+        
+        self.assertFalse(form.is_valid())
+        self.assertIn('Drill (DRILL-1) is booked', str(form.non_field_errors()))
+    
+    def test_availability_endpoint(self):
+        """Test the equipment availability endpoint"""
+        client = APIClient()
+        client.force_authenticate(self.admin_user)
+        url = reverse('equipment:equipment-availability', args=[self.drill.id])
+    
+        response = client.get(url, {'start': self.start.isoformat(), 'end': (self.start + timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['available'])
+        self.assertEqual([booking['job'] for booking in response.data['bookings']], [self.job.id])
+    
+        response = client.get(url, {'start': (self.start + timedelta(days=1)).isoformat()})
+        self.assertTrue(response.data['available'])
+    
+        response = client.get(url, {'start': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL exclusion constraint')
+class EquipmentBookingConstraintTest(TestCase):
+    """Test cases for the PostgreSQL booking exclusion constraint"""
+    
+    def test_overlapping_bookings_are_rejected(self):
+        """Test that the database rejects overlapping bookings of one item"""
+        admin_user = User.objects.create_user(username='admin', password='testpass123', role='admin')
+        drill = Equipment.objects.create(name='Drill', serial_number='DRILL-1')
+        ladder = Equipment.objects.create(name='Ladder', serial_number='LADDER-1')
+        start = timezone.now() + timedelta(days=1)
+        jobs = [
+            Job.objects.create(
+                title='Job', description='Test', client_name='Client',
+                created_by=admin_user, scheduled_date=start
+            )
+            for _ in range(2)
+        ]
+        EquipmentBooking.objects.create(equipment=drill, job=jobs[0], starts_at=start, ends_at=start + timedelta(hours=2))
+        EquipmentBooking.objects.create(equipment=ladder, job=jobs[1], starts_at=start, ends_at=start + timedelta(hours=2))
+    
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            EquipmentBooking.objects.create(
+                equipment=drill, job=jobs[1], starts_at=start + timedelta(hours=1), ends_at=start + timedelta(hours=3)
+            )
+
+
+@override_settings(EQUIPMENT_CATALOG_CACHE_ENABLED=True)
+class EquipmentCatalogCacheTest(TestCase):
+    """Test cases for the versioned equipment catalog cache"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.get_cache().clear()
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(name='Drill', serial_number='DRILL-1')
+            Equipment.objects.create(name='Ladder', serial_number='LADDER-1', is_active=False)
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.technician_user)
+        self.url = reverse('equipment:equipment-list')
+    
+    def test_hit_serves_cached_json_without_queries(self):
+        """Test that a cached catalog is served without database queries"""
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([row['name'] for row in first.json()['results']], ['Drill'])
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_matching_etag_gets_304(self):
+        """Test that clients holding the current version get a 304"""
+        etag = self.client.get(self.url)['ETag']
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_equipment_change_bumps_version(self):
+        """Test that saving equipment invalidates the cached catalog"""
+        etag = self.client.get(self.url)['ETag']
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(name='Van', serial_number='VAN-1')
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Drill', 'Van'])
+    
+    def test_version_bump_crosses_processes(self):
+        """Test that a version bumped by another process, e.g. an import command, replaces this one's ETag"""
+        with tempfile.TemporaryDirectory() as directory:
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+            with override_settings(CACHES=caches):
+                etag = self.client.get(self.url)['ETag']
+                
+                script = (
+                    'import django; django.setup()\n'
+                    'from django.test.utils import override_settings\n'
+                    f'with override_settings(CACHES={caches!r}):\n'
+                    '    from equipment.cache import bump_catalog_version\n'
+                    '    bump_catalog_version()\n'
+                )
+                subprocess.run(
+                    [sys.executable, '-c', script], cwd=settings.BASE_DIR, check=True,
+                    env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'jobops.settings'},
+                )
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+    
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_misses_are_rebuilt_from_the_primary(self):
+        """Test that a catalog miss reads the primary even where replica reads are allowed"""
+        lag_monitor.reset()
+        self.addCleanup(lag_monitor.reset)
+        with mock.patch.object(lag_monitor, 'measure', return_value=0.0):
+            # replica_1 is not a configured database, so any read routed there fails
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+    
+    @override_settings(EQUIPMENT_CATALOG_CACHE_ENABLED=False)
+    def test_cache_can_be_disabled(self):
+        """Test that the catalog is read every time, without an ETag, when the cache is disabled"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        with self.assertNumQueries(2):
+            self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+
+
+class EquipmentImportTest(TestCase):
+    """Test cases for bulk equipment import"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        Equipment.objects.create(name='Old Drill', serial_number='DRILL-1', type='tool')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin_user)
+        self.url = reverse('equipment:equipment-import')
+    
+    def test_csv_upload_upserts_and_reports_errors(self):
+        """Test that CSV rows are upserted on serial number and bad rows reported"""
+        upload = SimpleUploadedFile('stock.csv', (
+            'name,type,serial_number,is_active\n'
+            'Drill,machine,DRILL-1,true\n'
+            'Ladder,,LADDER-1,\n'
+            'Crane,spaceship,CRANE-1,true\n'
+            'Ladder XL,tool,LADDER-1,false\n'
+        ).encode(), content_type='text/csv')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['processed'], 4)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual([error['line'] for error in response.data['errors']], [4])
+        self.assertIn('type', response.data['errors'][0]['errors'])
+        
+        drill = Equipment.objects.get(serial_number='DRILL-1')
+        self.assertEqual((drill.name, drill.type), ('Drill', 'machine'))
+        ladder = Equipment.objects.get(serial_number='LADDER-1')
+        self.assertEqual((ladder.name, ladder.is_active), ('Ladder XL', False))
+        self.assertEqual(Equipment.objects.count(), 2)
+    
+    def test_reimport_keeps_columns_a_row_does_not_supply(self):
+        """Test that missing columns and empty cells leave existing equipment unchanged"""
+        Equipment.objects.filter(serial_number='DRILL-1').update(is_active=False, description='Retired in 2024')
+        upload = SimpleUploadedFile('stock.csv', (
+            'name,type,serial_number,description\n'
+            'Drill,tool,DRILL-1,\n'
+            'Saw,tool,SAW-1,Circular\n'
+        ).encode(), content_type='text/csv')
+        
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 2)
+        drill = Equipment.objects.get(serial_number='DRILL-1')
+        self.assertEqual((drill.name, drill.is_active, drill.description), ('Drill', False, 'Retired in 2024'))
+        saw = Equipment.objects.get(serial_number='SAW-1')
+        self.assertEqual((saw.is_active, saw.description), (True, 'Circular'))
+    
+    def test_undecodable_csv_is_reported_not_raised(self):
+        """Test that invalid UTF-8 in a CSV upload becomes a row error"""
+        upload = SimpleUploadedFile(
+            'stock.csv', b'name,type,serial_number\nSaw,tool,SAW-1\nS\xffw,tool,SAW-2\n', content_type='text/csv',
+        )
+        
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3])
+    
+    def test_command_imports_ndjson_in_chunks(self):
+        """Test the management command with NDJSON input and a small chunk size"""
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as handle:
+            for i in range(5):
+                handle.write(json.dumps({'name': f'Van {i}', 'type': 'vehicle', 'serial_number': f'VAN-{i}'}) + '\n')
+            handle.write('not json\n')
+        self.addCleanup(os.remove, handle.name)
+        
+        out, err = StringIO(), StringIO()
+        call_command('import_equipment', handle.name, chunk_size=2, stdout=out, stderr=err)
+        
+        self.assertEqual(Equipment.objects.filter(type='vehicle').count(), 5)
+        self.assertIn('5 imported, 1 failed', out.getvalue())
+        self.assertIn('line 6', err.getvalue())
+    
+    def test_admin_only(self):
+        """Test that non-admin users cannot import equipment"""
+        technician = User.objects.create_user(username='technician', password='testpass123', role='technician')
+        self.client.force_authenticate(technician)
+        response = self.client.post(self.url, {}, format='multipart')
+        self.assertEqual(response.status_code, 403)
+
+
+class EquipmentFuzzySearchTest(TestCase):
+    """Test cases for ?q= fuzzy equipment search"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.get_cache().clear()
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, serial_number in [
+                ('Hammer Drill', 'DRL-1042'), ('Drill Press', 'DRL-2042'),
+                ('Ladder', 'LAD-2001'), ('Van', 'VAN-77'),
+            ]:
+                Equipment.objects.create(name=name, serial_number=serial_number)
+        
+        self.client = APIClient()
+        self.client.force_authenticate(self.technician_user)
+        self.url = reverse('equipment:equipment-list')
+    
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['serial_number'] for row in response.json()['results']]
+    
+    def test_misspelled_and_partial_queries_match(self):
+        """Test that typos and partial serial numbers find the equipment"""
+        self.assertEqual(self.search(q='DRL-1024'), ['DRL-1042'])
+        self.assertEqual(self.search(q='ladr'), ['LAD-2001'])
+        self.assertEqual(set(self.search(q='dril')), {'DRL-1042', 'DRL-2042'})
+        self.assertEqual(self.search(q='dril', limit=1)[0][:4], 'DRL-')
+        self.assertEqual(self.search(q='xyzzy'), [])
+    
+    def test_index_follows_catalog_changes(self):
+        """Test that new equipment is searchable once the catalog version changes"""
+        self.assertEqual(self.search(q='crane'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Equipment.objects.create(name='Crane', serial_number='CRN-1')
+        self.assertEqual(self.search(q='cran'), ['CRN-1'])
+    
+    @override_settings(EQUIPMENT_SEARCH_INDEX_TTL=0)
+    def test_index_expires_without_a_shared_catalog_cache(self):
+        """Test that changes the catalog version misses, e.g. from another process, reach the index after the TTL"""
+        self.assertEqual(self.search(q='crane'), [])
+        # bulk_create bumps nothing, like a change made by another worker
+        Equipment.objects.bulk_create([Equipment(name='Crane', serial_number='CRN-1')])
+        
+        with override_settings(EQUIPMENT_CATALOG_CACHE_ENABLED=True):
+            self.assertEqual(self.search(q='cran'), [])
+        with override_settings(EQUIPMENT_CATALOG_CACHE_ENABLED=False):
+            self.assertEqual(self.search(q='cran'), ['CRN-1'])
+    
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_index_is_built_from_the_primary(self):
+        """Test that the index reads the primary even where replica reads are allowed"""
+        cache.bump_catalog_version()
+        lag_monitor.reset()
+        self.addCleanup(lag_monitor.reset)
+        with mock.patch.object(lag_monitor, 'measure', return_value=0.0), use_replica():
+            # replica_1 is not a configured database, so any read routed there fails
+            index = search.get_index()
+        self.assertEqual(index.search('ladr', 0.5, 1)[0][0], Equipment.objects.get(serial_number='LAD-2001').pk)
@@ -5,6 +5,8 @@ app_name = 'equipment'
 
 urlpatterns = [
     path('equipment/', views.EquipmentListCreateView.as_view(), name='equipment-list-create'),
+    path('equipment/import/', views.equipment_import_view, name='equipment-import'),
     path('equipment/<int:pk>/', views.EquipmentDetailView.as_view(), name='equipment-detail'),
+    path('equipment/<int:pk>/availability/', views.equipment_availability_view, name='equipment-availability'),
     path('equipment/list/', views.EquipmentListView.as_view(), name='equipment-list'),
 ] 
\ No newline at end of file
@@ -1,11 +1,29 @@
-from rest_framework import generics, filters
+from datetime import timedelta
+from rest_framework import generics, filters, status
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from . import cache
+from .availability import equipment_schedule
+from .importer import FORMATS, detect_format, import_equipment, iter_rows
+from .search import TrigramSearchFilter
 from .models import Equipment
-from .serializers import EquipmentSerializer, EquipmentListSerializer
+from .serializers import EquipmentSerializer, EquipmentListSerializer, EquipmentBookingSerializer
+from core.cache import CachedResponseMixin
+from core.routers import use_primary
 from users.permissions import IsAdminUser
+from users.scopes import scope_equipment
 
 
-class EquipmentListCreateView(generics.ListCreateAPIView):
+class EquipmentListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
     """
     List all equipment or create new equipment (Admin only)
     """
@@ -16,6 +34,10 @@ class EquipmentListCreateView(generics.ListCreateAPIView):
     ordering_fields = ['name', 'created_at', 'updated_at']
     ordering = ['name']
     permission_classes = [IsAdminUser]
+    cache_tags = ('equipment',)
+    
+    def get_queryset(self):
+        return scope_equipment(super().get_queryset(), self.request.user)
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -23,23 +45,156 @@ class EquipmentListCreateView(generics.ListCreateAPIView):
         return EquipmentSerializer
 
 
-class EquipmentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class EquipmentDetailView(CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete equipment (Admin only)
     """
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
     permission_classes = [IsAdminUser]
+    cache_tags = ('equipment',)
+    
+    def get_queryset(self):
+        return scope_equipment(super().get_queryset(), self.request.user)
 
 
 class EquipmentListView(generics.ListAPIView):
     """
     List all active equipment (Read-only for all authenticated users)
+    
+    ``?q=`` returns the best fuzzy matches on name and serial number instead.
     """
     queryset = Equipment.objects.filter(is_active=True)
     serializer_class = EquipmentListSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter, TrigramSearchFilter]
     filterset_fields = ['type']
     search_fields = ['name', 'serial_number']
     ordering_fields = ['name', 'type']
     ordering = ['name']
+    
+    def get_queryset(self):
+        # The catalog is active-only for everyone, so the scope never makes
+        # cached responses differ between users
+        return scope_equipment(super().get_queryset(), self.request.user)
+    
+    def list(self, request, *args, **kwargs):
+        """
+        Serve the catalog from the versioned cache; the ``ETag`` is the
+        catalog version and a matching ``If-None-Match`` gets a 304
+        """
+        if not cache.enabled():
+            return super().list(request, *args, **kwargs)
+        
+        version = cache.catalog_version()
+        etag = cache.catalog_etag(version)
+        if request.headers.get('If-None-Match') == etag:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            response = super().list(request, *args, **kwargs)
+            response['ETag'] = etag
+            return response
+        
+        # Pagination links are absolute, so the host is part of the key
+        key = cache.catalog_key(version, request.get_host(), request.query_params)
+        body = cache.get_rendered(key)
+        if body is None:
+            # A lagging replica would store old rows under the new version
+            with use_primary():
+                body = JSONRenderer().render(super().list(request, *args, **kwargs).data)
+            cache.set_rendered(key, body)
+        return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
+
+def _parse_moment(value, default):
+    if not value:
+        return default
+    moment = parse_datetime(value)
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('start', OpenApiTypes.DATETIME, description='Start of the window (default: now)'),
+        OpenApiParameter('end', OpenApiTypes.DATETIME, description='End of the window, exclusive (default: start + 7 days)'),
+    ],
+    responses={
+        200: OpenApiResponse(description="Bookings of the equipment overlapping the window"),
+        400: OpenApiResponse(description="Invalid window"),
+        404: OpenApiResponse(description="Equipment not found")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def equipment_availability_view(request, pk):
+    """
+    Get the bookings of one piece of equipment within a time window
+    """
+    try:
+        equipment = scope_equipment(Equipment.objects.all(), request.user).get(pk=pk)
+    except Equipment.DoesNotExist:
+        return Response(
+            {'error': 'Equipment not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    start = _parse_moment(request.query_params.get('start'), timezone.now())
+    end = _parse_moment(request.query_params.get('end'), start + timedelta(days=7) if start else None)
+    if start is None or end is None or end <= start:
+        return Response(
+            {'error': 'start and end must be ISO 8601 date-times with start before end'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    bookings = equipment_schedule(equipment, start, end)
+    return Response({
+        'equipment': equipment.id,
+        'is_active': equipment.is_active,
+        'start': start,
+        'end': end,
+        'available': equipment.is_active and not bookings,
+        'bookings': EquipmentBookingSerializer(bookings, many=True).data
+    })
+
+
+@extend_schema(
+    request={
+        'multipart/form-data': {
+            'type': 'object',
+            'properties': {
+                'file': {'type': 'string', 'format': 'binary'},
+                'format': {'type': 'string', 'enum': list(FORMATS)},
+            },
+        }
+    },
+    responses={
+        200: OpenApiResponse(description="Import report with per-row errors"),
+        400: OpenApiResponse(description="Missing file or unknown format")
+    }
+)
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAdminUser])
+def equipment_import_view(request):
+    """
+    Bulk import equipment from a CSV or NDJSON file, updating existing
+    serial numbers (Admin only)
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response(
+            {'error': 'file is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    fmt = request.data.get('format') or detect_format(upload.name, upload.content_type)
+    if fmt not in FORMATS:
+        return Response(
+            {'error': f"format must be one of {', '.join(FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    report = import_equipment(iter_rows(upload, fmt))
+    return Response(report.as_dict())
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,6 +32,10 @@ DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 # ALLOWED_HOSTS = [host.strip() for host in ((ALLOWED_HOSTS_ENV.strip()) or 'localhost,127.0.0.1,54.145.98.46').split(',') if host.strip()]
 
 ALLOWED_HOSTS = ['*']
+
+# Running the test suite (manage.py test or pytest): per-process stand-ins
+# replace the shared Redis stores
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
 # Application definition
 
 INSTALLED_APPS = [
@@ -52,9 +57,14 @@ INSTALLED_APPS = [
     'jobs',
     'equipment',
     'audit',
+    'core',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.SlowQuerySourceMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,6 +72,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'audit.middleware.AuditContextMiddleware',
 ]
 
 ROOT_URLCONF = 'jobops.urls'
@@ -96,9 +107,49 @@ DATABASES = {
         'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
         'HOST': os.environ.get('DATABASE_HOST', ''),
         'PORT': os.environ.get('DATABASE_PORT', ''),
+        # Keep connections open across requests (seconds; 0 closes them after each
+        # request) and check a kept connection is still usable before reusing it
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional in-process connection pool (PostgreSQL only), shared by the threads
+# of a gunicorn or Celery worker process; see core.db.pool
+if os.environ.get('DATABASE_POOL', 'False').lower() == 'true' and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'core.db.backends.postgresql',
+        # Connections go back to the pool at the end of each request
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', '10')),
+                'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', '5')),  # seconds to wait for a free connection
+                'check_interval': 30,  # ping connections idle longer than this many seconds before reuse
+                'max_lifetime': 3600,  # seconds before a connection is replaced
+            },
+        },
+    })
+
+# Read replicas, e.g. DATABASE_REPLICA_HOSTS=replica1,replica2 on PostgreSQL or
+# DATABASE_REPLICA_NAMES=/path/to/replica.sqlite3; unset parts are copied from default
+_replica_hosts = [host for host in os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',') if host]
+_replica_names = [name for name in os.environ.get('DATABASE_REPLICA_NAMES', '').split(',') if name]
+DATABASE_REPLICAS = []
+for _index in range(max(len(_replica_hosts), len(_replica_names))):
+    _alias = f'replica_{_index + 1}'
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'HOST': _replica_hosts[_index] if _index < len(_replica_hosts) else DATABASES['default']['HOST'],
+        'NAME': _replica_names[_index] if _index < len(_replica_names) else DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', '5'))  # seconds
+REPLICA_LAG_CHECK_INTERVAL = 5  # seconds between lag checks per replica and process
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,7 +198,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -157,7 +208,41 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
-# JWT Configuration
+# Cache shared by all processes: Redis when CACHE_REDIS_URL is set (e.g.
+# redis://localhost:6379/2), otherwise a per-process local-memory cache
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'jobops',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'jobops',
+        }
+    }
+
+# Cached API responses (core.cache); they are also invalidated by any change to the models they show.
+# Only on by default with a shared cache: a per-process cache would miss the
+# invalidations of other workers and Celery tasks.
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', str(bool(CACHE_REDIS_URL))).lower() == 'true'
+RESPONSE_CACHE = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Users resolved from JWTs are cached for this many seconds. Saving a user
+# drops the entry from AUTH_USER_CACHE; with the shared Redis cache that
+# reaches every process at once. Without CACHE_REDIS_URL each process keeps
+# its own entries, so other workers go on accepting a deactivated, demoted or
+# re-passworded user for up to AUTH_USER_CACHE_TIMEOUT seconds, hence the
+# short default there.
+AUTH_USER_CACHE = 'default'
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', '60' if CACHE_REDIS_URL else '5'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -180,8 +265,51 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 
     'JTI_CLAIM': 'jti',
+
+    # Rejects refresh tokens revoked through users.revocation
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshSerializer',
 }
 
+# Revoked JWTs (logout), shared by all workers through Redis. The local store
+# is per process, so a token revoked in one worker would still work in the
+# others; it is only the default for tests.
+JWT_REVOCATION_STORE = os.environ.get(
+    'JWT_REVOCATION_STORE',
+    'users.revocation.LocalRevocationStore' if TESTING else 'users.revocation.RedisRevocationStore',
+)
+JWT_REVOCATION_STORE_OPTIONS = (
+    {'url': os.environ.get('JWT_REVOCATION_REDIS_URL', 'redis://localhost:6379/1')}
+    if JWT_REVOCATION_STORE.endswith('RedisRevocationStore') else {}
+)
+JWT_REVOCATION_BLOOM_CAPACITY = 100000
+JWT_REVOCATION_BLOOM_ERROR_RATE = 0.001
+# Seconds before a worker picks up tokens revoked by other workers (Redis store)
+JWT_REVOCATION_SYNC_INTERVAL = int(os.environ.get('JWT_REVOCATION_SYNC_INTERVAL', '5'))
+
+# Per-request query count, database, serializer and view timing, logged to
+# jobops.requests and sent as a Server-Timing header (core.middleware)
+REQUEST_METRICS_ENABLED = os.environ.get('REQUEST_METRICS_ENABLED', 'False').lower() == 'true'
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '1.0'))
+REQUEST_METRICS_SERVER_TIMING = os.environ.get('REQUEST_METRICS_SERVER_TIMING', 'True').lower() == 'true'
+
+# N+1 query detection for development and staging: 'off', 'log' or 'raise'
+# when a query shape runs more than NPLUSONE_THRESHOLD times in one request
+NPLUSONE_DETECTION = os.environ.get('NPLUSONE_DETECTION', 'off')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', '5'))
+
+# Sampled slow-query log with EXPLAIN plans, kept in a ring buffer of
+# SLOW_QUERY_LOG_SIZE rows (core.slowqueries, admin: Slow Queries)
+SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'False').lower() == 'true'
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '500'))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_SAMPLE_RATE', '1.0'))
+SLOW_QUERY_SHAPE_INTERVAL = 60  # seconds between captures of one query shape per process
+SLOW_QUERY_LOG_SIZE = 1000
+
+# Admin bulk password changes: hashing processes (default: CPU count), and the
+# selection size above which hashing moves to a Celery task
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '0')) or None
+BULK_PASSWORD_ASYNC_THRESHOLD = 100
+
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -189,6 +317,10 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_RESULT_EXPIRES = timedelta(days=1)
+
+# Instrumented task runs are kept for this long
+TASK_RUN_TTL = timedelta(days=7)
 
 # Celery Beat Schedule
 CELERY_BEAT_SCHEDULE = {
@@ -204,7 +336,52 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'jobs.tasks.send_job_reminders',
         'schedule': timedelta(hours=6),  # Run every 6 hours
     },
+    'maintain-audit-partitions': {
+        'task': 'audit.tasks.maintain_audit_partitions',
+        'schedule': timedelta(days=1),  # Run daily
+    },
+}
+
+# Job reminders
+JOB_REMINDER_WINDOWS = {
+    '24h': timedelta(hours=24),
 }
+JOB_REMINDER_TRANSPORT = os.environ.get('JOB_REMINDER_TRANSPORT', 'jobs.reminders.ConsoleReminderTransport')
+JOB_REMINDER_MAX_ATTEMPTS = 3
+
+# Rendered equipment catalog responses; they are also invalidated by any equipment change.
+# Only on by default with a shared cache: a per-process cache would keep old
+# versions (and answer their ETags with 304) after changes made elsewhere.
+EQUIPMENT_CATALOG_CACHE_ENABLED = os.environ.get(
+    'EQUIPMENT_CATALOG_CACHE_ENABLED', str(bool(CACHE_REDIS_URL))
+).lower() == 'true'
+EQUIPMENT_CATALOG_CACHE = 'default'
+EQUIPMENT_CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Fuzzy equipment search (?q=): default result count, and the share of query
+# trigrams a match needs when pg_trgm is not available
+EQUIPMENT_SEARCH_LIMIT = 10
+EQUIPMENT_SEARCH_THRESHOLD = 0.5
+# Without a shared catalog cache the in-process search index cannot see
+# equipment changes made by other processes, so it is rebuilt this often (seconds)
+EQUIPMENT_SEARCH_INDEX_TTL = int(os.environ.get('EQUIPMENT_SEARCH_INDEX_TTL', '60'))
+
+# Equipment is booked from a job's scheduled date for this long
+EQUIPMENT_BOOKING_DURATION = timedelta(hours=int(os.environ.get('EQUIPMENT_BOOKING_HOURS', '8')))
+
+# Audit capture
+AUDIT_ENABLED = os.environ.get('AUDIT_ENABLED', 'True').lower() == 'true'
+# Hand captured audit rows to a Celery worker instead of writing them in-process
+AUDIT_ASYNC_FLUSH = os.environ.get('AUDIT_ASYNC_FLUSH', 'False').lower() == 'true'
+# 'compact' (one row per save with a JSON diff) or 'rows' (one row per field)
+AUDIT_RECORD_FORMAT = os.environ.get('AUDIT_RECORD_FORMAT', 'compact')
+# Audit partitions are monthly; whole months older than the retention period are dropped
+AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', '24'))
+AUDIT_PARTITION_PREMAKE_MONTHS = 2
+# Detach expired partitions (PostgreSQL) or rename them (SQLite) instead of dropping them
+AUDIT_RETENTION_DETACH_ONLY = os.environ.get('AUDIT_RETENTION_DETACH_ONLY', 'False').lower() == 'true'
+# Route audit bulk writes and reads through per-month tables on SQLite
+AUDIT_SQLITE_PARTITIONING = os.environ.get('AUDIT_SQLITE_PARTITIONING', 'False').lower() == 'true'
 
 # DRF Spectacular Settings
 SPECTACULAR_SETTINGS = {
@@ -1,9 +1,65 @@
+from django import forms
 from django.contrib import admin
 from django.apps import apps
 from django.contrib.admin.sites import AlreadyRegistered
+from equipment.availability import RELEASED_STATUSES, required_equipment_ids
+from .models import Job, JobTask
+from .validators import validate_equipment_availability
 
 app_config = apps.get_app_config('jobs')
 
+
+class JobAdminForm(forms.ModelForm):
+    """
+    Rejects reschedules onto equipment booked by another job, which the
+    booking signal handlers would otherwise raise after the save
+    """
+    class Meta:
+        model = Job
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        job = self.instance
+        scheduled_date = cleaned_data.get('scheduled_date')
+        if (
+            job.pk and scheduled_date and scheduled_date != job.scheduled_date
+            and cleaned_data.get('status') not in RELEASED_STATUSES
+        ):
+            validate_equipment_availability(required_equipment_ids(job), scheduled_date, exclude_job=job)
+        return cleaned_data
+
+
+class JobTaskAdminForm(forms.ModelForm):
+    """
+    Rejects required equipment booked by another job in the task's job window
+    """
+    class Meta:
+        model = JobTask
+        fields = '__all__'
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        job = cleaned_data.get('job')
+        equipment = cleaned_data.get('required_equipment')
+        if (
+            job is not None and equipment and job.status not in RELEASED_STATUSES
+            and cleaned_data.get('status') not in RELEASED_STATUSES
+        ):
+            validate_equipment_availability(equipment, job.scheduled_date, exclude_job=job)
+        return cleaned_data
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    form = JobAdminForm
+
+
+@admin.register(JobTask)
+class JobTaskAdmin(admin.ModelAdmin):
+    form = JobTaskAdminForm
+
+
 for model in app_config.get_models():
     try:
         admin.site.register(model)
@@ -0,0 +1,75 @@
+"""
+Technician availability.
+
+A technician is busy on a day when an open job assigned to them is scheduled
+on it. Days are half-open datetime ranges ``[midnight, next midnight)`` in the
+current time zone, so lookups are plain range predicates on
+``(assigned_to, scheduled_date)`` and use the ``jobs_assignee_sched_idx``
+index, unlike ``scheduled_date__date=`` which wraps the column in a cast.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Job
+
+
+# Jobs in these states occupy their technician
+ACTIVE_STATUSES = ('pending', 'in_progress')
+
+MAX_WINDOW_DAYS = 62
+
+
+def day_bounds(day):
+    """Return the aware ``(start, end)`` range covering ``day`` in the current time zone"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def window_bounds(first_day, days):
+    """Return the aware ``(start, end)`` range covering ``days`` days from ``first_day``"""
+    start, _ = day_bounds(first_day)
+    _, end = day_bounds(first_day + timedelta(days=days - 1))
+    return start, end
+
+
+def busy_jobs(technician_ids, start, end, exclude_job=None):
+    """Return the open jobs of ``technician_ids`` scheduled in ``[start, end)``"""
+    jobs = Job.objects.filter(
+        assigned_to_id__in=technician_ids,
+        scheduled_date__gte=start,
+        scheduled_date__lt=end,
+        status__in=ACTIVE_STATUSES
+    )
+    if exclude_job is not None:
+        jobs = jobs.exclude(id=getattr(exclude_job, 'pk', exclude_job))
+    return jobs
+
+
+def technician_calendar(technicians, first_day, days):
+    """
+    Return free and busy days for every technician over ``days`` days from
+    ``first_day``, reading all their jobs with one query
+    """
+    start, end = window_bounds(first_day, days)
+    busy = defaultdict(lambda: defaultdict(list))
+    rows = busy_jobs([technician.id for technician in technicians], start, end).order_by(
+        'scheduled_date'
+    ).values_list('assigned_to_id', 'scheduled_date', 'id')
+    for technician_id, scheduled_date, job_id in rows:
+        busy[technician_id][timezone.localtime(scheduled_date).date()].append(job_id)
+
+    calendar_days = [first_day + timedelta(days=offset) for offset in range(days)]
+    return [
+        {
+            'technician': technician.id,
+            'username': technician.username,
+            'busy_days': [
+                {'date': day, 'jobs': busy[technician.id][day]}
+                for day in calendar_days if day in busy[technician.id]
+            ],
+            'free_days': [day for day in calendar_days if day not in busy[technician.id]],
+        }
+        for technician in technicians
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import jobs.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=20)),
+                ('scheduled_date', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Job Reminder',
+                'verbose_name_plural': 'Job Reminders',
+                'db_table': 'job_reminders',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='scheduled_date',
+            field=models.DateTimeField(validators=[jobs.validators.validate_scheduled_date_not_past]),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'scheduled_date'], name='jobs_status_sched_idx'),
+        ),
+        migrations.AddField(
+            model_name='jobreminder',
+            name='job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='jobs.job'),
+        ),
+        migrations.AddIndex(
+            model_name='jobreminder',
+            index=models.Index(fields=['status', 'id'], name='job_reminders_status_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobreminder',
+            unique_together={('job', 'window')},
+        ),
+    ]
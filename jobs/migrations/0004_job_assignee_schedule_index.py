@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_job_reminders'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['assigned_to', 'scheduled_date'], name='jobs_assignee_sched_idx'),
+        ),
+    ]
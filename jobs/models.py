@@ -41,6 +41,10 @@ class Job(models.Model):
         verbose_name = 'Job'
         verbose_name_plural = 'Jobs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'scheduled_date'], name='jobs_status_sched_idx'),
+            models.Index(fields=['assigned_to', 'scheduled_date'], name='jobs_assignee_sched_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.client_name}"
@@ -122,3 +126,37 @@ class JobTask(models.Model):
         if self.job.scheduled_date and timezone.now() > self.job.scheduled_date:
             return True
         return False
+
+
+class JobReminder(models.Model):
+    """
+    Outbox entry for a job reminder, unique per job and reminder window
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+    
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='reminders')
+    window = models.CharField(max_length=20)
+    scheduled_date = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'job_reminders'
+        verbose_name = 'Job Reminder'
+        verbose_name_plural = 'Job Reminders'
+        ordering = ['id']
+        unique_together = ['job', 'window']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_reminders_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.window} reminder for job {self.job_id} ({self.status})"
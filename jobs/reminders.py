@@ -0,0 +1,224 @@
+"""
+Job reminder pipeline.
+
+Due reminders are selected with a single query per reminder window and written
+into the ``JobReminder`` outbox, which is unique on ``(job, window)`` so that
+re-running the task never queues the same reminder twice. Pending outbox rows
+are then delivered in batches through a pluggable transport.
+"""
+import json
+import sys
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job, JobReminder
+
+
+DEFAULT_REMINDER_WINDOWS = {
+    '24h': timedelta(hours=24),
+}
+
+
+def get_reminder_windows():
+    """Return the configured reminder windows as ``{name: lead_time}``"""
+    return getattr(settings, 'JOB_REMINDER_WINDOWS', DEFAULT_REMINDER_WINDOWS)
+
+
+def get_transport():
+    """Instantiate the transport configured in ``JOB_REMINDER_TRANSPORT``"""
+    path = getattr(settings, 'JOB_REMINDER_TRANSPORT', 'jobs.reminders.ConsoleReminderTransport')
+    options = getattr(settings, 'JOB_REMINDER_TRANSPORT_OPTIONS', {})
+    return import_string(path)(**options)
+
+
+class BaseReminderTransport:
+    """
+    Base class for reminder transports.
+
+    ``send_messages`` receives a list of message dicts and must either deliver
+    all of them or raise, in which case the whole batch is marked as failed
+    and retried on the next run.
+    """
+    def send_messages(self, messages):
+        raise NotImplementedError('Reminder transports must implement send_messages()')
+
+
+class ConsoleReminderTransport(BaseReminderTransport):
+    """
+    Write reminders to a stream as JSON lines (stdout by default)
+    """
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send_messages(self, messages):
+        for message in messages:
+            self.stream.write(json.dumps(message) + '\n')
+        self.stream.flush()
+        return len(messages)
+
+
+class FileReminderTransport(ConsoleReminderTransport):
+    """
+    Append reminders to a file as JSON lines
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def send_messages(self, messages):
+        with open(self.path, 'a', encoding='utf-8') as stream:
+            for message in messages:
+                stream.write(json.dumps(message) + '\n')
+        return len(messages)
+
+
+class EmailReminderTransport(BaseReminderTransport):
+    """
+    Deliver reminders by email to the assigned technician over one connection
+    """
+    def __init__(self, from_email=None):
+        self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
+
+    def send_messages(self, messages):
+        datatuple = [
+            (
+                f"Reminder: {message['title']}",
+                f"Job '{message['title']}' for {message['client_name']} "
+                f"is scheduled for {message['scheduled_date']}.",
+                self.from_email,
+                [message['recipient']],
+            )
+            for message in messages if message['recipient']
+        ]
+        send_mass_mail(datatuple, fail_silently=False)
+        return len(messages)
+
+
+def enqueue_due_reminders(now=None, batch_size=1000):
+    """
+    Write outbox rows for every pending job entering a reminder window and
+    return how many were inserted.
+
+    Each window costs one query that only touches due jobs through the
+    ``(status, scheduled_date)`` index, plus bulk inserts for the result.
+    Rows a concurrent run queued first are skipped and not counted.
+    """
+    now = now or timezone.now()
+    queued = 0
+
+    for window, lead_time in get_reminder_windows().items():
+        due_jobs = Job.objects.filter(
+            status='pending',
+            scheduled_date__gte=now,
+            scheduled_date__lte=now + lead_time,
+        ).exclude(
+            reminders__window=window
+        ).values_list('id', 'scheduled_date')
+
+        reminders = [
+            JobReminder(job_id=job_id, window=window, scheduled_date=scheduled_date)
+            for job_id, scheduled_date in due_jobs.iterator(chunk_size=batch_size)
+        ]
+        for start in range(0, len(reminders), batch_size):
+            queued += _insert_new(reminders[start:start + batch_size])
+
+    return queued
+
+
+def _insert_new(reminders):
+    """Insert outbox rows, skipping any a concurrent run queued first; return how many were inserted"""
+    try:
+        with transaction.atomic():
+            JobReminder.objects.bulk_create(reminders)
+        return len(reminders)
+    except IntegrityError:
+        pass
+
+    # Rare: fall back to one row at a time to tell the new rows from the queued ones
+    inserted = 0
+    for reminder in reminders:
+        try:
+            with transaction.atomic():
+                reminder.save(force_insert=True)
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def build_message(reminder):
+    """Build the transport payload for an outbox row"""
+    job = reminder.job
+    recipient = job.assigned_to.email if job.assigned_to else None
+    return {
+        'reminder_id': reminder.id,
+        'job_id': job.id,
+        'window': reminder.window,
+        'title': job.title,
+        'client_name': job.client_name,
+        'scheduled_date': reminder.scheduled_date.isoformat(),
+        'recipient': recipient,
+    }
+
+
+def dispatch_pending_reminders(transport=None, batch_size=100, now=None):
+    """
+    Deliver pending outbox rows in batches and return the number sent.
+
+    Rows whose job is no longer pending are marked as skipped. A failed batch
+    is marked failed and retried until ``JOB_REMINDER_MAX_ATTEMPTS``.
+    """
+    transport = transport or get_transport()
+    now = now or timezone.now()
+    max_attempts = getattr(settings, 'JOB_REMINDER_MAX_ATTEMPTS', 3)
+    sent_count = 0
+    last_id = 0
+
+    while True:
+        batch = list(
+            JobReminder.objects.filter(
+                id__gt=last_id,
+                status__in=['pending', 'failed'],
+                attempts__lt=max_attempts,
+            ).select_related('job', 'job__assigned_to').order_by('id')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        deliverable = []
+        skipped_ids = []
+        for reminder in batch:
+            if reminder.job.status == 'pending' and reminder.job.scheduled_date >= now:
+                deliverable.append(reminder)
+            else:
+                skipped_ids.append(reminder.id)
+
+        if skipped_ids:
+            JobReminder.objects.filter(id__in=skipped_ids).update(status='skipped')
+        if not deliverable:
+            continue
+
+        deliverable_ids = [reminder.id for reminder in deliverable]
+        try:
+            transport.send_messages([build_message(reminder) for reminder in deliverable])
+        except Exception as exc:
+            for reminder in deliverable:
+                reminder.status = 'failed'
+                reminder.attempts += 1
+                reminder.last_error = str(exc)
+            JobReminder.objects.bulk_update(deliverable, ['status', 'attempts', 'last_error'])
+            continue
+
+        JobReminder.objects.filter(id__in=deliverable_ids).update(
+            status='sent',
+            sent_at=timezone.now(),
+            last_error=None,
+        )
+        sent_count += len(deliverable)
+
+    return sent_count
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
 from .models import Job, JobTask
+from .validators import validate_equipment_availability, validate_technician_availability
+from equipment.availability import required_equipment_ids
 from users.serializers import UserListSerializer
 from equipment.serializers import EquipmentListSerializer
 
@@ -32,6 +34,13 @@ class JobTaskCreateSerializer(serializers.ModelSerializer):
             'order', 'completed_at'
         ]
         read_only_fields = ['id']
+    
+    def validate(self, attrs):
+        equipment = attrs.get('required_equipment')
+        job = attrs.get('job') or getattr(self.instance, 'job', None)
+        if equipment and job is not None:
+            validate_equipment_availability(equipment, job.scheduled_date, exclude_job=job)
+        return attrs
 
 
 class JobSerializer(serializers.ModelSerializer):
@@ -51,6 +60,15 @@ class JobSerializer(serializers.ModelSerializer):
             'tasks', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_by', 'created_at', 'updated_at', 'can_be_completed']
+    
+    def validate(self, attrs):
+        scheduled_date = attrs.get('scheduled_date')
+        if self.instance is not None and scheduled_date and scheduled_date != self.instance.scheduled_date:
+            # The job's bookings move with it
+            validate_equipment_availability(
+                required_equipment_ids(self.instance), scheduled_date, exclude_job=self.instance
+            )
+        return attrs
 
 
 class JobCreateSerializer(serializers.ModelSerializer):
@@ -65,6 +83,13 @@ class JobCreateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id']
     
+    def validate(self, attrs):
+        technician = attrs.get('assigned_to')
+        scheduled_date = attrs.get('scheduled_date')
+        if technician is not None and scheduled_date is not None:
+            validate_technician_availability(technician, scheduled_date, exclude_job=self.instance)
+        return attrs
+    
     def create(self, validated_data):
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
@@ -87,12 +112,17 @@ class JobListSerializer(serializers.ModelSerializer):
             'completed_task_count', 'created_at'
         ]
     
+    # JobListCreateView annotates both counts; other callers count per job
     @extend_schema_field(int)
     def get_task_count(self, obj) -> int:
+        if hasattr(obj, 'task_count'):
+            return obj.task_count
         return obj.tasks.count()
     
     @extend_schema_field(int)
     def get_completed_task_count(self, obj) -> int:
+        if hasattr(obj, 'completed_task_count'):
+            return obj.completed_task_count
         return obj.tasks.filter(status='completed').count()
 
 
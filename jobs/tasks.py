@@ -1,63 +1,73 @@
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
+from audit.capture import record_updates
+from core.cache import bump_tags
+from core.instrumentation import instrumented_task, current_run
 from .models import Job
+from .reminders import enqueue_due_reminders, dispatch_pending_reminders
+
+
+CHUNK_SIZE = 500
 
 
 @shared_task
+@instrumented_task
 def check_overdue_jobs():
     """
     Check and update overdue jobs
     """
+    run = current_run()
     now = timezone.now()
     overdue_jobs = Job.objects.filter(
         scheduled_date__lt=now,
         status__in=['pending', 'in_progress'],
         overdue=False
     )
-    
-    updated_count = 0
-    for job in overdue_jobs:
-        job.overdue = True
-        job.save()
-        updated_count += 1
-    
-    return f"Updated {updated_count} overdue jobs"
+
+    # Flagged jobs drop out of the filter, so each chunk starts from the top
+    while True:
+        job_ids = list(overdue_jobs.order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not job_ids:
+            break
+        with transaction.atomic():
+            updated = Job.objects.filter(id__in=job_ids).update(overdue=True, updated_at=now)
+            # update() sends no post_save, so neither the audit capture nor the cache sees it
+            record_updates(Job, job_ids, {'overdue': (False, True)})
+        run.chunk_done(rows=updated)
+        bump_tags('jobs')
 
 
 @shared_task
+@instrumented_task
 def cleanup_old_completed_jobs():
     """
     Clean up old completed jobs (optional maintenance task)
     """
+    run = current_run()
     # Keep completed jobs for 1 year
     cutoff_date = timezone.now() - timezone.timedelta(days=365)
     old_jobs = Job.objects.filter(
         status='completed',
         updated_at__lt=cutoff_date
     )
-    
-    deleted_count = old_jobs.count()
-    old_jobs.delete()
-    
-    return f"Deleted {deleted_count} old completed jobs"
+
+    while True:
+        job_ids = list(old_jobs.order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not job_ids:
+            break
+        _, deleted = Job.objects.filter(id__in=job_ids).delete()
+        run.chunk_done(rows=deleted.get(Job._meta.label, 0))
 
 
 @shared_task
+@instrumented_task
 def send_job_reminders():
     """
-    Send reminders for upcoming jobs (placeholder for future implementation)
+    Queue reminders for jobs entering a reminder window and deliver them
     """
-    # This is a placeholder for sending email/SMS reminders
-    # In a real system, you would integrate with email/SMS services
-    upcoming_jobs = Job.objects.filter(
-        scheduled_date__gte=timezone.now(),
-        scheduled_date__lte=timezone.now() + timezone.timedelta(hours=24),
-        status='pending'
-    )
-    
-    reminder_count = 0
-    for job in upcoming_jobs:
-        # Send reminder logic would go here
-        reminder_count += 1
-    
-    return f"Sent {reminder_count} job reminders" 
\ No newline at end of file
+    queued_count = enqueue_due_reminders()
+    reminder_count = dispatch_pending_reminders()
+    current_run().add_rows(reminder_count)
+
+    return {'queued': queued_count, 'sent': reminder_count}
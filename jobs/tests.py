@@ -1,11 +1,24 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+import json
+from django.db.models import QuerySet
+from django.urls import reverse
+from rest_framework.test import APIClient
 from users.models import User
 from equipment.models import Equipment
-from .models import Job, JobTask
-from .validators import validate_scheduled_date_not_past, validate_job_can_be_completed
+from audit.models import AuditLog
+from core.nplusone import NPlusOneError, no_n_plus_one, normalize_sql
+from .models import Job, JobTask, JobReminder
+from .reminders import ConsoleReminderTransport, enqueue_due_reminders, dispatch_pending_reminders
+from .serializers import JobCreateSerializer, JobListSerializer
+from .tasks import check_overdue_jobs
+from .validators import (
+    validate_scheduled_date_not_past, validate_job_can_be_completed, validate_technician_availability
+)
 
 
 class JobModelTest(TestCase):
@@ -484,3 +497,338 @@ class JobTaskOrderValidationTest(TestCase):
         self.assertEqual(JobTask.objects.count(), 2)
         self.assertEqual(task1.order, 1)
         self.assertEqual(task2.order, 1)
+
+
+class JobReminderPipelineTest(TestCase):
+    """Test cases for the reminder outbox and dispatch"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            email='tech@test.com',
+            password='testpass123',
+            role='technician'
+        )
+        
+        self.due_job = Job.objects.create(
+            title='Due Job',
+            description='Test description',
+            client_name='Test Client',
+            created_by=self.admin_user,
+            assigned_to=self.technician_user,
+            scheduled_date=timezone.now() + timedelta(hours=3)
+        )
+        
+        self.later_job = Job.objects.create(
+            title='Later Job',
+            description='Test description',
+            client_name='Test Client',
+            created_by=self.admin_user,
+            scheduled_date=timezone.now() + timedelta(days=3)
+        )
+    
+    def test_enqueue_only_due_jobs(self):
+        """Test that only jobs inside the window are queued"""
+        self.assertEqual(enqueue_due_reminders(), 1)
+        self.assertEqual(list(JobReminder.objects.values_list('job_id', flat=True)), [self.due_job.id])
+    
+    def test_count_skips_reminders_queued_concurrently(self):
+        """Test that reminders another run queued after the due jobs were selected are not counted"""
+        JobReminder.objects.create(job=self.due_job, window='24h', scheduled_date=self.due_job.scheduled_date)
+        
+        # Select the job as if the other run had not committed yet
+        with mock.patch.object(QuerySet, 'exclude', lambda queryset, *args, **kwargs: queryset):
+            self.assertEqual(enqueue_due_reminders(), 0)
+        self.assertEqual(JobReminder.objects.count(), 1)
+    
+    def test_rerun_does_not_double_send(self):
+        """Test that repeated runs never deliver the same reminder twice"""
+        stream = StringIO()
+        transport = ConsoleReminderTransport(stream=stream)
+        
+        enqueue_due_reminders()
+        self.assertEqual(dispatch_pending_reminders(transport=transport), 1)
+        
+        enqueue_due_reminders()
+        self.assertEqual(dispatch_pending_reminders(transport=transport), 0)
+        
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        message = json.loads(lines[0])
+        self.assertEqual(message['job_id'], self.due_job.id)
+        self.assertEqual(message['recipient'], 'tech@test.com')
+        self.assertEqual(JobReminder.objects.get().status, 'sent')
+    
+    def test_cancelled_job_is_skipped(self):
+        """Test that reminders for jobs no longer pending are skipped"""
+        enqueue_due_reminders()
+        Job.objects.filter(id=self.due_job.id).update(status='cancelled')
+        
+        self.assertEqual(dispatch_pending_reminders(transport=ConsoleReminderTransport(stream=StringIO())), 0)
+        self.assertEqual(JobReminder.objects.get().status, 'skipped')
+
+
+class CheckOverdueJobsTaskTest(TestCase):
+    """Test cases for the overdue job task"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='testpass123',
+            role='admin'
+        )
+        
+        self.job = Job.objects.create(
+            title='Test Job',
+            description='Test description',
+            client_name='Test Client',
+            created_by=self.admin_user,
+            scheduled_date=timezone.now() + timedelta(days=1)
+        )
+    
+    def test_flags_overdue_jobs(self):
+        """Test that overdue jobs are flagged and counted"""
+        Job.objects.filter(id=self.job.id).update(scheduled_date=timezone.now() - timedelta(hours=1))
+        
+        result = check_overdue_jobs()
+        
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['rows'], 1)
+        self.assertEqual(result['chunks'], 1)
+        self.job.refresh_from_db()
+        self.assertTrue(self.job.overdue)
+    
+    def test_flags_are_audited(self):
+        """Test that the bulk overdue update still records audit rows"""
+        Job.objects.filter(id=self.job.id).update(scheduled_date=timezone.now() - timedelta(hours=1))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            check_overdue_jobs()
+        
+        entry = AuditLog.objects.get(model_name='Job', object_id=self.job.id, action='update')
+        self.assertEqual(entry.get_changes(), {'overdue': ('False', 'True')})
+
+
+class TechnicianAvailabilityTest(TestCase):
+    """Test cases for technician availability checks and calendar"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.technicians = [
+            User.objects.create_user(username=f'tech{i}', password='testpass123', role='technician')
+            for i in range(2)
+        ]
+        self.day = timezone.localdate() + timedelta(days=3)
+        self.job = Job.objects.create(
+            title='Test Job',
+            description='Test description',
+            client_name='Test Client',
+            created_by=self.admin_user,
+            assigned_to=self.technicians[0],
+            scheduled_date=timezone.make_aware(datetime.combine(self.day, datetime.min.time())) + timedelta(hours=23)
+        )
+    
+    def test_validator_uses_day_ranges(self):
+        """Test that only open jobs on the same day conflict"""
+        same_day = timezone.make_aware(datetime.combine(self.day, datetime.min.time()))
+        with self.assertRaises(ValidationError):
+            validate_technician_availability(self.technicians[0], same_day)
+        
+        validate_technician_availability(self.technicians[0], same_day + timedelta(days=1))
+        validate_technician_availability(self.technicians[0], same_day, exclude_job=self.job)
+        validate_technician_availability(self.technicians[1], same_day)
+    
+    def test_create_serializer_rejects_double_booking(self):
+        """Test that job creation checks the assignee's availability"""
+        serializer = JobCreateSerializer(data={
+            'title': 'Second Job',
+            'description': 'Test description',
+            'client_name': 'Test Client',
+            'assigned_to': self.technicians[0].id,
+            'scheduled_date': self.job.scheduled_date - timedelta(hours=2),
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('conflicting jobs', str(serializer.errors))
+    
+    def test_bulk_calendar_in_one_job_query(self):
+        """Test that the calendar for many technicians reads jobs once"""
+        client = APIClient()
+        client.force_authenticate(self.admin_user)
+        url = reverse('jobs:technician-availability')
+        
+        with self.assertNumQueries(2):
+            response = client.get(url, {'start': self.day.isoformat(), 'days': 2})
+        
+        self.assertEqual(response.status_code, 200)
+        calendars = {row['username']: row for row in response.data['technicians']}
+        self.assertEqual(calendars['tech0']['busy_days'], [{'date': self.day, 'jobs': [self.job.id]}])
+        self.assertEqual(calendars['tech0']['free_days'], [self.day + timedelta(days=1)])
+        self.assertEqual(len(calendars['tech1']['free_days']), 2)
+        
+        response = client.get(url, {'days': 0})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_impossible_start_date_is_rejected(self):
+        """Test that a well-formed but impossible start date returns 400"""
+        client = APIClient()
+        client.force_authenticate(self.admin_user)
+        
+        response = client.get(reverse('jobs:technician-availability'), {'start': '2025-02-30'})
+        
+        self.assertEqual(response.status_code, 400)
+
+
+class RoleScopedAccessTest(TestCase):
+    """Test cases for role-scoped job and task querysets"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        other_technician = User.objects.create_user(
+            username='other',
+            password='testpass123',
+            role='technician'
+        )
+        scheduled_date = timezone.now() + timedelta(days=2)
+        self.own_job, self.other_job = [
+            Job.objects.create(
+                title=f'Job {i}',
+                description='Test description',
+                client_name='Test Client',
+                created_by=self.admin_user,
+                assigned_to=technician,
+                scheduled_date=scheduled_date + timedelta(days=i)
+            )
+            for i, technician in enumerate([self.technician_user, other_technician])
+        ]
+        self.own_task = JobTask.objects.create(job=self.own_job, title='Own Task', order=1)
+        self.other_task = JobTask.objects.create(job=self.other_job, title='Other Task', order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.technician_user)
+    
+    def test_technician_sees_only_assigned_jobs_and_tasks(self):
+        """Test that jobs and tasks of other technicians are not found"""
+        self.assertEqual(self.client.get(reverse('jobs:job-detail', args=[self.own_job.id])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('jobs:job-detail', args=[self.other_job.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('jobs:job-task-detail', args=[self.own_task.id])).status_code, 200)
+        self.assertEqual(self.client.get(reverse('jobs:job-task-detail', args=[self.other_task.id])).status_code, 404)
+    
+        response = self.client.get(reverse('jobs:job-task-list-create', args=[self.other_job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+    
+        response = self.client.post(
+            reverse('jobs:job-task-list-create', args=[self.other_job.id]),
+            {'job': self.other_job.id, 'title': 'Sneaky Task', 'order': 2}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(JobTask.objects.filter(title='Sneaky Task').exists())
+    
+    def test_update_task_status_is_scoped(self):
+        """Test that only tasks of assigned jobs can change status"""
+        url = reverse('jobs:update-task-status', args=[self.other_task.id])
+        self.assertEqual(self.client.post(url, {'status': 'in_progress'}, format='json').status_code, 404)
+    
+        url = reverse('jobs:update-task-status', args=[self.own_task.id])
+        response = self.client.post(url, {'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.own_task.refresh_from_db()
+        self.assertEqual(self.own_task.status, 'in_progress')
+    
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_detail_access_is_checked_in_one_query(self):
+        """Test that retrieving a task needs no extra permission queries"""
+        url = reverse('jobs:job-task-detail', args=[self.own_task.id])
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            # The scoped task lookup and its required equipment
+            self.client.get(url)
+    
+        self.client.force_authenticate(self.admin_user)
+        self.assertEqual(self.client.get(reverse('jobs:job-detail', args=[self.other_job.id])).status_code, 200)
+
+
+class NPlusOneQueryTest(TestCase):
+    """Test cases for N+1 query detection on job endpoints"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.technician_user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        drill = Equipment.objects.create(name='Drill', serial_number='DRILL-1')
+        scheduled_date = timezone.now() + timedelta(days=2)
+        self.jobs = []
+        for i in range(8):
+            job = Job.objects.create(
+                title=f'Job {i}',
+                description='Test description',
+                client_name='Test Client',
+                created_by=self.admin_user,
+                assigned_to=self.technician_user,
+                scheduled_date=scheduled_date + timedelta(days=i)
+            )
+            for order in (1, 2):
+                task = JobTask.objects.create(job=job, title=f'Task {order}', order=order)
+            task.required_equipment.add(drill)
+            self.jobs.append(job)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin_user)
+    
+    def test_detector_reports_call_site(self):
+        """Test that repeated query shapes are reported with the code that ran them"""
+        with self.assertRaises(NPlusOneError) as raised:
+            with no_n_plus_one():
+                JobListSerializer(Job.objects.select_related('created_by', 'assigned_to'), many=True).data
+        sites = [site for pattern in raised.exception.patterns for site in pattern.call_sites]
+        self.assertTrue(any(site.startswith('JobListSerializer.get_task_count') for site in sites), sites)
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "jobs" WHERE "id" IN (%s, %s, %s) LIMIT 21'),
+            'SELECT * FROM "jobs" WHERE "id" IN (...) LIMIT ?'
+        )
+    
+    def test_job_endpoints_have_no_n_plus_one(self):
+        """Test that listing and detail endpoints run a fixed number of query shapes"""
+        urls = [
+            reverse('jobs:job-list-create'),
+            reverse('jobs:job-detail', args=[self.jobs[0].id]),
+            reverse('jobs:job-task-list-create', args=[self.jobs[0].id]),
+        ]
+        for url in urls:
+            with no_n_plus_one(threshold=1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+    
+        response = self.client.get(urls[0])
+        self.assertEqual({row['task_count'] for row in response.data['results']}, {2})
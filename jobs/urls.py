@@ -13,6 +13,9 @@ urlpatterns = [
     path('tasks/<int:pk>/', views.JobTaskDetailView.as_view(), name='job-task-detail'),
     path('tasks/<int:task_id>/update-status/', views.update_task_status_view, name='update-task-status'),
     
+    # Scheduling
+    path('technicians/availability/', views.technician_availability_view, name='technician-availability'),
+    
     # Dashboard and Analytics
     path('technician-dashboard/', views.technician_dashboard_view, name='technician-dashboard'),
     path('admin-analytics/', views.admin_analytics_view, name='admin-analytics'),
@@ -31,24 +31,32 @@ def validate_task_order_unique(job, order, task_id=None):
         raise ValidationError(f'Task with order {order} already exists in this job.')
 
 
-def validate_equipment_availability(equipment_list, scheduled_date):
+def validate_equipment_availability(equipment_list, scheduled_date, exclude_job=None):
     """
     Validate that equipment is available for the scheduled date
     """
-    # This is a placeholder for equipment availability logic
-    # In a real system, you would check equipment scheduling conflicts
-    pass
+    from equipment.availability import booking_window, conflict_message, find_conflicts
+    
+    start, end = booking_window(scheduled_date)
+    conflicts = find_conflicts(
+        [getattr(equipment, 'pk', equipment) for equipment in equipment_list],
+        start, end, exclude_job=exclude_job
+    )
+    
+    if conflicts:
+        raise ValidationError(conflict_message(conflicts))
 
 
-def validate_technician_availability(technician, scheduled_date):
+def validate_technician_availability(technician, scheduled_date, exclude_job=None):
     """
     Validate that technician is available for the scheduled date
     """
-    # Check if technician has other jobs on the same date
-    conflicting_jobs = technician.assigned_jobs.filter(
-        scheduled_date__date=scheduled_date.date(),
-        status__in=['pending', 'in_progress']
-    )
+    from .availability import busy_jobs, day_bounds
+    
+    # Check if technician has other jobs on the same day
+    day = timezone.localtime(scheduled_date).date()
+    start, end = day_bounds(day)
+    conflicting_jobs = busy_jobs([technician.pk], start, end, exclude_job=exclude_job)
     
     if conflicting_jobs.exists():
-        raise ValidationError(f'Technician has conflicting jobs on {scheduled_date.date()}.') 
\ No newline at end of file
+        raise ValidationError(f'Technician has conflicting jobs on {day}.')
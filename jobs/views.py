@@ -1,33 +1,81 @@
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Avg, Count
+from django.shortcuts import get_object_or_404
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from drf_spectacular.utils import extend_schema, OpenApiResponse
+from django.utils.dateparse import parse_date
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
+from .availability import MAX_WINDOW_DAYS, technician_calendar
 from .models import Job, JobTask
 from .serializers import (
     JobSerializer, JobCreateSerializer, JobListSerializer,
     JobTaskSerializer, JobTaskCreateSerializer, TechnicianDashboardSerializer
 )
-from users.permissions import (
-    IsAdminOrSalesAgent, IsAssignedTechnician, IsJobCreator, IsTechnicianUser
-)
+from core.cache import CachedResponseMixin, cache_response
+from equipment.availability import BookingConflict
+from users.models import User
+from users.permissions import IsAdminOrSalesAgent, IsTechnicianUser
+from users.scopes import scope_jobs, scope_tasks, task_filter
+
+
+class EquipmentConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Equipment is booked by another job.'
+    default_code = 'equipment_conflict'
+
+
+@contextmanager
+def booking_transaction():
+    """
+    Write jobs or tasks in a transaction that is rolled back, with a 409, if
+    the equipment bookings made by the signal handlers conflict
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except BookingConflict as exc:
+        raise EquipmentConflict(' '.join(exc.messages))
 
 
-class JobListCreateView(generics.ListCreateAPIView):
+class BookingTransactionMixin:
+    """
+    Run the writes of a generic view in ``booking_transaction``
+    """
+    def perform_update(self, serializer):
+        with booking_transaction():
+            super().perform_update(serializer)
+    
+    def perform_destroy(self, instance):
+        with booking_transaction():
+            super().perform_destroy(instance)
+
+
+class JobListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
     """
     List all jobs or create a new job (Admin/Sales Agent only)
     """
-    queryset = Job.objects.all()
+    queryset = Job.objects.select_related('created_by', 'assigned_to').annotate(
+        task_count=Count('tasks'),
+        completed_task_count=Count('tasks', filter=Q(tasks__status='completed')),
+    )
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'priority', 'overdue', 'assigned_to']
     search_fields = ['title', 'client_name', 'description']
     ordering_fields = ['created_at', 'scheduled_date', 'priority']
     ordering = ['-created_at']
     permission_classes = [IsAdminOrSalesAgent]
+    cache_tags = ('jobs', 'tasks', 'users')
+    
+    def get_queryset(self):
+        return scope_jobs(super().get_queryset(), self.request.user)
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -35,43 +83,67 @@ class JobListCreateView(generics.ListCreateAPIView):
         return JobCreateSerializer
 
 
-class JobDetailView(generics.RetrieveUpdateDestroyAPIView):
+class JobDetailView(BookingTransactionMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a job
+    
+    Access is limited by ``users.scopes.scope_jobs``.
     """
-    queryset = Job.objects.all()
+    queryset = Job.objects.select_related('created_by', 'assigned_to').prefetch_related('tasks__required_equipment')
     serializer_class = JobSerializer
-    permission_classes = [IsAdminOrSalesAgent | IsAssignedTechnician | IsJobCreator]
+    permission_classes = [IsAuthenticated]
+    cache_tags = ('jobs', 'tasks', 'equipment', 'users')
+    
+    def get_queryset(self):
+        return scope_jobs(super().get_queryset(), self.request.user)
 
 
-class JobTaskListCreateView(generics.ListCreateAPIView):
+class JobTaskListCreateView(CachedResponseMixin, generics.ListCreateAPIView):
     """
     List all tasks for a job or create a new task
+    
+    Access is limited by ``users.scopes.scope_tasks``.
     """
     serializer_class = JobTaskSerializer
-    permission_classes = [IsAdminOrSalesAgent | IsAssignedTechnician]
+    permission_classes = [IsAuthenticated]
+    cache_tags = ('jobs', 'tasks', 'equipment')
     
     def get_queryset(self):
         job_id = self.kwargs.get('job_id')
-        return JobTask.objects.filter(job_id=job_id)
+        return scope_tasks(
+            JobTask.objects.filter(job_id=job_id).select_related('job').prefetch_related('required_equipment'),
+            self.request.user
+        )
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return JobTaskSerializer
         return JobTaskCreateSerializer
     
+    def create(self, request, *args, **kwargs):
+        # Check access to the job before validating anything against it
+        get_object_or_404(Job.objects.filter(task_filter(request.user, job_prefix='')), pk=self.kwargs.get('job_id'))
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         job_id = self.kwargs.get('job_id')
-        serializer.save(job_id=job_id)
+        with booking_transaction():
+            serializer.save(job_id=job_id)
 
 
-class JobTaskDetailView(generics.RetrieveUpdateDestroyAPIView):
+class JobTaskDetailView(BookingTransactionMixin, CachedResponseMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a job task
+    
+    Access is limited by ``users.scopes.scope_tasks``.
     """
-    queryset = JobTask.objects.all()
+    queryset = JobTask.objects.select_related('job').prefetch_related('required_equipment')
     serializer_class = JobTaskSerializer
-    permission_classes = [IsAdminOrSalesAgent | IsAssignedTechnician]
+    permission_classes = [IsAuthenticated]
+    cache_tags = ('jobs', 'tasks', 'equipment')
+    
+    def get_queryset(self):
+        return scope_tasks(super().get_queryset(), self.request.user)
 
 
 @extend_schema(
@@ -79,6 +151,7 @@ class JobTaskDetailView(generics.RetrieveUpdateDestroyAPIView):
 )
 @api_view(['GET'])
 @permission_classes([IsTechnicianUser])
+@cache_response(tags=('jobs', 'tasks', 'equipment', 'users'))
 def technician_dashboard_view(request):
     """
     Get all upcoming and in-progress tasks for the technician
@@ -122,6 +195,7 @@ def technician_dashboard_view(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response(tags=('jobs', 'tasks', 'equipment'))
 def admin_analytics_view(request):
     """
     Admin analytics endpoint
@@ -190,17 +264,18 @@ def admin_analytics_view(request):
     responses={
         200: JobTaskSerializer,
         400: OpenApiResponse(description="Invalid status"),
-        404: OpenApiResponse(description="Task not found")
+        404: OpenApiResponse(description="Task not found"),
+        409: OpenApiResponse(description="Reopened task's equipment is booked by another job")
     }
 )
 @api_view(['POST'])
-@permission_classes([IsAssignedTechnician])
+@permission_classes([IsAuthenticated])
 def update_task_status_view(request, task_id):
     """
-    Update task status (Technician only)
+    Update task status (assigned Technician, Admin/Sales Agent)
     """
     try:
-        task = JobTask.objects.get(id=task_id)
+        task = scope_tasks(JobTask.objects.select_related('job'), request.user).get(id=task_id)
     except JobTask.DoesNotExist:
         return Response(
             {'error': 'Task not found'}, 
@@ -214,15 +289,58 @@ def update_task_status_view(request, task_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    task.status = new_status
-    task.save()
-    
-    # Check if job can be completed
-    if new_status == 'completed':
-        job = task.job
-        if job.can_be_completed:
-            job.status = 'completed'
-            job.save()
+    with booking_transaction():
+        task.status = new_status
+        task.save()
+        
+        # Check if job can be completed
+        if new_status == 'completed':
+            job = task.job
+            if job.can_be_completed:
+                job.status = 'completed'
+                job.save()
     
     serializer = JobTaskSerializer(task)
     return Response(serializer.data)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter('start', OpenApiTypes.DATE, description='First day of the window (default: today)'),
+        OpenApiParameter('days', OpenApiTypes.INT, description=f'Length of the window in days (default: 7, max: {MAX_WINDOW_DAYS})'),
+        OpenApiParameter('technician', OpenApiTypes.INT, many=True, description='Technician ids (default: all active technicians)'),
+    ],
+    responses={
+        200: OpenApiResponse(description="Free and busy days per technician"),
+        400: OpenApiResponse(description="Invalid window")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAdminOrSalesAgent])
+def technician_availability_view(request):
+    """
+    Get free and busy days for many technicians over a window (Admin/Sales Agent only)
+    """
+    start_param = request.query_params.get('start')
+    try:
+        # parse_date raises ValueError for well-formed but impossible dates
+        first_day = parse_date(start_param) if start_param else timezone.localdate()
+        days = int(request.query_params.get('days', 7))
+        technician_ids = [int(value) for value in request.query_params.getlist('technician')]
+    except ValueError:
+        first_day = None
+    if first_day is None or not 1 <= days <= MAX_WINDOW_DAYS:
+        return Response(
+            {'error': f'start must be a YYYY-MM-DD date, days between 1 and {MAX_WINDOW_DAYS} and technician ids integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    technicians = User.objects.filter(role='technician', is_active=True).only('id', 'username').order_by('username')
+    if technician_ids:
+        technicians = technicians.filter(id__in=technician_ids)
+    
+    return Response({
+        'start': first_day,
+        'days': days,
+        'technicians': technician_calendar(list(technicians), first_day, days)
+    })
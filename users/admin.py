@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
@@ -6,8 +7,12 @@ from django.urls import path, reverse
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.db import transaction
 from django import forms
 from .models import User
+from .passwords import get_progress, new_job, set_passwords
+from .tasks import bulk_set_passwords
 
 
 class CustomUserCreationForm(UserCreationForm):
@@ -72,6 +77,11 @@ class UserAdmin(BaseUserAdmin):
                 self.admin_site.admin_view(self.change_password_view),
                 name='users_user_change_password',
             ),
+            path(
+                'bulk-password/<str:job_id>/',
+                self.admin_site.admin_view(self.bulk_password_progress_view),
+                name='users_user_bulk_password_progress',
+            ),
         ]
         return custom_urls + urls
     
@@ -103,14 +113,30 @@ class UserAdmin(BaseUserAdmin):
         
         # Render password change form
         context = {
+            **self.admin_site.each_context(request),
             'title': f'Change Password for {user.username}',
             'user': user,
             'opts': self.model._meta,
             'has_change_permission': True,
         }
-        return self.admin_site.admin_view(self.admin_site.admin_view)(
-            request, 'admin/users/user/change_password.html', context
-        )
+        return TemplateResponse(request, 'admin/users/user/change_password.html', context)
+    
+    def bulk_password_progress_view(self, request, job_id):
+        """Progress of a bulk password change running in Celery"""
+        progress = get_progress(job_id)
+        if progress is None:
+            messages.error(request, 'Bulk password change not found or expired.')
+            return HttpResponseRedirect(reverse('admin:users_user_changelist'))
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Bulk Password Change Progress',
+            'opts': self.model._meta,
+            'progress': progress,
+            'percent': int(100 * progress['done'] / progress['total']) if progress['total'] else 100,
+            'finished': progress['status'] in ('done', 'failed'),
+        }
+        return TemplateResponse(request, 'admin/users/user/bulk_password_progress.html', context)
     
     def change_password_link(self, obj):
         """Display a link to change password"""
@@ -126,12 +152,21 @@ class UserAdmin(BaseUserAdmin):
             form = BulkPasswordChangeForm(request.POST)
             if form.is_valid():
                 new_password = form.cleaned_data['new_password']
-                count = 0
-                for user in queryset:
-                    user.set_password(new_password)
-                    user.save()
-                    count += 1
+                user_ids = list(queryset.values_list('id', flat=True))
+                
+                # Large selections would time out the request, so hash them in Celery
+                if len(user_ids) > getattr(settings, 'BULK_PASSWORD_ASYNC_THRESHOLD', 100):
+                    # Only the job id is sent: the password stays out of the broker
+                    job_id = new_job(new_password, len(user_ids))
+                    transaction.on_commit(lambda: bulk_set_passwords.delay(job_id, user_ids))
+                    self.message_user(
+                        request,
+                        f'Changing passwords for {len(user_ids)} users in the background.',
+                        messages.INFO
+                    )
+                    return HttpResponseRedirect(reverse('admin:users_user_bulk_password_progress', args=[job_id]))
                 
+                count = set_passwords(user_ids, new_password)
                 self.message_user(
                     request,
                     f'Successfully changed passwords for {count} users.',
@@ -142,15 +177,14 @@ class UserAdmin(BaseUserAdmin):
             form = BulkPasswordChangeForm()
         
         context = {
+            **self.admin_site.each_context(request),
             'title': 'Change Password for Selected Users',
             'form': form,
             'queryset': queryset,
             'opts': self.model._meta,
             'action': 'bulk_change_password',
         }
-        return self.admin_site.admin_view(self.admin_site.admin_view)(
-            request, 'admin/users/user/bulk_change_password.html', context
-        )
+        return TemplateResponse(request, 'admin/users/user/bulk_change_password.html', context)
     bulk_change_password.short_description = "Change password for selected users"
     
     def get_list_display(self, request):
@@ -0,0 +1,105 @@
+"""
+JWT authentication with cached user resolution.
+
+``JWTAuthentication`` loads ``request.user`` with a query on every request.
+``CachedJWTAuthentication`` keeps the user's fields in the cache selected by
+``AUTH_USER_CACHE`` for ``AUTH_USER_CACHE_TIMEOUT`` seconds, keyed by user
+id, and rebuilds the user from them. The password hash is never cached: the
+rebuilt user has it deferred, so it is loaded on first access and ``save()``
+only writes the fields that were loaded.
+
+Entries are dropped whenever a user is saved or deleted (``users.signals``);
+code that changes users with ``QuerySet.update`` or ``bulk_update`` must call
+``invalidate_users`` itself. Only a cache shared by all processes drops them
+everywhere; with a per-process cache other workers keep a changed user for
+up to the timeout, which therefore defaults to 5 seconds without
+``CACHE_REDIS_URL``.
+
+Tokens revoked through ``users.revocation`` (e.g. by logging out) are
+rejected before the user is resolved.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .revocation import is_revoked
+
+
+UNCACHED_FIELDS = {'password'}
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE', 'default')]
+
+
+def cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_users(user_ids):
+    """Drop cached users now and again on commit, so a concurrent request cannot re-cache stale rows"""
+    keys = [cache_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from a short-lived cache
+    """
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti is not None and is_revoked(jti):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cache = get_cache()
+        key = cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entry = self.to_entry(user)
+            cache.set(key, entry, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 5))
+        else:
+            user = self.from_entry(entry)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['password_md5']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+    def to_entry(self, user):
+        fields = {
+            field.attname: getattr(user, field.attname)
+            for field in self.user_model._meta.concrete_fields
+            if field.attname not in UNCACHED_FIELDS
+        }
+        return {'fields': fields, 'password_md5': get_md5_hash_password(user.password)}
+
+    def from_entry(self, entry):
+        fields = entry['fields']
+        # from_db leaves the missing fields deferred, exactly like .defer()
+        return self.user_model.from_db(self.user_model.objects.db, list(fields), list(fields.values()))
@@ -0,0 +1,25 @@
+import django_filters
+from .models import User
+
+
+WORKLOAD_FILTERS = (
+    'max_open_jobs', 'max_in_progress_jobs', 'max_overdue_jobs', 'max_tasks_due',
+    'min_open_jobs', 'min_tasks_due',
+)
+
+
+class UserFilter(django_filters.FilterSet):
+    """
+    Filters for the user list; the workload bounds are inclusive and apply to
+    the counts added by ``users.workload.with_workload``
+    """
+    max_open_jobs = django_filters.NumberFilter(field_name='open_jobs', lookup_expr='lte')
+    max_in_progress_jobs = django_filters.NumberFilter(field_name='in_progress_jobs', lookup_expr='lte')
+    max_overdue_jobs = django_filters.NumberFilter(field_name='overdue_jobs', lookup_expr='lte')
+    max_tasks_due = django_filters.NumberFilter(field_name='tasks_due', lookup_expr='lte')
+    min_open_jobs = django_filters.NumberFilter(field_name='open_jobs', lookup_expr='gte')
+    min_tasks_due = django_filters.NumberFilter(field_name='tasks_due', lookup_expr='gte')
+    
+    class Meta:
+        model = User
+        fields = ['role', 'is_active']
@@ -1,3 +1,5 @@
+import uuid
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
@@ -37,3 +39,33 @@ class User(AbstractUser):
     @property
     def is_sales_agent(self):
         return self.role == 'sales_agent'
+
+
+class BulkPasswordJob(models.Model):
+    """
+    A bulk password change handed to Celery and its progress
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    # The hash to set, never the password itself; cleared once the job ends
+    password_hash = models.CharField(max_length=128, blank=True)
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'bulk_password_jobs'
+        verbose_name = 'Bulk Password Job'
+        verbose_name_plural = 'Bulk Password Jobs'
+    
+    def __str__(self):
+        return f"Bulk password change {self.id} ({self.status})"
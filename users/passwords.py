@@ -0,0 +1,115 @@
+"""
+Bulk password changes.
+
+Every user gets a fresh salt, so each hash costs a full run of the password
+hasher (PBKDF2 by default: tens of milliseconds of CPU). Hashes are computed
+in chunks over a pool of ``PASSWORD_HASH_WORKERS`` processes and written with
+a single ``bulk_update`` of the ``password`` column.
+
+Selections larger than ``BULK_PASSWORD_ASYNC_THRESHOLD`` are handed to the
+``users.tasks.bulk_set_passwords`` Celery task instead of blocking the admin
+request. The password is hashed once in the request and only that hash is
+stored, on a ``BulkPasswordJob`` row; the task gets the job id, so the
+password never reaches the broker or the task's arguments and results. The
+selected users then share one salt. The job row also holds the progress
+shown on the admin progress page, so it is visible from every process.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .authentication import invalidate_users
+from .models import BulkPasswordJob
+
+
+CHUNK_SIZE = 50
+UPDATE_CHUNK_SIZE = 500
+
+
+def get_workers():
+    return getattr(settings, 'PASSWORD_HASH_WORKERS', None) or os.cpu_count() or 1
+
+
+def hash_passwords(password, count, workers=None, progress=None):
+    """
+    Return ``count`` salted hashes of ``password``, calling
+    ``progress(done, total)`` after each chunk
+    """
+    workers = min(workers or get_workers(), count)
+    hashes = []
+    # Celery's prefork workers are daemonic and cannot start child processes
+    if workers < 2 or multiprocessing.current_process().daemon:
+        for start in range(0, count, CHUNK_SIZE):
+            hashes.extend(make_password(password) for _ in range(min(CHUNK_SIZE, count - start)))
+            if progress:
+                progress(len(hashes), count)
+        return hashes
+
+    # Spawned rather than forked: forking a threaded server can deadlock
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for start in range(0, count, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, count - start)
+            hashes.extend(pool.map(make_password, repeat(password, size), chunksize=max(1, size // workers)))
+            if progress:
+                progress(len(hashes), count)
+    return hashes
+
+
+def set_passwords(user_ids, password, workers=None, progress=None):
+    """Set ``password`` for the given users; return the number of users updated"""
+    User = get_user_model()
+    user_ids = list(user_ids)
+    hashes = hash_passwords(password, len(user_ids), workers=workers, progress=progress)
+    now = timezone.now()
+    users = [User(pk=pk, password=hashed, updated_at=now) for pk, hashed in zip(user_ids, hashes)]
+    with transaction.atomic():
+        User.objects.bulk_update(users, ['password', 'updated_at'], batch_size=500)
+        # bulk_update sends no post_save, so drop cached users here
+        invalidate_users(user_ids)
+    return len(users)
+
+
+def set_password_hash(user_ids, password_hash, progress=None):
+    """
+    Set an already hashed password for the given users, calling
+    ``progress(done, total)`` after each chunk; return the number of users updated
+    """
+    User = get_user_model()
+    user_ids = list(user_ids)
+    updated = 0
+    for start in range(0, len(user_ids), UPDATE_CHUNK_SIZE):
+        chunk = user_ids[start:start + UPDATE_CHUNK_SIZE]
+        with transaction.atomic():
+            updated += User.objects.filter(pk__in=chunk).update(password=password_hash, updated_at=timezone.now())
+            # update sends no post_save, so drop cached users here
+            invalidate_users(chunk)
+        if progress:
+            progress(min(start + len(chunk), len(user_ids)), len(user_ids))
+    return updated
+
+
+def new_job(password, total):
+    """Register a bulk password job for ``password`` and return its id"""
+    job = BulkPasswordJob.objects.create(password_hash=make_password(password), total=total)
+    return str(job.id)
+
+
+def set_progress(job_id, **values):
+    BulkPasswordJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **values)
+
+
+def get_progress(job_id):
+    try:
+        return BulkPasswordJob.objects.filter(pk=job_id).values('status', 'done', 'total', 'error').first()
+    except ValidationError:
+        # Not a UUID
+        return None
@@ -40,11 +40,12 @@ class IsAssignedTechnician(permissions.BasePermission):
     Custom permission to only allow the assigned technician to modify job/task.
     """
     def has_object_permission(self, request, view, obj):
-        # Check if user is the assigned technician
-        if hasattr(obj, 'assigned_to'):
-            return obj.assigned_to == request.user
-        elif hasattr(obj, 'job') and hasattr(obj.job, 'assigned_to'):
-            return obj.job.assigned_to == request.user
+        # Compare ids so the assigned user is never loaded; users.scopes
+        # holds the queryset equivalent used by the views
+        if hasattr(obj, 'assigned_to_id'):
+            return obj.assigned_to_id == request.user.pk
+        elif hasattr(obj, 'job') and hasattr(obj.job, 'assigned_to_id'):
+            return obj.job.assigned_to_id == request.user.pk
         return False
 
 
@@ -53,4 +54,4 @@ class IsJobCreator(permissions.BasePermission):
     Custom permission to only allow the job creator to modify job.
     """
     def has_object_permission(self, request, view, obj):
-        return obj.created_by == request.user 
\ No newline at end of file
+        return obj.created_by_id == request.user.pk 
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+JWT revocation list.
+
+Revoked tokens are recorded by ``jti`` in the store configured in
+``JWT_REVOCATION_STORE`` (Redis, or a per-process stand-in for tests), each
+entry expiring with the token itself. Every worker process keeps a Bloom
+filter of the store's live entries, so checking a token that was never
+revoked - nearly every request - costs a few hashes and no I/O.
+Only filter hits are confirmed against the store.
+
+The filter cannot forget entries, so it is rebuilt from the store whenever
+the store's generation changes; workers poll the generation at most every
+``JWT_REVOCATION_SYNC_INTERVAL`` seconds. Tokens revoked by the current
+process are added to its filter immediately; other processes see them after
+their next sync.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.settings import api_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter of strings, sized for ``capacity`` entries at ``error_rate``
+    """
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing: k positions out of one 128-bit digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BaseRevocationStore:
+    """
+    Base class for revocation stores.
+
+    ``add`` records a ``jti`` until the Unix time ``expires_at``; ``contains``
+    and ``active`` must ignore expired entries. ``generation`` returns a value
+    that changes whenever an entry is added.
+    """
+    def add(self, jti, expires_at):
+        raise NotImplementedError('Revocation stores must implement add()')
+
+    def contains(self, jti):
+        raise NotImplementedError('Revocation stores must implement contains()')
+
+    def active(self):
+        raise NotImplementedError('Revocation stores must implement active()')
+
+    def generation(self):
+        raise NotImplementedError('Revocation stores must implement generation()')
+
+
+class LocalRevocationStore(BaseRevocationStore):
+    """
+    In-process store for tests; revocations are not shared between worker processes
+    """
+    PRUNE_INTERVAL = 60
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.pruned_at = time.time()
+        self._generation = 0
+
+    def add(self, jti, expires_at):
+        now = time.time()
+        with self.lock:
+            self.entries[jti] = expires_at
+            self._generation += 1
+            if now - self.pruned_at > self.PRUNE_INTERVAL:
+                self.entries = {key: exp for key, exp in self.entries.items() if exp > now}
+                self.pruned_at = now
+
+    def contains(self, jti):
+        return self.entries.get(jti, 0) > time.time()
+
+    def active(self):
+        now = time.time()
+        return [jti for jti, exp in list(self.entries.items()) if exp > now]
+
+    def generation(self):
+        return self._generation
+
+
+class RedisRevocationStore(BaseRevocationStore):
+    """
+    Redis sorted set of revoked ``jti`` scored by expiry, shared by all workers
+    """
+    def __init__(self, url='redis://localhost:6379/0', key='jwt:revoked'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+        self.generation_key = f'{key}:generation'
+
+    def add(self, jti, expires_at):
+        pipe = self.client.pipeline()
+        pipe.zadd(self.key, {jti: expires_at})
+        pipe.zremrangebyscore(self.key, '-inf', time.time())
+        pipe.incr(self.generation_key)
+        pipe.execute()
+
+    def contains(self, jti):
+        expires_at = self.client.zscore(self.key, jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def active(self):
+        return [jti.decode() for jti in self.client.zrangebyscore(self.key, time.time(), '+inf')]
+
+    def generation(self):
+        return self.client.get(self.generation_key)
+
+
+def get_store():
+    """Instantiate the store configured in ``JWT_REVOCATION_STORE``"""
+    path = getattr(settings, 'JWT_REVOCATION_STORE', 'users.revocation.RedisRevocationStore')
+    options = getattr(settings, 'JWT_REVOCATION_STORE_OPTIONS', {})
+    return import_string(path)(**options)
+
+
+class RevocationList:
+    """
+    Bloom filter of revoked ``jti`` in front of a revocation store
+    """
+    def __init__(self, store, capacity=100000, error_rate=0.001, sync_interval=5):
+        self.store = store
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.generation = object()
+        self.synced_at = float('-inf')
+
+    def sync(self):
+        """Rebuild the filter from the store if its generation changed"""
+        self.synced_at = time.monotonic()
+        try:
+            generation = self.store.generation()
+            if generation == self.generation:
+                return
+            active = self.store.active()
+        except Exception:
+            # Keep the current filter and retry on the next interval
+            logger.exception('Could not sync the JWT revocation list')
+            return
+        bloom = BloomFilter(max(self.capacity, 2 * len(active)), self.error_rate)
+        for jti in active:
+            bloom.add(jti)
+        self.bloom, self.generation = bloom, generation
+
+    def is_revoked(self, jti):
+        if time.monotonic() - self.synced_at >= self.sync_interval:
+            with self.lock:
+                if time.monotonic() - self.synced_at >= self.sync_interval:
+                    self.sync()
+        if jti not in self.bloom:
+            return False
+        try:
+            return self.store.contains(jti)
+        except Exception:
+            # The filter says the token is very likely revoked; fail closed
+            logger.exception('Could not confirm JWT revocation of %s', jti)
+            return True
+
+    def revoke(self, jti, expires_at):
+        self.store.add(jti, expires_at)
+        self.bloom.add(jti)
+
+
+_revocation_list = None
+_revocation_list_lock = threading.Lock()
+
+
+def get_revocation_list():
+    """Return this process's revocation list, creating it on first use"""
+    global _revocation_list
+    if _revocation_list is None:
+        with _revocation_list_lock:
+            if _revocation_list is None:
+                _revocation_list = RevocationList(
+                    get_store(),
+                    capacity=getattr(settings, 'JWT_REVOCATION_BLOOM_CAPACITY', 100000),
+                    error_rate=getattr(settings, 'JWT_REVOCATION_BLOOM_ERROR_RATE', 0.001),
+                    sync_interval=getattr(settings, 'JWT_REVOCATION_SYNC_INTERVAL', 5),
+                )
+    return _revocation_list
+
+
+def is_revoked(jti):
+    return get_revocation_list().is_revoked(jti)
+
+
+def revoke_token(token):
+    """Revoke a validated simplejwt token until it expires"""
+    jti = token.get(api_settings.JTI_CLAIM)
+    expires_at = token.get('exp')
+    if jti is None or expires_at is None or expires_at <= time.time():
+        return
+    get_revocation_list().revoke(jti, expires_at)
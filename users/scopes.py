@@ -0,0 +1,66 @@
+"""
+Role-scoped querysets.
+
+Each ``*_filter`` function turns the visibility rules of a role, as expressed
+by the classes in ``users.permissions``, into a ``Q`` object, and each
+``scope_*`` function applies it to a queryset. Views scope their queryset in
+``get_queryset`` so that both listing and detail lookups enforce access in
+the ``WHERE`` clause of their main query: rows a user may not access are
+simply not found (404), and no object is dereferenced to check permissions.
+
+    * Admins and sales agents see every job and task (``IsAdminOrSalesAgent``).
+    * Technicians see jobs assigned to them or created by them
+      (``IsAssignedTechnician | IsJobCreator``) and the tasks of jobs
+      assigned to them (``IsAssignedTechnician``).
+    * Admins see all equipment; everyone else sees active equipment only.
+"""
+from django.db.models import Q
+
+
+NOTHING = Q(pk__in=[])
+
+
+def _sees_all_jobs(user):
+    return user.is_admin or user.is_sales_agent
+
+
+def job_filter(user):
+    """Return a ``Q`` matching the jobs ``user`` may access"""
+    if not user.is_authenticated:
+        return NOTHING
+    if _sees_all_jobs(user):
+        return Q()
+    return Q(assigned_to=user.pk) | Q(created_by=user.pk)
+
+
+def task_filter(user, job_prefix='job__'):
+    """
+    Return a ``Q`` matching the tasks ``user`` may access; with
+    ``job_prefix=''`` it matches the jobs whose tasks ``user`` may access
+    """
+    if not user.is_authenticated:
+        return NOTHING
+    if _sees_all_jobs(user):
+        return Q()
+    return Q(**{f'{job_prefix}assigned_to': user.pk})
+
+
+def equipment_filter(user):
+    """Return a ``Q`` matching the equipment ``user`` may access"""
+    if not user.is_authenticated:
+        return NOTHING
+    if user.is_admin:
+        return Q()
+    return Q(is_active=True)
+
+
+def scope_jobs(queryset, user):
+    return queryset.filter(job_filter(user))
+
+
+def scope_tasks(queryset, user):
+    return queryset.filter(task_filter(user))
+
+
+def scope_equipment(queryset, user):
+    return queryset.filter(equipment_filter(user))
@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
 from .models import User
+from .revocation import is_revoked, revoke_token
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -61,6 +66,19 @@ class UserListSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_active']
 
 
+class UserWorkloadSerializer(UserListSerializer):
+    """
+    Serializer for listing users with their assigned workload
+    """
+    open_jobs = serializers.IntegerField(read_only=True)
+    in_progress_jobs = serializers.IntegerField(read_only=True)
+    overdue_jobs = serializers.IntegerField(read_only=True)
+    tasks_due = serializers.IntegerField(read_only=True)
+    
+    class Meta(UserListSerializer.Meta):
+        fields = UserListSerializer.Meta.fields + ['open_jobs', 'in_progress_jobs', 'overdue_jobs', 'tasks_due']
+
+
 class LoginSerializer(serializers.Serializer):
     """
     Serializer for user login
@@ -102,4 +120,34 @@ class ChangePasswordSerializer(serializers.Serializer):
         user = self.context['request'].user
         if not user.check_password(value):
             raise serializers.ValidationError('Old password is incorrect')
-        return value 
\ No newline at end of file
+        return value
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """
+    Token refresh that rejects revoked refresh tokens
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken('Token has been revoked')
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            revoke_token(refresh)
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    """
+    Serializer for logging out; the refresh token is optional
+    """
+    refresh = serializers.CharField(required=False)
+    
+    def validate_refresh(self, value):
+        try:
+            refresh = RefreshToken(value)
+        except TokenError as exc:
+            raise serializers.ValidationError(str(exc))
+        user = self.context['request'].user
+        if str(refresh.get(api_settings.USER_ID_CLAIM)) != str(getattr(user, api_settings.USER_ID_FIELD)):
+            raise serializers.ValidationError('Token does not belong to the current user')
+        return refresh
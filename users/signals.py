@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+
+from .authentication import invalidate_users
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Covers role changes, deactivation and password changes, which all save the user"""
+    invalidate_users([instance.pk])
+
+
+def connect_signals():
+    User = get_user_model()
+    post_save.connect(invalidate_cached_user, sender=User, dispatch_uid='users_invalidate_save')
+    post_delete.connect(invalidate_cached_user, sender=User, dispatch_uid='users_invalidate_delete')
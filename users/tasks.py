@@ -0,0 +1,28 @@
+from celery import shared_task
+from core.instrumentation import instrumented_task, current_run
+from .models import BulkPasswordJob
+from .passwords import set_password_hash, set_progress
+
+
+@shared_task
+@instrumented_task
+def bulk_set_passwords(job_id, user_ids):
+    """
+    Set the password hash of job ``job_id`` for many users, reporting progress on the job
+    """
+    run = current_run()
+    password_hash = BulkPasswordJob.objects.values_list('password_hash', flat=True).get(pk=job_id)
+
+    def progress(done, total):
+        set_progress(job_id, status='running', done=done, total=total)
+        run.chunk_done(total=total)
+
+    set_progress(job_id, status='running')
+    try:
+        updated = set_password_hash(user_ids, password_hash, progress=progress)
+    except Exception as exc:
+        set_progress(job_id, status='failed', error=str(exc), password_hash='')
+        raise
+    run.add_rows(updated)
+    set_progress(job_id, status='done', done=updated, password_hash='')
+    return {'users': updated}
@@ -1,3 +1,275 @@
-from django.test import TestCase
+import time
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from jobs.models import Job, JobTask
+from .authentication import cache_key, get_cache
+from .models import BulkPasswordJob, User
+from .passwords import get_progress, set_passwords
+from .revocation import LocalRevocationStore, RevocationList
+from .tasks import bulk_set_passwords
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """Test cases for cached user resolution of JWT requests"""
+    
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        self.user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+    
+    def user_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q for q in queries.captured_queries if 'FROM "users"' in q['sql']]
+    
+    def test_repeat_requests_skip_users_query(self):
+        """Test that only the first request loads the user from the database"""
+        url = reverse('users:user-info')
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+    
+        response, queries = self.user_queries(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'technician')
+        self.assertEqual(queries, [])
+    
+    def test_role_change_and_deactivation_invalidate(self):
+        """Test that saving the user drops the cached entry"""
+        url = reverse('users:user-list-create')
+        self.assertEqual(self.client.get(url).status_code, 403)
+    
+        self.user.role = 'admin'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+    
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+    
+    def test_password_change_with_cached_user(self):
+        """Test that a cached user can change its password without losing fields"""
+        self.client.get(reverse('users:user-info'))
+    
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('users:change-password'), {
+                'old_password': 'testpass123',
+                'new_password': 'newpass456789',
+                'new_password_confirm': 'newpass456789',
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+    
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass456789'))
+        self.assertEqual((self.user.username, self.user.role), ('technician', 'technician'))
+
+
+class TokenRevocationTest(TestCase):
+    """Test cases for logout and the JWT revocation list"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='technician',
+            password='testpass123',
+            role='technician'
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+    
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        """Test that tokens are rejected after logout"""
+        self.assertEqual(self.client.get(reverse('users:user-info')).status_code, 200)
+    
+        response = self.client.post(reverse('users:logout'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+    
+        self.assertEqual(self.client.get(reverse('users:user-info')).status_code, 401)
+        response = APIClient().post(reverse('users:token_refresh'), {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+    
+        # Tokens issued by a new login still work
+        other = APIClient()
+        other.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.assertEqual(other.get(reverse('users:user-info')).status_code, 200)
+    
+    def test_logout_rejects_refresh_token_of_another_user(self):
+        """Test that a user cannot revoke someone else's refresh token"""
+        other = User.objects.create_user(username='other', password='testpass123', role='technician')
+        response = self.client.post(
+            reverse('users:logout'), {'refresh': str(RefreshToken.for_user(other))}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(reverse('users:user-info')).status_code, 200)
+    
+    def test_revocation_list_bloom_filter(self):
+        """Test that the filter never misses a revoked jti and expired entries are forgotten"""
+        store = LocalRevocationStore()
+        revocations = RevocationList(store, capacity=100, sync_interval=0)
+        now = time.time()
+        revocations.revoke('revoked', now + 60)
+        store.add('elsewhere', now + 60)
+        store.add('expired', now - 1)
+    
+        self.assertTrue(revocations.is_revoked('revoked'))
+        self.assertTrue(revocations.is_revoked('elsewhere'))
+        self.assertFalse(revocations.is_revoked('expired'))
+        self.assertNotIn('expired', revocations.bloom)
+        misses = sum(f'token-{i}' in revocations.bloom for i in range(1000))
+        self.assertLess(misses, 20)
+
+
+class BulkPasswordChangeTest(TestCase):
+    """Test cases for the bulk_change_password admin action"""
+    
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        self.admin_user = User.objects.create_superuser(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.technicians = [
+            User.objects.create_user(username=f'tech{i}', password='testpass123', role='technician')
+            for i in range(3)
+        ]
+        self.client.force_login(self.admin_user)
+    
+    def change_passwords(self):
+        return self.client.post(reverse('admin:users_user_changelist'), {
+            'action': 'bulk_change_password',
+            '_selected_action': [user.pk for user in self.technicians],
+            'apply': 'Change Passwords',
+            'new_password': 'newpass456789',
+            'confirm_password': 'newpass456789',
+        })
+    
+    def test_set_passwords_in_process_pool(self):
+        """Test that hashes are salted per user and cached users are dropped"""
+        user_ids = [user.pk for user in self.technicians]
+        get_cache().set(cache_key(user_ids[0]), {'stale': True})
+        calls = []
+    
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = set_passwords(user_ids, 'newpass456789', workers=2, progress=lambda *args: calls.append(args))
+    
+        self.assertEqual(updated, 3)
+        self.assertEqual(calls[-1], (3, 3))
+        self.assertIsNone(get_cache().get(cache_key(user_ids[0])))
+        users = list(User.objects.filter(pk__in=user_ids))
+        self.assertEqual(len({user.password for user in users}), 3)
+        self.assertTrue(all(user.check_password('newpass456789') for user in users))
+    
+    def test_admin_action_changes_passwords(self):
+        """Test that small selections are changed within the request"""
+        response = self.change_passwords()
+        self.assertEqual(response.status_code, 302)
+        for user in self.technicians:
+            user.refresh_from_db()
+            self.assertTrue(user.check_password('newpass456789'))
+    
+    @override_settings(BULK_PASSWORD_ASYNC_THRESHOLD=2)
+    def test_large_selection_runs_in_celery_with_progress(self):
+        """Test that large selections are queued and report progress"""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.change_passwords()
+        self.assertEqual(len(callbacks), 1)
+        job_id = response.url.rstrip('/').rsplit('/', 1)[-1]
+        self.assertEqual(get_progress(job_id)['status'], 'queued')
+        self.assertTrue(self.technicians[0].check_password('testpass123'))
+    
+        # The worker gets the job id and user ids, never the password
+        with mock.patch.object(bulk_set_passwords, 'delay') as delay:
+            callbacks[0]()
+        sent_job_id, sent_user_ids = delay.call_args.args
+        self.assertEqual(sent_job_id, job_id)
+        self.assertCountEqual(sent_user_ids, [user.pk for user in self.technicians])
+        self.assertNotIn('newpass456789', repr(delay.call_args))
+    
+        bulk_set_passwords(*delay.call_args.args)
+        self.assertEqual(get_progress(job_id), {'status': 'done', 'done': 3, 'total': 3, 'error': None})
+        self.assertEqual(BulkPasswordJob.objects.get(pk=job_id).password_hash, '')
+        response = self.client.get(response.url)
+        self.assertContains(response, '3 of 3 passwords changed')
+        self.technicians[0].refresh_from_db()
+        self.assertTrue(self.technicians[0].check_password('newpass456789'))
+
+
+class UserWorkloadTest(TestCase):
+    """Test cases for workload annotations on the user list"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin_user = User.objects.create_user(
+            username='admin',
+            password='testpass123',
+            role='admin'
+        )
+        self.busy, self.idle = [
+            User.objects.create_user(username=name, password='testpass123', role='technician')
+            for name in ('busy', 'idle')
+        ]
+        now = timezone.now()
+        for i, (job_status, overdue, days) in enumerate([
+            ('pending', False, 2), ('in_progress', True, -1), ('cancelled', False, 1), ('pending', False, 30),
+        ]):
+            job = Job.objects.create(
+                title=f'Job {i}',
+                description='Test description',
+                client_name='Test Client',
+                created_by=self.admin_user,
+                assigned_to=self.busy,
+                status=job_status,
+                overdue=overdue,
+                scheduled_date=now + timedelta(days=days)
+            )
+            JobTask.objects.create(job=job, title='First', order=1)
+            JobTask.objects.create(job=job, title='Second', order=2, status='completed')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin_user)
+    
+    def test_workload_counts_in_one_query(self):
+        """Test that the counts come with the list query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('users:user-list-create'), {'workload': 'true', 'role': 'technician'})
+        self.assertEqual(response.status_code, 200)
+        # Only the list query reads jobs; the page count needs no workload subqueries
+        self.assertEqual(len([q for q in queries.captured_queries if 'FROM "jobs"' in q['sql'] or 'JOIN "jobs"' in q['sql']]), 1)
+    
+        rows = {row['username']: row for row in response.data['results']}
+        self.assertEqual(
+            {key: rows['busy'][key] for key in ('open_jobs', 'in_progress_jobs', 'overdue_jobs', 'tasks_due')},
+            {'open_jobs': 3, 'in_progress_jobs': 1, 'overdue_jobs': 1, 'tasks_due': 1}
+        )
+        self.assertEqual(rows['idle']['open_jobs'], 0)
+    
+    def test_filter_and_order_by_load(self):
+        """Test that load filters and ordering imply the annotations"""
+        url = reverse('users:user-list-create')
+        response = self.client.get(url, {'role': 'technician', 'ordering': 'open_jobs'})
+        self.assertEqual([row['username'] for row in response.data['results']], ['idle', 'busy'])
+    
+        response = self.client.get(url, {'role': 'technician', 'max_open_jobs': 0})
+        self.assertEqual([row['username'] for row in response.data['results']], ['idle'])
+    
+        response = self.client.get(url, {'workload': 'true', 'due_days': 60})
+        self.assertEqual({row['username']: row['tasks_due'] for row in response.data['results']}['busy'], 2)
+        self.assertEqual(self.client.get(url, {'workload': 'true', 'due_days': 0}).status_code, 400)
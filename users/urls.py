@@ -7,6 +7,7 @@ app_name = 'users'
 urlpatterns = [
     # Authentication
     path('login/', views.login_view, name='login'),
+    path('logout/', views.logout_view, name='logout'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     # User management (Admin only)
@@ -1,27 +1,72 @@
-from rest_framework import status, generics
+from rest_framework import status, generics, filters
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from drf_spectacular.utils import extend_schema, OpenApiResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiResponse
 from .models import User
 from .serializers import (
-    UserSerializer, UserListSerializer, LoginSerializer, ChangePasswordSerializer
+    UserSerializer, UserListSerializer, UserWorkloadSerializer, LoginSerializer, ChangePasswordSerializer,
+    LogoutSerializer
 )
+from .filters import UserFilter, WORKLOAD_FILTERS
 from .permissions import IsAdminUser
+from .revocation import revoke_token
+from .workload import DEFAULT_DUE_DAYS, MAX_DUE_DAYS, WORKLOAD_FIELDS, with_workload
 
 
+@extend_schema_view(
+    get=extend_schema(parameters=[
+        OpenApiParameter('workload', OpenApiTypes.BOOL, description='Add assigned job and task counts'),
+        OpenApiParameter('due_days', OpenApiTypes.INT, description=f'Window of tasks_due in days (default: {DEFAULT_DUE_DAYS}, max: {MAX_DUE_DAYS})'),
+    ])
+)
 class UserListCreateView(generics.ListCreateAPIView):
     """
     List all users or create a new user (Admin only)
+    
+    ``?workload=true`` adds each user's open, in-progress and overdue job
+    counts and the open tasks due within ``?due_days=`` days, which can also
+    be filtered (``max_open_jobs`` etc.) and ordered by.
     """
     queryset = User.objects.all()
     permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = UserFilter
+    ordering_fields = ['username', 'created_at', *WORKLOAD_FIELDS]
+    ordering = ['username']
+    
+    def wants_workload(self):
+        params = self.request.query_params
+        if self.request.method != 'GET':
+            return False
+        if params.get('workload', '').lower() == 'true':
+            return True
+        # Filtering or ordering by load implies the counts
+        ordering = [name.strip().lstrip('-') for name in params.get('ordering', '').split(',')]
+        return any(name in WORKLOAD_FIELDS for name in ordering) or any(
+            name in params for name in WORKLOAD_FILTERS
+        )
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.wants_workload():
+            return queryset
+        try:
+            due_days = int(self.request.query_params.get('due_days', DEFAULT_DUE_DAYS))
+        except ValueError:
+            due_days = 0
+        if not 1 <= due_days <= MAX_DUE_DAYS:
+            raise ValidationError({'due_days': f'Must be an integer between 1 and {MAX_DUE_DAYS}'})
+        return with_workload(queryset, due_days)
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
-            return UserListSerializer
+            return UserWorkloadSerializer if self.wants_workload() else UserListSerializer
         return UserSerializer
 
 
@@ -72,6 +117,30 @@ def login_view(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    request=LogoutSerializer,
+    responses={
+        200: OpenApiResponse(description="Logged out successfully"),
+        400: OpenApiResponse(description="Invalid refresh token")
+    }
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout_view(request):
+    """
+    Revoke the access token of the request and, if given, a refresh token
+    """
+    serializer = LogoutSerializer(data=request.data, context={'request': request})
+    if serializer.is_valid():
+        if request.auth is not None:
+            revoke_token(request.auth)
+        if 'refresh' in serializer.validated_data:
+            revoke_token(serializer.validated_data['refresh'])
+        return Response({'message': 'Logged out successfully'})
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 @extend_schema(
     request=ChangePasswordSerializer,
     responses={
@@ -0,0 +1,61 @@
+"""
+Technician workload counts for the user list.
+
+``with_workload`` annotates users with counts over their open
+``assigned_jobs`` and those jobs' tasks, so the list query returns each
+user's load instead of dispatchers querying every technician's jobs. Each
+count is a correlated subquery over the user's open jobs only, which
+``jobs_assignee_sched_idx`` finds without reading their closed history.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from jobs.availability import ACTIVE_STATUSES
+from jobs.models import Job, JobTask
+
+
+WORKLOAD_FIELDS = ('open_jobs', 'in_progress_jobs', 'overdue_jobs', 'tasks_due')
+DEFAULT_DUE_DAYS = 7
+MAX_DUE_DAYS = 62
+
+
+def _count(queryset, assignee):
+    """The number of rows of ``queryset`` per outer user, 0 if they have none"""
+    counts = (
+        queryset.filter(**{assignee: OuterRef('pk')})
+        .order_by()
+        .values(assignee)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts), 0)
+
+
+def with_workload(queryset, due_days=DEFAULT_DUE_DAYS, now=None):
+    """
+    Annotate ``queryset`` with the ``WORKLOAD_FIELDS``:
+
+    * ``open_jobs``: assigned jobs that are pending or in progress
+    * ``in_progress_jobs``: assigned jobs in progress
+    * ``overdue_jobs``: open assigned jobs flagged as overdue
+    * ``tasks_due``: open tasks of open assigned jobs scheduled within the next ``due_days`` days
+    """
+    now = now or timezone.now()
+    open_jobs = Job.objects.filter(status__in=ACTIVE_STATUSES)
+    return queryset.annotate(
+        open_jobs=_count(open_jobs, 'assigned_to'),
+        in_progress_jobs=_count(open_jobs.filter(status='in_progress'), 'assigned_to'),
+        overdue_jobs=_count(open_jobs.filter(overdue=True), 'assigned_to'),
+        tasks_due=_count(
+            JobTask.objects.filter(
+                status__in=ACTIVE_STATUSES,
+                job__status__in=ACTIVE_STATUSES,
+                job__scheduled_date__gte=now,
+                job__scheduled_date__lt=now + timedelta(days=due_days),
+            ),
+            'job__assigned_to',
+        ),
+    )